@@ -21,4 +21,6 @@ AEO_GAS_ELECTR_PROJ_PATH = os.path.join(DATA_PATH,'eia','15yr-gas-electricity-pr
 DCFC_PROFILES_DICT = {'p1': os.path.join(DATA_PATH,'dcfc-load-profiles','dcfc_current_1plug-low_50kW.csv'),
                       'p2': os.path.join(DATA_PATH,'dcfc-load-profiles','dcfc_current_1plug-high_50kW.csv'),
                       'p3': os.path.join(DATA_PATH,'dcfc-load-profiles','dcfc_interm_4plugs_150kW.csv'),
-                      'p4': os.path.join(DATA_PATH,'dcfc-load-profiles','dcfc_future_20plugs_150kW.csv')}
\ No newline at end of file
+                      'p4': os.path.join(DATA_PATH,'dcfc-load-profiles','dcfc_future_20plugs_150kW.csv')}
+
+RES_CHARGING_HOURS = 1 #consecutive hours of residential charging sessions priced at the cheapest window (1 = cheapest period)
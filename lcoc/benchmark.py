@@ -0,0 +1,298 @@
+"""
+Benchmarks of the URDB cost-of-electricity pipeline on synthetic fixtures
+(see lcoc.synthetic) or seeded samples of a URDB snapshot (see 
+sample_snapshot): wall time, rates per second, and peak memory of each
+stage at several input sizes, and agreement of the residential and DCFC 
+cost implementations w/ each other and w/ reference calculations. Runs 
+offline.
+"""
+#public
+import os
+import time
+import logging
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+#private
+import config as config
+import lcoc.urdb as urdb
+import lcoc.billing as billing
+import lcoc.synthetic as synthetic
+from lcoc.structures import RateStructures
+
+#settings
+BENCHMARK_SIZES = [300, 1200, 4800] #rates per synthetic or sampled URDB snapshot
+
+BENCHMARK_PROFILES = {'p1': {'plugs': 1, 'plug_kw': 50, 'sessions_per_plug_day': 2},
+                      'p3': {'plugs': 4, 'plug_kw': 150, 'sessions_per_plug_day': 4},
+                      'constant': {'sessions_per_plug_day': 0, 'base_kw': 50}} #repeated monthly peaks
+
+BENCHMARK_RES_STRATEGIES = ['immediate', 'delayed', 'smart'] #residential charging profiles, see synthetic.generate_res_charging_profile
+
+REFERENCE_PROFILE = 'day_weighted_1kwh' #residential profile checked against the cheapest-period cost, see day_weighted_profile
+
+FILTERS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'filters')
+
+def measure(fn, *args, **kwargs):
+    """
+    Returns (result, seconds, peak_bytes) of calling fn(*args, **kwargs),
+    where peak_bytes is the peak memory allocated during the call (traced
+    w/ tracemalloc, which includes numpy & pandas buffers).
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return result, seconds, peak_bytes
+
+def compare_costs(a_df, b_df, cost_col, rtol=1e-9, b_cost_col=None):
+    """
+    Returns dict summarizing the agreement of cost_col between two rate-level
+    cost tables (pandas.DataFrames w/ 'label' column; b_cost_col, default:
+    cost_col, in b_df): the number of rates costed in each and in both, the
+    max relative difference over rates in both, and the share of those 
+    within rtol. Rates w/o a cost are ignored.
+    """
+
+    b_cost_col = cost_col if b_cost_col is None else b_cost_col
+    a = a_df.dropna(subset=[cost_col]).set_index('label')[cost_col]
+    b = b_df.dropna(subset=[b_cost_col]).set_index('label')[b_cost_col]
+    common = a.index.intersection(b.index)
+    rel_diff = (a[common] - b[common]).abs() / b[common].abs().clip(lower=np.finfo(float).tiny)
+
+    summary = {'n_a': len(a), 'n_b': len(b), 'n_common': len(common),
+               'max_rel_diff': rel_diff.max() if len(common) else np.nan,
+               'share_within_rtol': (rel_diff <= rtol).mean() if len(common) else np.nan}
+    summary['agree'] = (len(a) == len(b) == len(common)) and (summary['share_within_rtol'] == 1)
+
+    return summary
+
+def residential_reference_costs(rates, schedules):
+    """
+    Returns pandas.DataFrame ['label', 'electricity_cost_per_kwh'] of the 
+    cheapest-period cost of residential rates (pandas.DataFrame of URDB 
+    rates) w/ energy schedules 'schedules' (see 
+    DatabaseRates.get_schedules), computed in long format as by the 
+    residential v2 implementation: the average rate of each period's 
+    tiers, the cheapest of those in each month & day type, weighted by day
+    type, averaged over months. Negative costs are dropped, as in 
+    res_rates.csv.
+    """
+
+    period_rates = RateStructures(rates).to_long('energy', labels=rates['label'], dropna=True)
+    period_rates = period_rates.groupby(['label', 'period'], as_index=False)['rate'].mean()
+    
+    rates_l = urdb.schedule_long_df(rates['label'], schedules).merge(period_rates, how='left', on=['label', 'period'])
+    min_rates = rates_l.groupby(['label', 'month', 'day_type'], as_index=False)['rate'].min()
+    min_rates['rate'] *= min_rates['day_type'].map(dict(zip(['weekday', 'weekend'], billing.DAY_TYPE_WEIGHTS)))
+    costs = min_rates.groupby(['label', 'month'])['rate'].sum().groupby('label').mean()
+    costs = costs.rename('electricity_cost_per_kwh').reset_index()
+
+    return costs[costs['electricity_cost_per_kwh'] >= 0]
+
+def day_weighted_profile(annual_kwh=1., year=2019):
+    """
+    Returns pandas.DataFrame of a 15-minute load profile in the format of 
+    synthetic.generate_dcfc_profile w/ annual_kwh drawn in equal shares by
+    month, split between weekdays & weekends by billing.DAY_TYPE_WEIGHTS, 
+    in the first 15 minutes of each day. Billed against a rate w/o tiers 
+    or TOU periods, its cost per kWh is the cheapest-period cost of 
+    DatabaseRates.calculate_annual_energy_cost_residential.
+    """
+
+    index = pd.date_range('{}-01-01 00:00'.format(year), periods=365*96, freq='15min')
+    days = index[::96]
+    day_types = np.where(days.weekday <= 4, 0, 1)
+    n_days = pd.Series(1, index=days).groupby([days.month, day_types]).transform('sum').values
+    
+    power = np.zeros(len(index))
+    power[::96] = 4 * annual_kwh/12 * billing.DAY_TYPE_WEIGHTS[day_types] / n_days
+    profile_df = pd.DataFrame({'Power, kW': power}, index=index)
+    profile_df.index.name = 'Timestamp'
+
+    return profile_df
+
+def sample_snapshot(urdb_file, n_rates, outfile, seed=0):
+    """
+    Writes a seeded random sample of n_rates rates of the URDB snapshot 
+    urdb_file (all rates if it has fewer) to outfile, w/ values as in 
+    urdb_file. Returns the number of rates written.
+    """
+
+    rates = pd.read_csv(urdb_file, dtype=str, keep_default_na=False)
+    rates = rates.sample(n=min(n_rates, len(rates)), random_state=seed).sort_index()
+    rates.to_csv(outfile, index=False)
+
+    return len(rates)
+
+def run_size(n_rates, urdb_file, profile_files, workdir, rtol=1e-9, seed=0):
+    """
+    Runs and measures each pipeline stage on the URDB snapshot urdb_file 
+    (of n_rates rates), the DCFC load profiles profile_files (dict of
+    name: .csv path), and synthetic residential charging profiles of 
+    BENCHMARK_RES_STRATEGIES (seeded w/ seed) & REFERENCE_PROFILE (see 
+    day_weighted_profile), w/ outputs in workdir. Returns (timings, 
+    agreement) pandas.DataFrames (see run_benchmarks).
+    """
+
+    res_profile_files = {}
+    for i, strategy in enumerate(BENCHMARK_RES_STRATEGIES):
+        res_profile_files[strategy] = os.path.join(workdir, f'res_{strategy}.csv')
+        synthetic.generate_res_charging_profile(strategy, seed=seed+i+1).to_csv(res_profile_files[strategy])
+    
+    res_profile_files[REFERENCE_PROFILE] = os.path.join(workdir, f'res_{REFERENCE_PROFILE}.csv')
+    day_weighted_profile().to_csv(res_profile_files[REFERENCE_PROFILE])
+
+    for subdir in ['res', 'dcfc_v1', 'dcfc_v2', 'dcfc_batch', 'dcfc_utils']:
+        os.makedirs(os.path.join(workdir, subdir), exist_ok=True)
+
+    timings = []
+    def stage(name, industry, n, fn, *args, **kwargs):
+        logging.info(f'benchmark {n_rates} rates - {name} ({industry})')
+        result, seconds, peak_bytes = measure(fn, *args, **kwargs)
+        timings.append({'n_rates': n_rates, 'stage': name, 'industry': industry, 'rates_in': n,
+                        'seconds': seconds, 'rates_per_sec': n/seconds if seconds > 0 else np.nan,
+                        'peak_mib': peak_bytes/2**20})
+        return result
+
+    cache_dir = os.path.join(workdir, 'cache')
+    stage('load (cold cache)', 'all', n_rates, urdb.DatabaseRates, urdb_file, cache_dir=cache_dir)
+    db = stage('load (warm cache)', 'all', n_rates, urdb.DatabaseRates, urdb_file, cache_dir=cache_dir)
+
+    for ind in ['residential', 'commercial']:
+        rate_data = lambda: db.res_rate_data if ind == 'residential' else db.com_rate_data
+
+        def classify():
+            db.filter_stale_rates(ind)
+            db.classify_rate_structures(ind, ev_rate_words_file=os.path.join(FILTERS_PATH, 'urdb_res_ev_specific_rate_words.txt'))
+        stage('classify', ind, len(rate_data()), classify)
+
+        def filter_rates():
+            if ind == 'residential':
+                db.filter_demand_rates(ind)
+            else:
+                db.com_rate_preprocessing()
+                db.additional_com_rate_filters()
+            db.filter_on_phrases(ind, filters_path=FILTERS_PATH)
+        stage('filter', ind, len(rate_data()), filter_rates)
+
+        def combine():
+            db.combine_rates(ind)
+            db.filter_null_rates(ind)
+        stage('combine', ind, len(rate_data()), combine)
+
+    # Residential cost, cheapest period (& long-format reference) & charging profiles
+    stage('residential profile cost', 'residential', len(db.res_rate_data)*len(res_profile_files),
+          db.calculate_annual_cost_residential_profiles, res_profile_files, outpath=os.path.join(workdir, 'res'))
+    
+    def reference_cost():
+        rates = db.res_rate_data
+        reference = residential_reference_costs(rates, db.get_schedules(rates, 'energy'))
+        reference.to_csv(os.path.join(workdir, 'res', 'res_reference.csv'), index=False)
+    stage('residential cost (long-format reference)', 'residential', len(db.res_rate_data), reference_cost)
+    stage('residential cost', 'residential', len(db.res_rate_data), db.calculate_annual_energy_cost_residential,
+          outpath=os.path.join(workdir, 'res'))
+
+    # DCFC cost, all engines on the same rates & profiles
+    n_com = len(db.com_rate_data)*len(profile_files)
+    for name, method, subdir in [('dcfc cost v1', db.calculate_annual_cost_dcfc, 'dcfc_v1'),
+                                 ('dcfc cost v2', db.calculate_annual_cost_dcfc_v2, 'dcfc_v2'),
+                                 ('dcfc cost batch', db.calculate_annual_cost_dcfc_batch, 'dcfc_batch')]:
+        stage(name, 'commercial', n_com, method, profile_files, outpath=os.path.join(workdir, subdir), log_lvl=0)
+
+    # Aggregation, rates -> utilities
+    try:
+        import lcoc.processing as processing
+        stage('aggregate to utilities', 'commercial', n_com, processing.dcfc_rates_to_utils, profile_files,
+              inpath=os.path.join(workdir, 'dcfc_v2'), outpath=os.path.join(workdir, 'dcfc_utils'))
+
+    except ImportError as e:
+        logging.warning(f'aggregation stage skipped, lcoc.processing could not be imported: {e}')
+
+    # Agreement between implementations, on the rates (query of the first
+    # table) where their billing semantics match: DCFC v1 bills energy tiers
+    # first-fit and demand at other peaks than v2, so only the energy cost of
+    # rates w/o energy tiers is compared
+    res_rates = os.path.join('res', 'res_rates.csv')
+    comparisons = [('residential vs long-format reference', res_rates, os.path.join('res', 'res_reference.csv'), 
+                    'electricity_cost_per_kwh', None, None),
+                   (f'residential vs {REFERENCE_PROFILE} profile (w/o tiers & TOU)', res_rates, 
+                    os.path.join('res', 'res_profile_costs.csv'), 'electricity_cost_per_kwh', 
+                    f'{REFERENCE_PROFILE}_cost_per_kwh', 'is_tier_rate == 0 and is_tou_rate == 0')]
+    for p in profile_files:
+        cost_col = f'{p}_lvl_cost_per_kwh'
+        comparisons += [(f'dcfc {p} energy v1 vs v2 (w/o tiers)', os.path.join('dcfc_v1', f'dcfc_rates_{p}.csv'),
+                         os.path.join('dcfc_v2', f'dcfc_rates_{p}.csv'), 'annual_energy_cost', None, 'is_tier_rate == 0'),
+                        (f'dcfc {p} batch vs v2', os.path.join('dcfc_batch', 'dcfc_rate_costs.csv'),
+                         os.path.join('dcfc_v2', f'dcfc_rates_{p}.csv'), cost_col, None, None)]
+
+    agreement = []
+    for name, a_file, b_file, cost_col, b_cost_col, query in comparisons:
+        a_df = pd.read_csv(os.path.join(workdir, a_file), low_memory=False)
+        b_df = pd.read_csv(os.path.join(workdir, b_file), low_memory=False)
+        if query is not None:
+            a_df = a_df.query(query)
+            b_df = b_df[b_df['label'].isin(a_df['label'])]
+        
+        agreement.append({'n_rates': n_rates, 'comparison': name, 'rtol': rtol,
+                          **compare_costs(a_df, b_df, cost_col, rtol, b_cost_col)})
+
+    return pd.DataFrame(timings), pd.DataFrame(agreement)
+
+def run_benchmarks(sizes=BENCHMARK_SIZES, urdb_file=None, dcfc_load_profiles=None, seed=0, rtol=1e-9, outpath=None):
+    """
+    Runs the pipeline benchmarks (see run_size) at each size in sizes, in
+    temporary directories. By default, fixtures are synthetic (see 
+    synthetic.write_fixtures): a URDB snapshot of the size split evenly 
+    across synthetic.RATE_KINDS and the DCFC profiles BENCHMARK_PROFILES, 
+    all seeded w/ seed. If urdb_file is given, samples of it are used
+    instead (see sample_snapshot), w/ the DCFC load profiles 
+    dcfc_load_profiles (dict of name: .csv path, default: p1 & p3 of 
+    config.DCFC_PROFILES_DICT). Returns (timings,
+    agreement) pandas.DataFrames: timings has a row per size and stage
+    ['n_rates', 'stage', 'industry', 'rates_in', 'seconds',
+    'rates_per_sec', 'peak_mib'] (rates_in counts rate x profile pairs in
+    the profile stages), agreement a row per size and pair of cost
+    implementations ['n_rates', 'comparison', 'rtol', 'n_a', 'n_b',
+    'n_common', 'max_rel_diff', 'share_within_rtol', 'agree'], each 
+    restricted to the rates where both share billing semantics (see 
+    run_size), so all are expected to agree. If outpath is given, both are
+    saved there as benchmark_timings.csv and benchmark_agreement.csv.
+    """
+
+    timings, agreement = [], []
+    for n_rates in sizes:
+        with tempfile.TemporaryDirectory(prefix='lcoc_benchmark_') as workdir:
+            if urdb_file is None:
+                counts = {kind: n_rates // len(synthetic.RATE_KINDS) for kind in synthetic.RATE_KINDS}
+                size_file, profile_files = synthetic.write_fixtures(workdir, counts, BENCHMARK_PROFILES, seed)
+                n_size = sum(counts.values())
+            
+            else:
+                size_file = os.path.join(workdir, 'usurdb_sample.csv')
+                n_size = sample_snapshot(urdb_file, n_rates, size_file, seed)
+                profile_files = dcfc_load_profiles or {p: config.DCFC_PROFILES_DICT[p] for p in ['p1', 'p3']}
+
+            size_timings, size_agreement = run_size(n_size, size_file, profile_files, workdir, rtol, seed)
+
+        timings.append(size_timings)
+        agreement.append(size_agreement)
+
+    timings = pd.concat(timings, ignore_index=True)
+    agreement = pd.concat(agreement, ignore_index=True)
+
+    if outpath is not None:
+        os.makedirs(outpath, exist_ok=True)
+        timings.to_csv(os.path.join(outpath, 'benchmark_timings.csv'), index=False)
+        agreement.to_csv(os.path.join(outpath, 'benchmark_agreement.csv'), index=False)
+
+    return timings, agreement
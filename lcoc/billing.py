@@ -0,0 +1,329 @@
+"""
+Array kernels for billing load profiles against compiled URDB rate
+structures (see structures.RateStructures).
+"""
+#public
+import warnings
+import numpy as np
+import pandas as pd
+
+#settings
+ENERGY_CHUNK_ELEMENTS = 2**22 #rates x hours billed per pass
+
+DAY_TYPE_WEIGHTS = np.array([5/7, 2/7]) #weekday, weekend share of days
+
+DAYS_PER_MONTH = 365/12 #scales 'kWh daily' tier maximums to months
+
+def select_tiers(usage, periods, tier_max, n_tiers):
+    """
+    Returns int8 array of the tier billed for each usage value in each TOU 
+    period (usage and periods of shape (n_rates, n)): tier 0 when the period 
+    has a single tier, otherwise the first tier t with usage <= 
+    tier_max[rate, period, t]; -1 (not billed) if no tier fits or the period
+    has no tiers. tier_max is of shape (n_rates, n_periods, n_tiers) and 
+    n_tiers (the number of tiers of each period) of shape (n_periods,).
+    """
+
+    n_periods = tier_max.shape[1]
+    in_range = periods < n_periods
+    periods = np.where(in_range, periods, 0)
+    period_tiers = np.where(in_range, n_tiers[periods], 0)
+    rows = np.arange(len(periods))[:, np.newaxis]
+
+    tiers = np.full(periods.shape, -1, dtype=np.int8)
+    for t in range(tier_max.shape[2]):
+        fits = (tiers < 0) & (t < period_tiers) & (usage <= tier_max[rows, periods, t])
+        tiers[fits] = t
+
+    tiers[period_tiers == 1] = 0
+
+    return tiers
+
+def period_peaks(peak_by_tou_hour, schedules, n_periods):
+    """
+    Returns float64 array of shape (n_rates, 12, n_periods) of the peak 
+    power in each TOU period of each month, given the peak power by month, 
+    day type, and hour peak_by_tou_hour (shape (12, 2, 24), NaN w/o load; 
+    see profiles.LoadProfile) and the rates' TOU periods schedules (see 
+    DatabaseRates.get_schedules). Periods w/o load in a month peak at 0. 
+    Rates with missing or malformed schedules are NaN.
+    """
+
+    periods = schedules.transpose(0, 2, 1, 3).reshape(len(schedules), 12, 2*24)
+    peaks = np.nan_to_num(peak_by_tou_hour, nan=0).reshape(12, 2*24)
+    
+    by_period = np.zeros((len(schedules), 12, n_periods))
+    for period in range(n_periods):
+        by_period[..., period] = np.where(periods == period, peaks, 0).max(axis=2)
+
+    by_period[~(schedules >= 0).all(axis=(1, 2, 3))] = np.nan
+    
+    return by_period
+
+def demand_cost(peaks, periods, demand):
+    """
+    Returns float64 array of the annual demand cost of each rate given the
+    peaks (shape (n_rates, n)) billed in demand periods periods (float 
+    array broadcastable to peaks, NaN for none) of demand, the 
+    StructureArrays of the rates' flat or TOU demand structure. Each peak is
+    billed at one tier (see select_tiers); peaks w/o a period or tier cost 0
+    and rates w/ NaN peaks cost NaN.
+    """
+
+    n_periods = demand.shape[1]
+    periods = np.broadcast_to(periods, peaks.shape)
+    in_range = (periods >= 0) & (periods < n_periods) #False for NaN
+    
+    costs = np.zeros(len(peaks))
+    if (n_periods > 0) and (peaks.shape[1] > 0):
+        periods = np.where(in_range, periods, n_periods).astype(int)
+        rows = np.arange(len(peaks))[:, np.newaxis]
+        tiers = select_tiers(peaks, periods, demand.max, demand.n_tiers)
+        periods = np.minimum(periods, n_periods - 1)
+        period_costs = np.where(tiers >= 0, demand.rate[rows, periods, np.maximum(tiers, 0)] * peaks, 0)
+        costs = np.cumsum(period_costs, axis=1)[:, -1] #summed in billing order
+    
+    costs[np.isnan(peaks).any(axis=1)] = np.nan
+
+    return costs
+
+def tiered_energy_cost(hourly_energy_df, schedules, energy, chunk_elements=ENERGY_CHUNK_ELEMENTS):
+    """
+    Returns float64 array of the annual energy cost of the hourly energy
+    profile hourly_energy_df (['month', 'hour', 'weekday', 'energy_kwh'],
+    ordered by time) under each rate. schedules are the rates' energy TOU
+    periods (see DatabaseRates.get_schedules) and energy their
+    StructureArrays (e.g. RateStructures.energy.take(idx)), in the same
+    order. Each hour is billed at the tier that fits the energy used so far
+    in its month (see select_tiers). Rates with missing or malformed
+    schedules cost NaN. Rates are billed chunk_elements / hours at a time.
+    """
+
+    month_idxs = hourly_energy_df['month'].values - 1
+    day_types = np.where(hourly_energy_df['weekday'].values < 5, 0, 1)
+    hours = hourly_energy_df['hour'].values
+    energy_kwh = hourly_energy_df['energy_kwh'].values.astype('float64')
+    month_energy = pd.Series(energy_kwh).groupby(month_idxs).cumsum().values #energy to date, by month
+
+    n_rates, n_periods = len(schedules), energy.shape[1]
+    costs = np.full(n_rates, np.nan)
+    valid = (schedules >= 0).all(axis=(1, 2, 3))
+    chunk_size = max(1, chunk_elements // max(1, len(energy_kwh)))
+
+    for start in range(0, n_rates, chunk_size):
+        idx = np.arange(start, min(start + chunk_size, n_rates))
+        idx = idx[valid[idx]]
+
+        periods = schedules[idx][:, day_types, month_idxs, hours].astype(int)
+        rows = idx[:, np.newaxis]
+
+        tiers = select_tiers(np.broadcast_to(month_energy, periods.shape), periods, energy.max[idx], energy.n_tiers)
+        periods = np.minimum(periods, n_periods - 1)
+        hourly_costs = np.where(tiers >= 0, energy.rate[rows, periods, np.maximum(tiers, 0)], 0) * energy_kwh
+        costs[idx] = np.cumsum(hourly_costs, axis=1)[:, -1] #summed in time order, independent of chunking
+
+    return costs
+
+def allocate_tiers(usage, tier_max, in_chain):
+    """
+    Returns the amount of usage (array of shape S) billed at each tier 
+    (array of shape S + (n_tiers,)) when the tiers in_chain are filled in 
+    order: each takes what the previous ones left, up to its tier_max, and 
+    the first takes all usage up to its max. Tiers outside the chain get 0.
+    """
+
+    cap = np.where(in_chain, tier_max, 0)
+    cum = np.cumsum(cap, axis=-1)
+    prev = np.concatenate([np.zeros(cum.shape[:-1] + (1,)), cum[..., :-1]], axis=-1)
+    usage = usage[..., np.newaxis]
+    amounts = np.where(usage > cum, cap, np.where(usage > prev, usage - prev, 0))
+
+    return np.where(in_chain, amounts, 0)
+
+def cumulative_demand_cost(peak_pwr, periods, demand):
+    """
+    Returns float64 array of the annual demand cost of each rate given its 
+    monthly peak power peak_pwr (shape (12,) or (n_rates, 12)) and the 
+    demand period of each month (float array of shape (n_rates, 12), NaN 
+    for none). demand is the StructureArrays of the rates' flat or TOU 
+    demand structure. Each month's peak fills the tiers of its period in 
+    order (see allocate_tiers); months w/o a period or tiers cost 0.
+    """
+
+    n_periods = demand.shape[1]
+    in_range = (periods >= 0) & (periods < n_periods) #False for NaN
+    periods = np.where(in_range, periods, 0).astype(int)
+    rows = np.arange(len(periods))[:, np.newaxis]
+    
+    in_chain = (np.arange(demand.shape[2]) < demand.n_tiers[periods][..., np.newaxis]) & in_range[..., np.newaxis]
+    amounts = allocate_tiers(np.broadcast_to(peak_pwr, periods.shape), demand.max[rows, periods], in_chain)
+
+    return (demand.rate[rows, periods] * amounts).sum(axis=(1, 2))
+
+def cumulative_energy_cost(hourly_calendar_df, energy_kwh, peak_pwr, schedules, energy, 
+                           chunk_elements=ENERGY_CHUNK_ELEMENTS):
+    """
+    Returns float64 array of shape (n_rates, n_profiles) of the annual 
+    energy cost of hourly energy profiles energy_kwh (shape (n_hours, 
+    n_profiles)) that share the hours of hourly_calendar_df (['month', 
+    'day', 'hour', 'weekday'], ordered by time) under each rate. peak_pwr 
+    (shape (n_profiles, 12)) is the monthly peak power of each profile. 
+    schedules are the rates' energy TOU periods (see 
+    DatabaseRates.get_schedules) and energy their StructureArrays, in the 
+    same order.
+
+    Energy of each month and period fills the tiers with monthly max usage
+    ('kWh', or 'kWh/kW' times the month's peak power) in order; energy of 
+    each day and period separately fills the 'kWh daily' tiers (see 
+    allocate_tiers). Tier cells w/o any values are skipped. Rates with 
+    missing or malformed schedules cost NaN. 
+    """
+
+    energy_kwh = np.asarray(energy_kwh, dtype='float64').reshape(len(hourly_calendar_df), -1)
+    n_hours, n_profiles = energy_kwh.shape
+    month_idxs = hourly_calendar_df['month'].values - 1
+    day_types = np.where(hourly_calendar_df['weekday'].values < 5, 0, 1)
+    hours = hourly_calendar_df['hour'].values
+    day_idxs = pd.factorize(pd.MultiIndex.from_arrays([month_idxs, hourly_calendar_df['day'].values]))[0]
+    n_days = day_idxs.max() + 1 if n_hours > 0 else 0
+
+    n_rates, n_periods, n_tiers = energy.shape
+    units = {unit: code for code, unit in enumerate(energy.units)}
+    cells = energy.valid & energy.tier_mask()
+    is_daily = energy.unit == units.get('kWh daily', -2)
+    per_kw = np.where(energy.unit == units.get('kWh/kW', -2), 1., 0.)
+    
+    costs = np.full((n_rates, n_profiles), np.nan)
+    valid = (schedules >= 0).all(axis=(1, 2, 3))
+    chunk_size = max(1, chunk_elements // max(1, n_hours * max(1, n_profiles)))
+    
+    def period_sums(idx, periods, group_idxs, n_groups):
+        # energy by rate, group (month or day), period, profile
+        in_range = periods < n_periods
+        keys = ((np.arange(len(idx))[:, np.newaxis] * n_groups + group_idxs) * n_periods + periods)[in_range]
+        sums = np.empty((len(idx) * n_groups * n_periods, n_profiles))
+        for j in range(n_profiles):
+            weights = np.broadcast_to(energy_kwh[:, j], periods.shape)[in_range]
+            sums[:, j] = np.bincount(keys, weights=weights, minlength=sums.shape[0])
+        
+        return sums.reshape(len(idx), n_groups, n_periods, n_profiles)
+
+    for start in range(0, n_rates, chunk_size):
+        idx = np.arange(start, min(start + chunk_size, n_rates))
+        idx = idx[valid[idx]]
+        periods = schedules[idx][:, day_types, month_idxs, hours].astype(int)
+        
+        monthly = period_sums(idx, periods, month_idxs, 12)
+        chain = (cells[idx] & ~is_daily[idx])[:, np.newaxis]
+        rates = energy.rate[idx][:, np.newaxis]
+        for j in range(n_profiles):
+            tier_max = energy.max[idx][:, np.newaxis] * np.where(per_kw[idx][:, np.newaxis], peak_pwr[j][:, np.newaxis, np.newaxis], 1)
+            costs[idx, j] = (rates * allocate_tiers(monthly[..., j], tier_max, chain)).sum(axis=(1, 2, 3))
+
+        daily_rates = (cells[idx] & is_daily[idx]).any(axis=(1, 2))
+        if daily_rates.any():
+            sub = np.flatnonzero(daily_rates)
+            daily = period_sums(idx[sub], periods[sub], day_idxs, n_days)
+            chain = (cells[idx[sub]] & is_daily[idx[sub]])[:, np.newaxis]
+            rates = energy.rate[idx[sub]][:, np.newaxis]
+            for j in range(n_profiles):
+                amounts = allocate_tiers(daily[..., j], energy.max[idx[sub]][:, np.newaxis], chain)
+                costs[idx[sub], j] += (rates * amounts).sum(axis=(1, 2, 3))
+
+    return costs
+
+def period_average_rates(energy):
+    """
+    Returns float64 array of shape (n_rates, n_periods) of the average rate
+    (rate + adj) of the tiers of each period of energy (StructureArrays), 
+    over tier cells w/ any values. Periods w/o such cells are NaN.
+    """
+
+    cells = energy.valid & energy.tier_mask()
+    with np.errstate(invalid='ignore'):
+        return np.where(cells, energy.rate, 0).sum(axis=2) / cells.sum(axis=2)
+
+def marginal_tier_rates(energy, household_kwh, ev_kwh, weights=None, chunk_elements=ENERGY_CHUNK_ELEMENTS):
+    """
+    Returns float64 array of shape (n_rates, n_periods) of the expected 
+    marginal price of EV energy in each period of energy (StructureArrays),
+    over a distribution of households: household_kwh (shape (n_samples,)) 
+    is the baseline monthly energy of each household, ev_kwh (scalar or 
+    shape (n_samples,)) the EV energy added to it, and weights (default: 
+    equal) the probability of each household. The baseline and baseline + 
+    EV energy each fill the tiers of the period in order (see 
+    allocate_tiers; 'kWh daily' maximums are scaled by DAYS_PER_MONTH), and
+    the EV energy is priced at the difference in cost. Periods w/o tier 
+    cells w/ any values are NaN. Rates are priced chunk_elements / 
+    (n_periods x n_samples x n_tiers) at a time.
+    """
+
+    household_kwh = np.atleast_1d(np.asarray(household_kwh, dtype='float64'))
+    ev_kwh = np.broadcast_to(np.asarray(ev_kwh, dtype='float64'), household_kwh.shape)
+    if (ev_kwh <= 0).any():
+        raise ValueError("ev_kwh must be positive!")
+
+    weights = np.ones(len(household_kwh)) if weights is None else np.asarray(weights, dtype='float64')
+    weights = weights / weights.sum()
+
+    n_rates, n_periods, n_tiers = energy.shape
+    n_samples = len(household_kwh)
+    cells = energy.valid & energy.tier_mask()
+    units = {unit: code for code, unit in enumerate(energy.units)}
+    tier_max = energy.max * np.where(energy.unit == units.get('kWh daily', -2), DAYS_PER_MONTH, 1)
+
+    prices = np.full((n_rates, n_periods), np.nan)
+    chunk_size = max(1, chunk_elements // max(1, n_periods * n_samples * n_tiers))
+    for start in range(0, n_rates, chunk_size):
+        idx = np.arange(start, min(start + chunk_size, n_rates))
+        chain = cells[idx][:, :, np.newaxis]
+        chunk_max = tier_max[idx][:, :, np.newaxis]
+        rates = energy.rate[idx][:, :, np.newaxis]
+        
+        usage = np.broadcast_to(household_kwh, (len(idx), n_periods, n_samples))
+        base_cost = (rates * allocate_tiers(usage, chunk_max, chain)).sum(axis=3)
+        total_cost = (rates * allocate_tiers(usage + ev_kwh, chunk_max, chain)).sum(axis=3)
+        prices[idx] = ((total_cost - base_cost) / ev_kwh) @ weights
+
+    prices[~cells.any(axis=2)] = np.nan
+
+    return prices
+
+def cheapest_period_cost(schedules, period_rates, day_weights=DAY_TYPE_WEIGHTS, window_hours=1):
+    """
+    Returns float64 array of the annual average cost per kWh of each rate 
+    when charging always occurs in the cheapest window of window_hours 
+    consecutive hours (wrapping past midnight) of each month and day type:
+    the cheapest average of period_rates (shape (n_rates, n_periods), NaN 
+    where not billed; e.g. period_average_rates) over the windows of the 
+    rates' TOU schedules (see DatabaseRates.get_schedules), weighted by 
+    day_weights and averaged over months. For window_hours=1, this is the 
+    cheapest period of each month and day type. Windows w/ hours that are 
+    not billed are skipped, and month & day types w/o any window count as 
+    0. Rates with missing or malformed schedules are NaN.
+    """
+
+    if not 1 <= window_hours <= 24:
+        raise ValueError("window_hours must be between 1 and 24!")
+
+    n_rates, n_periods = period_rates.shape
+    padded = np.concatenate([period_rates, np.full((n_rates, 1), np.nan)], axis=1)
+    periods = np.where(schedules < n_periods, schedules, n_periods).astype(int)
+    rows = np.arange(n_rates)[:, np.newaxis, np.newaxis, np.newaxis]
+
+    hourly_rates = padded[rows, np.maximum(periods, 0)]
+    if window_hours > 1:
+        window_rates = hourly_rates.copy()
+        for shift in range(1, window_hours):
+            window_rates += np.roll(hourly_rates, -shift, axis=3) #window starting at each hour
+        hourly_rates = window_rates / window_hours
+
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning) #all-NaN days
+        day_rates = np.nanmin(hourly_rates, axis=3)
+
+    monthly_rates = np.nansum(day_rates * day_weights[:, np.newaxis], axis=1)
+    costs = monthly_rates.mean(axis=1)
+    costs[~(schedules >= 0).all(axis=(1, 2, 3))] = np.nan
+
+    return costs
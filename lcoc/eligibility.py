@@ -0,0 +1,87 @@
+"""
+EligibilityIndex object for querying which commercial URDB rates accept a
+load profile's monthly peak power and energy.
+"""
+#public
+import numpy as np
+import pandas as pd
+
+#settings
+LIMIT_COLS = ['peakkwcapacitymin', 'peakkwcapacitymax', 'peakkwhusagemin', 'peakkwhusagemax']
+
+class EligibilityIndex(object):
+    """
+    Index of the service limits of a set of rates (e.g.
+    DatabaseRates.com_rate_data w/ 'peakkwcapacitymin', 'peakkwcapacitymax',
+    'peakkwhusagemin', and 'peakkwhusagemax' columns). Rates are grouped by
+    their distinct limits, which a few standard tariff limits dominate, and
+    the groups are sorted by each limit. A query finds the groups that 
+    pass each limit w/ a binary search and only checks the smallest of 
+    those candidate sets against the other limits, so it takes O(log 
+    n_groups) plus the size of that set; it is linear in the number of 
+    groups only when every limit passes most groups. Rates w/ a NULL limit
+    are never eligible. The rates are not modified.
+
+    Attributes
+    -----------
+    labels:
+        pandas.Index of rate labels, in the order of the rates
+    limits:
+        float64 array of shape (n_groups, 4), distinct [peakkwcapacitymin,
+        peakkwcapacitymax, peakkwhusagemin, peakkwhusagemax] of the rates
+    """
+
+    def __init__(self, rates):
+        self.labels = pd.Index(rates['label'])
+        limits = rates[LIMIT_COLS].to_numpy(dtype='float64')
+        indexed = np.flatnonzero(~np.isnan(limits).any(axis=1))
+
+        self.limits, groups = np.unique(limits[indexed], axis=0, return_inverse=True)
+        groups = groups.ravel()
+        order = np.argsort(groups, kind='stable')
+        self._positions = indexed[order]
+        self._offsets = np.searchsorted(groups[order], np.arange(len(self.limits) + 1))
+
+        # Groups sorted by each limit, for the binary searches of query
+        self._limit_orders = np.argsort(self.limits, axis=0, kind='stable').T
+        self._sorted_limits = np.take_along_axis(self.limits, self._limit_orders.T, axis=0).T
+
+    def __len__(self):
+        return len(self.labels)
+
+    def query(self, min_peak_kw, max_peak_kw, min_energy_kwh, max_energy_kwh):
+        """
+        Returns sorted int array of the positions of the rates that accept
+        monthly peaks in [min_peak_kw, max_peak_kw] and monthly energy in
+        [min_energy_kwh, max_energy_kwh] ('peakkwcapacitymin' <= min_peak_kw,
+        'peakkwcapacitymax' >= max_peak_kw, and likewise for 'peakkwhusage').
+        """
+
+        # Groups passing each limit: a prefix of the groups sorted by a min 
+        # limit, a suffix of those sorted by a max limit
+        candidates = []
+        for k, (value, is_min) in enumerate([(min_peak_kw, True), (max_peak_kw, False),
+                                             (min_energy_kwh, True), (max_energy_kwh, False)]):
+            if is_min:
+                candidates.append(self._limit_orders[k][:np.searchsorted(self._sorted_limits[k], value, side='right')])
+            else:
+                candidates.append(self._limit_orders[k][np.searchsorted(self._sorted_limits[k], value, side='left'):])
+
+        groups = min(candidates, key=len)
+        limits = self.limits[groups]
+        accepts = ((limits[:, 0] <= min_peak_kw) & (limits[:, 1] >= max_peak_kw) &
+                   (limits[:, 2] <= min_energy_kwh) & (limits[:, 3] >= max_energy_kwh))
+
+        positions = [self._positions[self._offsets[g]:self._offsets[g + 1]] for g in groups[accepts]]
+
+        return np.sort(np.concatenate(positions)) if positions else np.array([], dtype=int)
+
+    def eligible(self, profile):
+        """
+        Returns sorted int array of the positions of the rates that accept
+        profile (profiles.LoadProfile), by its monthly peak power and energy
+        (see query).
+        """
+
+        return self.query(profile.monthly_peak_kw.min(), profile.monthly_peak_kw.max(),
+                          profile.monthly_energy_kwh.min(), profile.monthly_energy_kwh.max())
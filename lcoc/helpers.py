@@ -2,7 +2,14 @@
 Helper functions for working with data.
 """
 #public
+import os
+import re
+import json
 import datetime
+import hashlib
+import functools
+import numpy as np
+import pandas as pd
 
 def contains_filter_phrases(description, filter_phrases):
     """
@@ -14,6 +21,62 @@ def contains_filter_phrases(description, filter_phrases):
         contains = any([phrase.lower() in  description.lower() for phrase in filter_phrases])       
     return contains
 
+def _phrase_trie_regex(node):
+    """
+    Returns regex string matching the phrases of a character trie (nested 
+    dict, '' marks the end of a phrase), preferring the longest phrase.
+    """
+    alternatives = [re.escape(char) + _phrase_trie_regex(child) for char, child in sorted(node.items()) if char != '']
+    if len(alternatives) == 0:
+        return ''
+
+    if (len(alternatives) == 1) and ('' not in node):
+        return alternatives[0]
+    
+    regex = '(?:{})'.format('|'.join(alternatives))
+    if '' in node:
+        regex += '?'
+
+    return regex
+
+@functools.lru_cache(maxsize=None)
+def compile_filter_phrases(filter_phrases):
+    """
+    Returns (compiled regex, dict of lowercase phrase: phrase) for the tuple 
+    filter_phrases. The regex matches any lowercased phrase (the longest one 
+    at a position) and is compiled once per distinct list of phrases. 
+    Phrases are merged into a character trie so a description is scanned 
+    once rather than once per phrase.
+    """
+    phrases, trie = {}, {}
+    for phrase in filter_phrases:
+        phrases.setdefault(phrase.lower(), phrase)
+        node = trie
+        for char in phrase.lower():
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    pattern = re.compile('({})'.format(_phrase_trie_regex(trie)))
+    
+    return pattern, phrases
+
+def find_filter_phrases(descriptions, filter_phrases):
+    """
+    Vectorized contains_filter_phrases over descriptions (iterable of 
+    str/NaN). Returns pandas.Series, aligned with descriptions, of the filter 
+    phrase found in each description (the longest at the earliest position, 
+    as written in filter_phrases), NaN where contains_filter_phrases is False.
+    """
+    pattern, phrases = compile_filter_phrases(tuple(filter_phrases))
+    descriptions = pd.Series(descriptions, dtype=object)
+    descriptions = descriptions.where(descriptions.map(lambda x: not isinstance(x, float)))
+    if len(phrases) == 0:
+        return pd.Series(np.nan, index=descriptions.index, dtype=object)
+
+    found = descriptions.str.lower().str.extract(pattern, expand=False)
+    
+    return found.map(phrases)
+
 def todays_date():
     """
     Returns today's date in YYYYMMDD format.
@@ -22,3 +85,145 @@ def todays_date():
     date_str = "{0}{1}{2}".format(now.year, now.strftime('%m').zfill(2), now.strftime('%d').zfill(2))
 
     return date_str
+
+def file_digest(filepath, chunk_size=2**20):
+    """
+    Returns SHA-256 hex digest of the contents of filepath, read in chunks of
+    chunk_size bytes.
+    """
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+def array_digest(*arrays):
+    """
+    Returns SHA-256 hex digest of the dtypes, shapes, and contents of numpy 
+    arrays (pandas objects are hashed by their values).
+    """
+    sha = hashlib.sha256()
+    for arr in arrays:
+        if isinstance(arr, (pd.DataFrame, pd.Series)):
+            arr = pd.util.hash_pandas_object(arr, index=False).values
+        
+        arr = np.ascontiguousarray(arr)
+        sha.update(f'{arr.dtype.str}{arr.shape}'.encode())
+        sha.update(arr.tobytes() if arr.dtype != object else repr(arr.tolist()).encode())
+
+    return sha.hexdigest()
+
+def available_memory():
+    """
+    Returns the bytes of memory available for new allocations without 
+    swapping ('MemAvailable' of /proc/meminfo, or the available physical 
+    pages from os.sysconf where there is no /proc), None if unknown.
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def parse_schedule(schedule):
+    """
+    Parses one URDB schedule string of period indices by month and hour, 
+    e.g. '[[0, 0, ...], ..., [0, 0, ...]]', into int8 array of shape (12, 24).
+    'L' suffixes (Python 2 longs) are removed and 25-element month rows drop 
+    their leading element. Returns None if schedule is missing or malformed.
+    """
+    if not isinstance(schedule, str):
+        return None
+
+    try:
+        months = json.loads(schedule.replace('L', ''))
+        months = [month[1:] if len(month)==25 else month for month in months]
+        periods = np.array(months, dtype=np.int16)
+    except (ValueError, TypeError):
+        return None
+
+    if (periods.shape != (12, 24)) or (periods.min() < 0) or (periods.max() > 127):
+        return None
+
+    return periods.astype(np.int8)
+
+def parse_schedules(weekday_schedules, weekend_schedules):
+    """
+    Parses iterables of weekday and weekend URDB schedule strings into int8 
+    array of shape (n_rates, 2, 12, 24) indexed by [rate, day type (0 = 
+    weekday, 1 = weekend), month - 1, hour]. Missing or malformed schedules 
+    are filled with -1. Each distinct schedule string is parsed once.
+    """
+    weekday_schedules, weekend_schedules = list(weekday_schedules), list(weekend_schedules)
+    periods = np.full((len(weekday_schedules), 2, 12, 24), -1, dtype=np.int8)
+    parsed_schedules = {}
+    for i, (wkday, wkend) in enumerate(zip(weekday_schedules, weekend_schedules)):
+        for day_type, schedule in enumerate([wkday, wkend]):
+            if schedule not in parsed_schedules:
+                parsed_schedules[schedule] = parse_schedule(schedule)
+            
+            parsed = parsed_schedules[schedule]
+            if parsed is not None:
+                periods[i, day_type] = parsed
+
+    return periods
+
+
+SIMPLE_SCHEDULE = re.compile(r'[\[\], 0-9]*\]\]')
+
+def simple_schedule_mask(schedules):
+    """
+    Returns bool numpy array, True for URDB schedule strings made up only of 
+    brackets, commas, spaces and digits with 12 x 24 elements (no 'L' 
+    suffixes, 25-element rows, or other characters). Where such a string 
+    also parses to single-digit periods (see parse_schedule), classify_schedule 
+    agrees with checks on the parsed periods.
+    """
+    schedules = [s if isinstance(s, str) else '' for s in schedules]
+    return np.array([(s.count(',') == 12*24 - 1) and (SIMPLE_SCHEDULE.fullmatch(s) is not None) for s in schedules], dtype=bool)
+
+def classify_schedule(weekday_schedule, weekend_schedule):
+    """
+    Returns (is_seasonal, is_tou) of a rate from its URDB weekday and weekend 
+    schedule strings by comparing the characters of each month. A rate is 
+    seasonal if any month differs from the others and TOU if any month has 
+    more than one character (period). Returns (np.nan, np.nan) if the 
+    schedules cannot be compared.
+    """
+    try:
+        year_wkdays = [ls.replace('[', '').replace(',', '').replace(' ', '') for ls in str(weekday_schedule).split(']')][:-2]
+        year_wknds = [ls.replace('[', '').replace(',', '').replace(' ', '') for ls in str(weekend_schedule).split(']')][:-2]
+
+        #seasonal
+        if (len(set(year_wkdays))>1) or (len(set(year_wknds))>1):
+            seasonal=1
+        else:
+            seasonal=0
+
+        #TOU
+        tous =[]
+        for wkday_month, wknd_month in zip(year_wkdays, year_wknds):
+            if (len(set(wkday_month))>1) or (len(set(wknd_month))>1):
+                tous.append(1)
+            
+            else:
+                tous.append(0)
+        
+        if np.array(tous).sum()==0:
+            tou=0
+        
+        else:
+            tou=1
+
+    except:
+        seasonal, tou = np.nan, np.nan
+
+    return seasonal, tou
@@ -809,7 +809,7 @@ def dcfc_rates_to_utils(urdb_rates_files = config.DCFC_PROFILES_DICT,
         cost_col = "{}_lvl_cost_per_kwh".format(prof)
         rates_df = rates_df[['eiaid', cost_col]]
         utils_df = rates_df.groupby('eiaid')[cost_col].min().reset_index()
-        outfile = os.path.join(outpath,'dcfc_utils_{prof}.csv'.format(prof))
+        outfile = os.path.join(outpath,'dcfc_utils_{}.csv'.format(prof))
         outfolder = Path(outfile).parent.resolve()
         if not os.path.exists(outfolder):
             os.mkdir(outfolder)
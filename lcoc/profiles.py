@@ -0,0 +1,177 @@
+"""
+LoadProfile object of the billing determinants of annual 15-min load
+profiles (e.g. config.DCFC_PROFILES_DICT).
+"""
+#public
+import numpy as np
+import pandas as pd
+
+#private
+import lcoc.readwrite as readwrite
+import lcoc.helpers as helpers
+
+class LoadProfile(object):
+    """
+    Billing determinants of an annual 15-min load profile (pandas.DataFrame
+    w/ datetime index and 'Power, kW' column), computed once as compact
+    arrays. Intervals are ordered by month, day, hour, and minute. Day types
+    are 0 (weekday) and 1 (weekend). Use LoadProfile.from_csv to cache the
+    determinants next to a profile .csv.
+
+    Attributes
+    -----------
+    hourly_energy_df:
+        pandas.DataFrame ['month', 'day', 'hour', 'weekday', 'energy_kwh']
+        of energy by hour, ordered by time
+    monthly_energy_kwh:
+        float64 array of energy by month
+    monthly_peak_kw:
+        float64 array of peak power by month
+    peak_timestamps:
+        datetime64 array of the first 15-min interval at each month's peak
+    peak_weekdays:
+        int array of the weekday (0 = Monday) of peak_timestamps
+    peak_hours:
+        int array of the hour of peak_timestamps
+    peak_intervals_df:
+        pandas.DataFrame ['month', 'pwr_kw', 'hour', 'weekday'] of every
+        15-min interval at its month's peak
+    energy_by_tou_hour:
+        float64 array of shape (12, 2, 24), energy by month, day type, and
+        hour (the cells of URDB TOU schedules)
+    peak_by_tou_hour:
+        float64 array of shape (12, 2, 24), peak power by month, day type,
+        and hour (NaN w/o intervals)
+    daily_energy_kwh:
+        float64 array of shape (n_days, 24), energy by day of
+        hourly_energy_df and hour
+    annual_energy_kwh:
+        float, total energy
+    """
+
+    def __init__(self, profile_df=None, arrays=None):
+        if arrays is None:
+            arrays = self._compute(profile_df)
+
+        self._set_arrays(arrays)
+
+    @staticmethod
+    def _compute(profile_df):
+        timestamps = profile_df.index
+        order = np.lexsort((timestamps.minute, timestamps.hour, timestamps.day, timestamps.month))
+        timestamps = timestamps[order]
+        pwr_kw = profile_df['Power, kW'].values[order].astype('float64')
+        month_idxs = timestamps.month.values - 1
+        day_types = np.where(timestamps.weekday.values <= 4, 0, 1)
+
+        # Aggregate 15-min energy profile -> hourly, monthly energy profile
+        energy_profile_df = pd.DataFrame({'month': timestamps.month,
+                                          'day': timestamps.day,
+                                          'hour': timestamps.hour,
+                                          'weekday': timestamps.weekday,
+                                          'energy_kwh': pwr_kw/4})
+        hourly_energy_df = energy_profile_df.groupby(['month', 'day', 'hour', 'weekday'])['energy_kwh'].sum()
+        hourly_energy_df = hourly_energy_df.reset_index()
+        monthly_energy = hourly_energy_df.groupby('month')['energy_kwh'].sum()
+
+        # Peak power by month, first interval at peak
+        monthly_peak_kw = pd.Series(pwr_kw).groupby(month_idxs).max()
+        at_peak = np.flatnonzero(pwr_kw == monthly_peak_kw.reindex(month_idxs).values)
+        _, first = np.unique(month_idxs[at_peak], return_index=True)
+        first = at_peak[first]
+
+        # Energy & peak power by TOU schedule cell
+        cells = ((hourly_energy_df['month'].values - 1)*2 + np.where(hourly_energy_df['weekday'].values <= 4, 0, 1))*24 + hourly_energy_df['hour'].values
+        energy_by_tou_hour = np.bincount(cells, weights=hourly_energy_df['energy_kwh'].values, minlength=12*2*24)
+        peak_by_tou_hour = np.full(12*2*24, -np.inf)
+        np.maximum.at(peak_by_tou_hour, (month_idxs*2 + day_types)*24 + timestamps.hour.values, pwr_kw)
+        peak_by_tou_hour[np.isinf(peak_by_tou_hour)] = np.nan
+
+        # Daily energy by hour
+        day_idxs = pd.factorize(pd.MultiIndex.from_arrays([hourly_energy_df['month'], hourly_energy_df['day']]))[0]
+        daily_energy_kwh = np.zeros((day_idxs.max() + 1 if len(day_idxs) else 0, 24))
+        daily_energy_kwh[day_idxs, hourly_energy_df['hour'].values] = hourly_energy_df['energy_kwh'].values
+
+        arrays = {col: hourly_energy_df[col].values for col in hourly_energy_df.columns}
+        arrays.update({'monthly_energy_kwh': monthly_energy.values,
+                       'monthly_peak_kw': monthly_peak_kw.values,
+                       'peak_timestamps': timestamps[first].values,
+                       'peak_weekdays': timestamps.weekday.values[first],
+                       'peak_hours': timestamps.hour.values[first],
+                       'peak_interval_months': timestamps.month.values[at_peak],
+                       'peak_interval_hours': timestamps.hour.values[at_peak],
+                       'peak_interval_weekdays': timestamps.weekday.values[at_peak],
+                       'energy_by_tou_hour': energy_by_tou_hour.reshape(12, 2, 24),
+                       'peak_by_tou_hour': peak_by_tou_hour.reshape(12, 2, 24),
+                       'daily_energy_kwh': daily_energy_kwh,
+                       'annual_energy_kwh': np.array(monthly_energy.sum())})
+
+        return arrays
+
+    def _set_arrays(self, arrays):
+        self._arrays = arrays
+        self.hourly_energy_df = pd.DataFrame({col: arrays[col] for col in ['month', 'day', 'hour', 'weekday', 'energy_kwh']})
+        self.peak_intervals_df = pd.DataFrame({'month': arrays['peak_interval_months'],
+                                               'pwr_kw': arrays['monthly_peak_kw'][arrays['peak_interval_months'] - 1],
+                                               'hour': arrays['peak_interval_hours'],
+                                               'weekday': arrays['peak_interval_weekdays']})
+        for name in ['monthly_energy_kwh', 'monthly_peak_kw', 'peak_timestamps', 'peak_weekdays', 'peak_hours',
+                     'energy_by_tou_hour', 'peak_by_tou_hour', 'daily_energy_kwh']:
+            setattr(self, name, arrays[name])
+
+        self.annual_energy_kwh = float(arrays['annual_energy_kwh'])
+
+    @classmethod
+    def from_csv(cls, profile_file, cache=True):
+        """
+        Returns LoadProfile of the load profile .csv at profile_file. If
+        cache, determinants are read from (or, on the first call, written to)
+        the cache next to profile_file (see readwrite.profile_cache_file);
+        the cache is rebuilt when the contents of profile_file change.
+        """
+
+        if not cache:
+            return cls(pd.read_csv(profile_file, index_col=0, parse_dates=True))
+
+        cache_file = readwrite.profile_cache_file(profile_file)
+        digest = helpers.file_digest(profile_file)
+        arrays = readwrite.read_profile_cache(cache_file, digest)
+        if arrays is not None:
+            return cls(arrays=arrays)
+
+        profile = cls(pd.read_csv(profile_file, index_col=0, parse_dates=True))
+        readwrite.write_profile_cache(cache_file, digest, profile._arrays)
+
+        return profile
+
+    @property
+    def peak_day_types(self):
+        return np.where(self.peak_weekdays <= 4, 0, 1)
+
+    @property
+    def monthly_peak_pwr_df(self):
+        """
+        pandas.DataFrame ['month', 'pwr_kw', 'hour', 'day_type'] of every
+        15-min interval at its month's peak, day_type in ['weekday',
+        'weekend'] (see urdb.dcfc_costs_v2).
+        """
+
+        monthly_peak_pwr_df = self.peak_intervals_df.copy()
+        monthly_peak_pwr_df['day_type'] = np.where(monthly_peak_pwr_df['weekday']<=4,'weekday','weekend')
+
+        return monthly_peak_pwr_df.drop(columns='weekday')
+
+def load_profile(profile, cache=True):
+    """
+    Returns LoadProfile of profile, a LoadProfile, a 15-min load profile
+    (pandas.DataFrame w/ datetime index and 'Power, kW' column) or the path
+    of one saved as .csv (see LoadProfile.from_csv).
+    """
+
+    if isinstance(profile, LoadProfile):
+        return profile
+
+    elif isinstance(profile, pd.DataFrame):
+        return LoadProfile(profile)
+
+    return LoadProfile.from_csv(profile, cache=cache)
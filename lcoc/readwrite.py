@@ -3,14 +3,20 @@ I/O functions
 """
 #public
 import os
+import re
 import glob
-import gzip
+import json
+import mmap
+import pickle
+import shutil
+import tempfile
 import filecmp
 import urllib3
 import requests
 import subprocess
+import numpy as np
 import pandas as pd
-from io import BytesIO, StringIO
+from io import StringIO
 
 #private
 import lcoc.helpers as helpers
@@ -19,22 +25,619 @@ import config
 #settings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def read_urdb_data(source):
+URDB_STRUCTURE_COL = re.compile(r'^(energyratestructure|flatdemandstructure|demandratestructure|coincidentratestructure)/period(\d+)/tier(\d+)([a-z]+)$')
+URDB_CACHE_VERSION = 3
+PROFILE_CACHE_VERSION = 1
+
+def download_file(source, path, chunk_size=2**20, max_retries=5, timeout=60):
+    """
+    Streams the file at URL 'source' to 'path' in chunks of chunk_size bytes
+    and returns path. Data is written to path + '.part' first; if the 
+    connection drops, or a previous call was interrupted, the download 
+    resumes from the end of the .part file with an HTTP Range request (or 
+    starts over if the server ignores it). A .part file is only taken as 
+    complete if its size matches the total size reported by the server, and
+    starts over if it is larger. Gives up after max_retries failed attempts
+    in a row w/o progress.
+    """
+
+    part_path = path + '.part'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def part_size():
+        return os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    def content_range_total(response):
+        size = response.headers.get('Content-Range', '').split('/')[-1]
+        return int(size) if size.isdigit() else -1
+    
+    retries = 0
+    while True:
+        start = part_size()
+        headers = {'Range': 'bytes={}-'.format(start)} if start > 0 else {}
+        
+        try:
+            with requests.get(source, headers=headers, stream=True, verify=False, timeout=timeout) as response:
+                if (response.status_code == 416) and (start > 0): #.part complete, or larger than the file
+                    total = content_range_total(response)
+                    if total == start:
+                        break
+
+                    os.remove(part_path)
+                    raise requests.exceptions.ChunkedEncodingError('Partial download of {} does not match its size ({} bytes)'.format(source, total))
+                
+                assert response.ok, "HTTP Error: Response code {}".format(response.status_code)
+                
+                if response.status_code == 206:
+                    mode = 'ab'
+                    total = content_range_total(response)
+                
+                else: #Range ignored, start over
+                    mode, start = 'wb', 0
+                    total = int(response.headers.get('Content-Length', -1))
+                
+                with open(part_path, mode) as outfile:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        outfile.write(chunk)
+            
+            size = part_size()
+            if (total < 0) or (size == total):
+                break
+
+            if size > total:
+                os.remove(part_path)
+                raise requests.exceptions.ChunkedEncodingError('Download of {} exceeded its size ({} bytes)'.format(source, total))
+            
+            raise requests.exceptions.ChunkedEncodingError('Download of {} ended early'.format(source))
+        
+        except (requests.exceptions.ConnectionError, 
+                requests.exceptions.ChunkedEncodingError, 
+                requests.exceptions.Timeout) as err:
+            retries = 0 if part_size() > start else retries + 1
+            if retries > max_retries:
+                raise err
+    
+    os.replace(part_path, path)
+    
+    return path
+
+def read_urdb_data(source, download_path=None, chunksize=20000):
     """
     Function downloads, unpacks, and loads raw URDB rate data from 'source'
-    and returns a Pandas DataFrame containing this data.
+    and returns a Pandas DataFrame containing this data. The gzipped .csv is
+    streamed to download_path (default: data/urdb/downloads/, see 
+    download_file, which resumes interrupted downloads), then decompressed 
+    and parsed chunksize rows at a time, so the compressed file and the 
+    decompressed text are never held in memory.
+    """
+    
+    if download_path is None:
+        download_path = os.path.join(config.DATA_PATH, 'urdb', 'downloads', os.path.basename(source))
+
+    download_file(source, download_path)
+    
+    header = pd.read_csv(download_path, compression='gzip', nrows=0).columns
+    chunks = pd.read_csv(download_path, compression='gzip', dtype=urdb_dtypes(header), 
+                         chunksize=chunksize, low_memory=False)
+    df = pd.concat(chunks, ignore_index=True)
+    
+    return df
+
+def urdb_dtypes(columns):
+    """
+    Returns dict of column name: dtype for the URDB rate structure columns in
+    'columns'. Tier max, rate, adj, and sell values are float64 and tier units
+    are strings. Most structure columns are empty, so without this pandas 
+    infers their types column-by-column.
+    """
+
+    dtypes = {}
+    for col in columns:
+        match = URDB_STRUCTURE_COL.match(col)
+        if match is None:
+            continue
+        
+        if match.group(4) == 'unit':
+            dtypes[col] = str
+        
+        else:
+            dtypes[col] = 'float64'
+
+    return dtypes
+
+def urdb_cache_path(urdb_file, cache_dir=None):
+    """
+    Returns path of the columnar cache of the URDB .csv at urdb_file in 
+    cache_dir (default: 'cache' folder next to urdb_file), keyed by the 
+    SHA-256 of its contents, or None if cache_dir is False.
     """
+
+    if cache_dir is False:
+        return None
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(urdb_file)), 'cache')
+
+    digest = helpers.file_digest(urdb_file)
+    
+    return os.path.join(cache_dir, f'v{URDB_CACHE_VERSION}_{digest}')
+
+def read_urdb_csv(urdb_file, cache_dir=None, usecols=None, sectors=None, 
+                  active_only=False, chunksize=20000, cache_path=None):
+    """
+    Loads the URDB .csv at urdb_file and returns a Pandas DataFrame. The 
+    first load parses the .csv and stores a typed columnar copy in cache_dir
+    (default: 'cache' folder next to urdb_file) keyed by the SHA-256 of the
+    file contents; later loads of the same file read the columns they need
+    from that copy instead of re-parsing. Pass cache_dir=False to skip the cache, or 
+    cache_path (see urdb_cache_path) to skip hashing urdb_file again.
+
+    Projected loads read only the columns selected by usecols (list or 
+    callable on the column name), only rates in 'sectors', and, when 
+    active_only is True, only rates without an end date. The .csv is 
+    parsed in chunks of chunksize rows: each chunk is appended to the cache
+    (see UrdbCacheWriter) when it does not exist yet, and only its 
+    projected rows & columns are kept, so a projected load never holds the
+    full table in memory, w/ or w/o a cache. Column dtypes are those of 
+    the concatenated chunks.
+    """
+
+    projected = (usecols is not None) or (sectors is not None) or active_only
     
-    response = requests.get(source, verify=False)
-    code = response.status_code
-    assert response.ok, "HTTP Error: Response code {}".format(code)
-    bytes_io = BytesIO(response.content)
+    if cache_path is None:
+        cache_path = urdb_cache_path(urdb_file, cache_dir)
+
+    if (cache_path is not None) and os.path.exists(os.path.join(cache_path, 'manifest.json')):
+        return read_urdb_cache(cache_path, usecols=usecols, sectors=sectors, active_only=active_only)
+    
+    header = pd.read_csv(urdb_file, nrows=0).columns
+    if (cache_path is None) and not projected:
+        return pd.read_csv(urdb_file, dtype=urdb_dtypes(header), low_memory=False)
+
+    # Cache all columns (if cached) & keep the projected ones
+    cols = _select_columns(header, usecols, sectors, active_only)
+    read_cols = header if cache_path is not None else cols
+    writer = UrdbCacheWriter(cache_path) if cache_path is not None else None
+    chunks = []
+    try:
+        for chunk in pd.read_csv(urdb_file, usecols=read_cols, dtype=urdb_dtypes(read_cols), 
+                                 chunksize=chunksize, low_memory=False):
+            if writer is not None:
+                writer.append(chunk)
+            
+            if projected:
+                chunks.append(chunk.loc[_active_sector_mask(chunk, sectors, active_only), cols])
+    
+    except Exception:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if writer is not None:
+        writer.close(source=urdb_file, digest=os.path.basename(cache_path).split('_')[-1])
+        if not projected:
+            return read_urdb_cache(cache_path)
+    
+    df = pd.concat(chunks, ignore_index=True)
+    
+    return df[_select_columns(header, usecols)]
+
+def _select_columns(columns, usecols, sectors=None, active_only=False):
+    """
+    Returns list of columns selected by usecols (list, callable, or None for 
+    all columns) plus those needed for the sector and end date filters.
+    """
+
+    if usecols is None:
+        selected = list(columns)
+    
+    elif callable(usecols):
+        selected = [col for col in columns if usecols(col)]
+    
+    else:
+        selected = [col for col in columns if col in set(usecols)]
+    
+    if (sectors is not None) and ('sector' not in selected):
+        selected.append('sector')
+    
+    if active_only and ('enddate' not in selected):
+        selected.append('enddate')
+
+    return selected
+
+def _active_sector_mask(df, sectors, active_only):
+    """
+    Returns boolean mask of rows of df (pandas.DataFrame or dict of column 
+    arrays) in 'sectors' (all sectors if None) and, if active_only, without
+    an end date.
+    """
+
+    conditions = []
+    if sectors is not None:
+        conditions.append(pd.Series(df['sector'], copy=False).isin(sectors).values)
+    
+    if active_only:
+        conditions.append(pd.isnull(np.asarray(df['enddate'])))
+
+    return np.logical_and.reduce(conditions) if conditions else np.ones(len(df), dtype=bool)
+
+class UrdbCacheWriter(object):
+    """
+    Writes URDB rate data to a columnar cache at cache_path (see 
+    read_urdb_cache), one chunk of rows at a time (see append), so the 
+    full table need not be held in memory. The cache is written to a 
+    temporary folder and renamed into place by close, so concurrent jobs 
+    never read a partial cache.
+
+    Each column is stored in its own files, named by its position: numeric
+    and bool columns as raw arrays (col{i}.bin), object columns as the 
+    UTF-8 text of their values (col{i}.bytes), int64 offsets of each value 
+    in that text (col{i}.offsets, n_rows + 1), and uint8 codes of the 
+    value types (col{i}.kinds, see OBJECT_KINDS). A column whose dtype 
+    differs between chunks takes the common dtype pandas would give the 
+    concatenated chunks (e.g. int & float -> float, str & float -> object).
+
+    Attributes
+    -----------
+    cache_path:
+        Path the cache is renamed to by close
+    n_rows:
+        Number of rows appended so far
+    columns:
+        list of dicts {'name', 'dtype'} of the columns, in order
+    """
+
+    OBJECT_KINDS = {'null': 0, 'str': 1, 'float': 2, 'bool': 3, 'int': 4}
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        parent = os.path.dirname(cache_path)
+        os.makedirs(parent, exist_ok=True)
+        self._tmp_path = tempfile.mkdtemp(dir=parent, prefix='.tmp_')
+        self.n_rows = 0
+        self.columns = None
+
+    def _file(self, i, ext):
+        return os.path.join(self._tmp_path, f'col{i}.{ext}')
+
+    def _write_values(self, i, values, dtype):
+        if dtype != object:
+            with open(self._file(i, 'bin'), 'ab') as f:
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            return
+
+        values = np.asarray(values, dtype=object)
+        is_null = pd.isnull(values)
+        if pd.api.types.infer_dtype(values, skipna=True) in ['string', 'empty']: #str & NaN only
+            kinds = np.where(is_null, self.OBJECT_KINDS['null'], self.OBJECT_KINDS['str']).astype(np.uint8)
+            texts = [b'' if null else value.encode('utf-8') for value, null in zip(values.tolist(), is_null.tolist())]
+        
+        else:
+            kinds = np.empty(len(values), dtype=np.uint8)
+            texts = []
+            for j, value in enumerate(values):
+                if isinstance(value, str):
+                    kind, text = 'str', value
+                elif is_null[j]:
+                    kind, text = 'null', ''
+                elif isinstance(value, (bool, np.bool_)):
+                    kind, text = 'bool', str(bool(value))
+                elif isinstance(value, (int, np.integer)):
+                    kind, text = 'int', str(int(value))
+                elif isinstance(value, (float, np.floating)):
+                    kind, text = 'float', repr(float(value))
+                else:
+                    raise ValueError(f"Unsupported {type(value).__name__} value in URDB column {self.columns[i]['name']}!")
+                
+                kinds[j] = self.OBJECT_KINDS[kind]
+                texts.append(text.encode('utf-8'))
+
+        offsets_file = self._file(i, 'offsets')
+        new_file = not os.path.exists(offsets_file)
+        if new_file:
+            start = np.zeros(1, dtype=np.int64)
+        else: #continue from the end of the text so far
+            start = np.fromfile(offsets_file, dtype=np.int64, count=1, offset=os.path.getsize(offsets_file) - 8)
+        
+        offsets = start[0] + np.cumsum([len(text) for text in texts], dtype=np.int64)
+        with open(offsets_file, 'ab') as f:
+            if new_file:
+                f.write(start.tobytes())
+            f.write(offsets.tobytes())
+        
+        with open(self._file(i, 'kinds'), 'ab') as f:
+            f.write(kinds.tobytes())
+        
+        with open(self._file(i, 'bytes'), 'ab') as f:
+            f.write(b''.join(texts))
+
+    def _convert_column(self, i, dtype):
+        # Rewrites the rows appended so far as dtype
+        old_dtype = np.dtype(self.columns[i]['dtype'])
+        values = _read_cache_column(self._tmp_path, i, old_dtype, self.n_rows, slice(None))
+        for ext in ['bin', 'bytes', 'offsets', 'kinds']:
+            if os.path.exists(self._file(i, ext)):
+                os.remove(self._file(i, ext))
+        
+        self._write_values(i, values.astype(dtype), dtype)
+
+    def append(self, df):
+        """
+        Appends the rows of pandas.DataFrame df, which must have the same 
+        columns as the previous chunks.
+        """
+
+        if self.columns is None:
+            self.columns = [{'name': col, 'dtype': None} for col in df.columns]
         
-    with gzip.open(bytes_io, 'rt') as infile:
-        df = pd.read_csv(infile, low_memory=False)
+        if list(df.columns) != [c['name'] for c in self.columns]:
+            raise ValueError("URDB cache chunks must have the same columns!")
+
+        for i, (col, dtype) in enumerate(df.dtypes.items()):
+            dtype = np.dtype(dtype) if dtype.kind in 'iufb' else np.dtype(object)
+            old_dtype = self.columns[i]['dtype']
+            if old_dtype is not None:
+                old_dtype = np.dtype(old_dtype)
+                if (old_dtype.kind in 'iuf') and (dtype.kind in 'iuf'):
+                    dtype = np.result_type(old_dtype, dtype)
+                elif dtype != old_dtype:
+                    dtype = np.dtype(object)
+                
+                if (dtype != old_dtype) and (self.n_rows > 0):
+                    self._convert_column(i, dtype)
+
+            self.columns[i]['dtype'] = 'object' if dtype == object else dtype.name
+            self._write_values(i, df[col].values, dtype)
+
+        self.n_rows += len(df)
+
+    def close(self, source=None, digest=None):
+        """
+        Writes manifest.json (column names & dtypes, row count, source file,
+        and SHA-256 digest) and renames the cache into place.
+        """
+
+        manifest = {'version': URDB_CACHE_VERSION,
+                    'source': None if source is None else os.path.basename(source),
+                    'sha256': digest,
+                    'n_rows': self.n_rows,
+                    'columns': self.columns or []}
+        with open(os.path.join(self._tmp_path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+        try:
+            os.rename(self._tmp_path, self.cache_path)
+        except OSError: #cache built by another process in the meantime
+            self.abort()
+
+    def abort(self):
+        """
+        Deletes the partial cache.
+        """
+
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+
+def write_urdb_cache(df, cache_path, source=None, digest=None):
+    """
+    Stores URDB DataFrame df as a columnar cache at cache_path (see 
+    UrdbCacheWriter).
+    """
+
+    writer = UrdbCacheWriter(cache_path)
+    try:
+        writer.append(df)
+    except Exception:
+        writer.abort()
+        raise
+    
+    writer.close(source=source, digest=digest)
+
+def _read_cache_column(cache_path, i, dtype, n_rows, rows):
+    """
+    Returns numpy array of the rows (slice or int array of positions) of 
+    column i of dtype stored at cache_path (see UrdbCacheWriter). Files are
+    memory-mapped, so only the pages of the selected rows are read.
+    """
+
+    def open_array(ext, dtype, n):
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(cache_path, f'col{i}.{ext}'), dtype=dtype, mode='r', shape=(n,))
+
+    if dtype != object:
+        return np.array(open_array('bin', dtype, n_rows)[rows])
+
+    idx = np.arange(n_rows)[rows]
+    kinds = np.array(open_array('kinds', np.uint8, n_rows)[idx])
+    offsets = open_array('offsets', np.int64, n_rows + 1)
+    starts, ends = np.array(offsets[idx]).tolist(), np.array(offsets[idx + 1]).tolist()
+
+    kind_codes = UrdbCacheWriter.OBJECT_KINDS
+    parse = {kind_codes['float']: float, kind_codes['int']: int, kind_codes['bool']: lambda text: text == 'True'}
+    values = np.full(len(idx), np.nan, dtype=object)
+    
+    def decode(text):
+        is_str = np.flatnonzero(kinds == kind_codes['str'])
+        values[is_str] = [str(text[starts[j]:ends[j]], 'utf-8') for j in is_str.tolist()]
+        for j in np.flatnonzero(kinds > kind_codes['str']).tolist():
+            values[j] = parse[int(kinds[j])](str(text[starts[j]:ends[j]], 'utf-8'))
+
+    text_file = os.path.join(cache_path, f'col{i}.bytes')
+    if os.path.getsize(text_file) == 0: #empty files cannot be mapped
+        decode(b'')
     
+    else:
+        with open(text_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as text:
+            decode(text)
+
+    return values
+
+def read_urdb_cache(cache_path, usecols=None, sectors=None, active_only=False):
+    """
+    Loads URDB DataFrame from the columnar cache at cache_path (see 
+    UrdbCacheWriter). The files of the selected columns are opened 
+    memory-mapped, so only their pages are read from disk, and only the 
+    selected rows of object columns are decoded; those rows are copied 
+    into the DataFrame, which is not backed by the cache files. The 
+    usecols, sectors, and active_only arguments project the load as in 
+    read_urdb_csv.
+    """
+
+    with open(os.path.join(cache_path, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    
+    assert manifest['version'] == URDB_CACHE_VERSION, "Unexpected URDB cache version {}".format(manifest['version'])
+
+    col_info = {c['name']: (i, np.dtype(c['dtype'])) for i, c in enumerate(manifest['columns'])}
+    names = [c['name'] for c in manifest['columns']]
+    selected = _select_columns(names, usecols)
+    n_rows = manifest['n_rows']
+
+    def load_column(name, rows):
+        return _read_cache_column(cache_path, *col_info[name], n_rows, rows)
+
+    filter_cols = (['sector'] if sectors is not None else []) + (['enddate'] if active_only else [])
+    rows = slice(None)
+    if filter_cols:
+        mask = _active_sector_mask({name: load_column(name, rows) for name in filter_cols}, sectors, active_only)
+        if not mask.all():
+            rows = np.flatnonzero(mask)
+
+    df = pd.DataFrame({name: load_column(name, rows) for name in selected}, columns=selected)
+
     return df
 
+def read_urdb_schedules(cache_path, kind):
+    """
+    Returns (labels, schedules) of the parsed 'energy' or 'demand' schedules 
+    stored with the URDB cache at cache_path (see write_urdb_schedules), or 
+    None if there are none.
+    """
+
+    schedules_file = os.path.join(cache_path, f'schedules_{kind}.npz')
+    if not os.path.exists(schedules_file):
+        return None
+
+    with np.load(schedules_file) as npz:
+        return npz['labels'], npz['schedules']
+
+def write_urdb_schedules(cache_path, kind, labels, schedules):
+    """
+    Stores int8 array 'schedules' of parsed 'energy' or 'demand' schedules 
+    (n_rates, 2, 12, 24) for URDB 'labels' with the URDB cache at 
+    cache_path. Does nothing if the cache has not been built.
+    """
+
+    if not os.path.exists(os.path.join(cache_path, 'manifest.json')):
+        return
+
+    fd, tmp_file = tempfile.mkstemp(dir=cache_path, prefix='.tmp_', suffix='.npz')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, labels=np.asarray(labels, dtype=str), schedules=schedules)
+    
+    os.replace(tmp_file, os.path.join(cache_path, f'schedules_{kind}.npz'))
+
+def profile_cache_file(profile_file):
+    """
+    Returns path of the billing-determinant cache of the load profile .csv 
+    at profile_file, stored next to it (e.g. 'dcfc_p1.determinants.npz').
+    """
+
+    return os.path.splitext(profile_file)[0] + '.determinants.npz'
+
+def read_profile_cache(cache_file, digest):
+    """
+    Returns dict of the arrays stored in the load profile cache_file (see 
+    write_profile_cache), or None if there is none or it was written for 
+    another version of the cache or a profile .csv w/ another SHA-256 digest.
+    """
+
+    if not os.path.exists(cache_file):
+        return None
+
+    with np.load(cache_file, allow_pickle=False) as npz:
+        if (npz['version'] != PROFILE_CACHE_VERSION) or (str(npz['digest']) != digest):
+            return None
+        
+        return {name: npz[name] for name in npz.files if name not in ['version', 'digest']}
+
+def write_profile_cache(cache_file, digest, arrays):
+    """
+    Stores dict of numpy arrays as the cache of the load profile .csv w/ 
+    SHA-256 digest at cache_file (see read_profile_cache).
+    """
+
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_file)), prefix='.tmp_', suffix='.npz')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, version=PROFILE_CACHE_VERSION, digest=digest, **arrays)
+    
+    os.replace(tmp_file, cache_file)
+
+def _write_json(path, obj):
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_', suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(obj, f)
+    
+    os.replace(tmp_file, path)
+
+def open_checkpoint(checkpoint_path, input_hash):
+    """
+    Returns sorted list of the ids of the batches completed in the 
+    checkpoint directory checkpoint_path (see write_checkpoint_batch). The
+    checkpoint's manifest.json records the input_hash of the calculation; if
+    it is missing or was written for other inputs, the stale batches are 
+    deleted and an empty checkpoint for input_hash is started. Batches whose
+    files are missing are not counted as completed.
+    """
+
+    os.makedirs(checkpoint_path, exist_ok=True)
+    manifest_file = os.path.join(checkpoint_path, 'manifest.json')
+    
+    manifest = None
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+    
+    if (manifest is None) or (manifest.get('input_hash') != input_hash):
+        for batch_file in glob.glob(os.path.join(checkpoint_path, 'batch_*.pkl')):
+            os.remove(batch_file)
+        
+        manifest = {'input_hash': input_hash, 'completed': []}
+        _write_json(manifest_file, manifest)
+
+    return sorted(batch_id for batch_id in manifest['completed'] 
+                  if os.path.exists(os.path.join(checkpoint_path, f'batch_{batch_id:05d}.pkl')))
+
+def write_checkpoint_batch(checkpoint_path, batch_id, df):
+    """
+    Stores pandas.DataFrame df, the result of batch batch_id, in the 
+    checkpoint directory checkpoint_path (see open_checkpoint) and records 
+    the batch as completed in its manifest.json. Files are written to 
+    temporary names first, so an interrupted write leaves no partial batch.
+    """
+
+    fd, tmp_file = tempfile.mkstemp(dir=checkpoint_path, prefix='.tmp_', suffix='.pkl')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    os.replace(tmp_file, os.path.join(checkpoint_path, f'batch_{batch_id:05d}.pkl'))
+
+    manifest_file = os.path.join(checkpoint_path, 'manifest.json')
+    with open(manifest_file, 'r') as f:
+        manifest = json.load(f)
+    
+    manifest['completed'] = sorted(set(manifest['completed']) | {batch_id})
+    _write_json(manifest_file, manifest)
+
+def read_checkpoint_batch(checkpoint_path, batch_id):
+    """
+    Returns the pandas.DataFrame stored for batch batch_id in the checkpoint
+    directory checkpoint_path (see write_checkpoint_batch).
+    """
+
+    with open(os.path.join(checkpoint_path, f'batch_{batch_id:05d}.pkl'), 'rb') as f:
+        return pickle.load(f)
+
 def write_urdb_rate_data(urdb_rate_data, urdb_filepath = os.path.join(config.HOME_PATH,'data','urdb'), overwrite_identical=True):
     """
     Takes Pandas DataFrame containing URDB rate data and stores as .csv at
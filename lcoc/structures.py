@@ -0,0 +1,198 @@
+"""
+Dense array representation of URDB rate structures.
+"""
+#public
+import numpy as np
+import pandas as pd
+
+#private
+import lcoc.readwrite as readwrite
+
+#settings
+STRUCTURE_KINDS = {'energy': 'energyratestructure',
+                   'flatdemand': 'flatdemandstructure',
+                   'demand': 'demandratestructure'}
+
+FLAT_DEMAND_MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+                      'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+class StructureArrays(object):
+    """
+    One URDB rate structure (e.g. 'energyratestructure') of a set of rates
+    as numpy arrays of shape (n_rates, n_periods, n_tiers), padded past the
+    periods/tiers of the source columns.
+
+    Attributes
+    -----------
+    rate:
+        float64 array of rate + adj (NULL -> 0)
+    max:
+        float64 array of tier maximums (NULL -> inf)
+    has_rate:
+        bool array, True where rate is not NULL
+    valid:
+        bool array, True where any of rate, adj, max, or sell is not NULL
+    unit:
+        int8 array of codes into units (-1 when NULL or structure has no
+        unit columns)
+    units:
+        list of unit names, e.g. ['kWh', 'kWh daily', 'kWh/kW']
+    n_tiers:
+        int array of shape (n_periods,), number of tier columns of each
+        period in the source data (0 for padding)
+    """
+
+    def __init__(self, df, structure):
+        fields = {}
+        for col in df.columns:
+            match = readwrite.URDB_STRUCTURE_COL.match(col)
+            if (match is not None) and (match.group(1) == structure):
+                period, tier, field = int(match.group(2)), int(match.group(3)), match.group(4)
+                fields.setdefault(field, []).append((col, period, tier))
+
+        cells = [(p, t) for cols in fields.values() for _, p, t in cols]
+        n_periods = max([p for p, _ in cells], default=-1) + 1
+        n_tiers = max([t for _, t in cells], default=-1) + 1
+        shape = (len(df), n_periods, n_tiers)
+
+        self.n_tiers = np.zeros(n_periods, dtype=int)
+        for p, t in cells:
+            self.n_tiers[p] = max(self.n_tiers[p], t + 1)
+
+        def to_array(field, fill):
+            arr = np.full(shape, fill, dtype='float64')
+            if field in fields:
+                cols, periods, tiers = zip(*fields[field])
+                arr[:, list(periods), list(tiers)] = df[list(cols)].to_numpy(dtype='float64')
+            return arr
+
+        rate, adj = to_array('rate', np.nan), to_array('adj', np.nan)
+        self.has_rate = ~np.isnan(rate)
+        self.valid = self.has_rate | ~np.isnan(adj)
+        self.rate = np.nan_to_num(rate, nan=0) + np.nan_to_num(adj, nan=0)
+        del rate, adj
+
+        for field in ['max', 'sell']:
+            arr = to_array(field, np.nan)
+            self.valid |= ~np.isnan(arr)
+            if field == 'max':
+                self.max = np.where(np.isnan(arr), np.inf, arr)
+
+        self.unit = np.full(shape, -1, dtype=np.int8)
+        self.units = []
+        if 'unit' in fields:
+            cols, periods, tiers = zip(*fields['unit'])
+            codes, self.units = pd.factorize(df[list(cols)].to_numpy(dtype=object).ravel())
+            self.unit[:, list(periods), list(tiers)] = codes.reshape(len(df), len(cols))
+            self.units = list(self.units)
+
+    @property
+    def shape(self):
+        return self.rate.shape
+
+    def take(self, idx):
+        """
+        Returns StructureArrays of the rates at positions idx.
+        """
+
+        sub = StructureArrays.__new__(StructureArrays)
+        for attr in ['rate', 'max', 'has_rate', 'valid', 'unit']:
+            setattr(sub, attr, getattr(self, attr)[idx])
+        sub.units, sub.n_tiers = self.units, self.n_tiers
+        return sub
+
+    def tier_mask(self):
+        """
+        Returns bool array of shape (n_periods, n_tiers), True for the
+        period/tier cells with source columns.
+        """
+
+        return np.arange(self.shape[2])[np.newaxis, :] < self.n_tiers[:, np.newaxis]
+
+class RateStructures(object):
+    """
+    Energy, flat-demand, and TOU-demand rate structures of a set of URDB rates
+    (e.g. DatabaseRates.com_rate_data) compiled once into padded numpy arrays
+    (see StructureArrays), indexed by rate label. Cost calculators accept it
+    in place of looking up the 'energyratestructure/period{p}/tier{t}...'
+    columns cell by cell.
+
+    Attributes
+    -----------
+    labels:
+        pandas.Index of rate labels, the first axis of all arrays
+    energy:
+        StructureArrays of 'energyratestructure'
+    flatdemand:
+        StructureArrays of 'flatdemandstructure'
+    demand:
+        StructureArrays of 'demandratestructure'
+    flat_demand_months:
+        float64 array of shape (n_rates, 12), flat demand period of each
+        month ('flatDemandMonth_jan'...'flatDemandMonth_dec', NaN if missing)
+    """
+
+    def __init__(self, rates):
+        self.labels = pd.Index(rates['label'])
+        for kind, structure in STRUCTURE_KINDS.items():
+            setattr(self, kind, StructureArrays(rates, structure))
+
+        self.flat_demand_months = np.full((len(rates), 12), np.nan)
+        month_cols = {col.lower(): col for col in rates.columns}
+        for m, month in enumerate(FLAT_DEMAND_MONTHS):
+            col = month_cols.get(f'flatdemandmonth_{month}')
+            if col is not None:
+                self.flat_demand_months[:, m] = pd.to_numeric(rates[col], errors='coerce')
+
+    def __len__(self):
+        return len(self.labels)
+
+    def get_index(self, labels):
+        """
+        Returns integer positions of labels in self.labels. Raises KeyError
+        if any label was not compiled.
+        """
+
+        idx = self.labels.get_indexer(labels)
+        if (idx < 0).any():
+            missing = np.asarray(labels)[idx < 0]
+            raise KeyError(f'{len(missing)} rates not in RateStructures, e.g. {missing[0]}')
+
+        return idx
+
+    def to_long(self, kind, labels=None, dropna=False):
+        """
+        Returns long format pandas.DataFrame of the 'energy', 'flatdemand' or
+        'demand' structure with one row per [label, period, tier] and 'max'
+        (NULL -> inf), 'rate' (rate + adj, NULL -> 0), and 'unit' columns,
+        ordered by rate, period, tier. Only period/tier cells with source
+        columns are included; if dropna, cells where rate, adj, max, and sell
+        are all NULL are also dropped. labels (default: all) selects and
+        orders the rates.
+        """
+
+        assert kind in STRUCTURE_KINDS, f"kind must be in {list(STRUCTURE_KINDS)}"
+        arrs = getattr(self, kind)
+
+        if labels is None:
+            idx = np.arange(len(self.labels))
+        else:
+            idx = self.get_index(labels)
+
+        mask = np.broadcast_to(arrs.tier_mask(), (len(idx),) + arrs.shape[1:])
+        if dropna:
+            mask = mask & arrs.valid[idx]
+
+        r, p, t = np.nonzero(mask)
+        rows = idx[r]
+        unit_codes = arrs.unit[rows, p, t]
+        units = np.array(arrs.units + [np.nan], dtype=object)
+
+        long_df = pd.DataFrame({'label': self.labels.values[rows],
+                                'period': p,
+                                'tier': t,
+                                'max': arrs.max[rows, p, t],
+                                'rate': arrs.rate[rows, p, t],
+                                'unit': units[unit_codes]})
+
+        return long_df
@@ -0,0 +1,314 @@
+"""
+Synthetic URDB snapshots and DCFC load profiles for scaling tests and
+benchmarks.
+"""
+#public
+import os
+import numpy as np
+import pandas as pd
+
+#settings
+ENERGY_TIERS = [11, 8, 5, 5, 5, 5] + [1]*18
+FLAT_DEMAND_TIERS = [17, 5, 3, 1, 1, 1, 1, 1]
+DEMAND_TIERS = [16, 16, 3, 3, 2, 1, 1, 1, 1]
+MONTHS = ['jan','feb','mar','apr','may','jun','jul','aug','sep','oct','nov','dec']
+
+RATE_KINDS = ['flat', 'tier', 'seasonal', 'tou', 'flat_demand', 'tou_demand']
+
+WORDS = ['general', 'service', 'standard', 'small', 'large', 'secondary', 'primary',
+         'schedule', 'rate', 'option', 'commercial', 'residential', 'power', 'time-of-use']
+
+def urdb_columns():
+    """
+    Returns list of URDB column names produced by the generator.
+    """
+
+    cols = ['label', 'eiaid', 'name', 'is_default', 'utility', 'sector',
+            'description', 'source', 'startdate', 'enddate',
+            'fixedchargefirstmeter', 'fixedchargeunits', 'demandrateunit',
+            'flatdemandunit', 'voltageminimum', 'peakkwcapacitymin',
+            'peakkwcapacitymax', 'peakkwhusagemin', 'peakkwhusagemax',
+            'energyweekdayschedule', 'energyweekendschedule',
+            'demandweekdayschedule', 'demandweekendschedule',
+            'coincidentratestructure/period0/tier0rate']
+    cols += ['flatDemandMonth_{}'.format(m) for m in MONTHS]
+
+    for p, n_tiers in enumerate(ENERGY_TIERS):
+        for t in range(n_tiers):
+            for field in ['max', 'unit', 'rate', 'adj', 'sell']:
+                cols.append('energyratestructure/period{0}/tier{1}{2}'.format(p, t, field))
+
+    for p, n_tiers in enumerate(FLAT_DEMAND_TIERS):
+        for t in range(n_tiers):
+            for field in ['max', 'rate', 'adj']:
+                cols.append('flatdemandstructure/period{0}/tier{1}{2}'.format(p, t, field))
+
+    for p, n_tiers in enumerate(DEMAND_TIERS):
+        for t in range(n_tiers):
+            for field in ['max', 'rate', 'adj']:
+                cols.append('demandratestructure/period{0}/tier{1}{2}'.format(p, t, field))
+
+    return cols
+
+def format_schedule(schedule, long_suffix=False, extra_element=False):
+    """
+    Formats a 12x24 array of periods as a URDB schedule string, optionally
+    with Python 2 'L' suffixes or a leading 25th element on each month.
+    """
+
+    months = []
+    for month in schedule:
+        hours = [str(int(per)) + ('L' if long_suffix else '') for per in month]
+        if extra_element:
+            hours = [hours[0]] + hours
+        months.append('[' + ', '.join(hours) + ']')
+
+    return '[' + ', '.join(months) + ']'
+
+def generate_urdb_rates(counts=None, commercial_share=0.5, stale_share=0.1,
+                        filter_phrase_share=0.05, odd_schedule_share=0.05,
+                        seed=0):
+    """
+    Returns pandas.DataFrame of synthetic rates in the URDB .csv schema. The
+    'counts' dict maps rate kinds in RATE_KINDS to the number of rates of that
+    kind; demand kinds are always commercial. Shares of rates are expired 
+    (stale_share), have names w/ phrases in 'filters/' 
+    (filter_phrase_share), or have schedules w/ the 'L' suffix or 
+    25-element month rows seen in older URDB snapshots 
+    (odd_schedule_share); some tiered rates use a single period numbered 
+    above 9. Rates are reproducible for a given seed.
+    """
+
+    if counts is None:
+        counts = {kind: 100 for kind in RATE_KINDS}
+
+    unknown = set(counts) - set(RATE_KINDS)
+    if unknown:
+        raise ValueError("Unknown rate kinds: {}".format(sorted(unknown)))
+
+    rng = np.random.default_rng(seed)
+    columns = urdb_columns()
+    records = []
+    n_rate = 0
+    for kind in RATE_KINDS:
+        for _ in range(counts.get(kind, 0)):
+            n_rate += 1
+            records.append(_generate_rate(kind, n_rate, rng, commercial_share,
+                                          stale_share, filter_phrase_share,
+                                          odd_schedule_share))
+
+    df = pd.DataFrame.from_records(records, columns=columns)
+    df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    return df
+
+def _generate_rate(kind, n_rate, rng, commercial_share, stale_share,
+                   filter_phrase_share, odd_schedule_share):
+    rate = {}
+    rate['label'] = 'synth{:08d}'.format(n_rate)
+    rate['eiaid'] = int(rng.integers(1, 400))
+    rate['utility'] = 'Synthetic Utility {}'.format(rate['eiaid'])
+    rate['is_default'] = bool(rng.random() < 0.3)
+    rate['source'] = 'synthetic'
+    rate['startdate'] = '2019-01-01'
+    rate['enddate'] = '2020-12-31' if rng.random() < stale_share else np.nan
+
+    commercial = kind in ['flat_demand', 'tou_demand'] or rng.random() < commercial_share
+    if commercial:
+        rate['sector'] = 'Commercial' if rng.random() < 0.8 else 'Industrial'
+    else:
+        rate['sector'] = 'Residential'
+
+    words = list(rng.choice(WORDS, size=3, replace=False))
+    if rng.random() < filter_phrase_share:
+        words.append(str(rng.choice(['heating', 'unmetered', 'Lighting', 'Irrigation', 'electric vehicle'])))
+    rate['name'] = ' '.join(words).title()
+    rate['description'] = np.nan if rng.random() < 0.2 else 'Synthetic {} rate: {}'.format(kind, ' '.join(words))
+
+    rate['fixedchargefirstmeter'] = np.nan if rng.random() < 0.1 else round(float(rng.uniform(0, 50)), 2)
+    rate['fixedchargeunits'] = '$/day' if rng.random() < 0.05 else '$/month'
+    rate['voltageminimum'] = np.nan if rng.random() < 0.9 else float(rng.choice([480, 4160, 12470]))
+
+    if commercial:
+        if rng.random() < 0.2:
+            rate['peakkwcapacitymin'] = float(rng.choice([0, 20, 100]))
+            rate['peakkwcapacitymax'] = float(rng.choice([50, 200, 1000]))
+        if rng.random() < 0.1:
+            rate['peakkwhusagemax'] = float(rng.choice([5000, 50000]))
+
+    # Energy schedule
+    n_periods = 1
+    wkday = np.zeros((12, 24), dtype=int)
+    if kind in ['seasonal'] or (kind == 'tou' and rng.random() < 0.5):
+        wkday[5:9, :] = 1
+        n_periods = 2
+    wkend = wkday.copy()
+    if kind == 'tou':
+        peak = int(rng.integers(12, 18))
+        wkday[:, peak:peak+int(rng.integers(2, 6))] += n_periods
+        n_periods *= 2
+    elif kind == 'tier' and rng.random() < 0.1:
+        # Single period numbered above 9 (multi-digit period)
+        wkday[:, :] = 11
+        wkend[:, :] = 11
+        n_periods = 12
+
+    odd = rng.random() < odd_schedule_share
+    long_suffix = odd and rng.random() < 0.5
+    extra_element = odd and not long_suffix
+    rate['energyweekdayschedule'] = format_schedule(wkday, long_suffix, extra_element)
+    rate['energyweekendschedule'] = format_schedule(wkend, long_suffix, extra_element)
+
+    # Energy rate structure
+    base = float(rng.uniform(0.05, 0.25))
+    units = ['kWh', 'kWh', 'kWh', 'kWh daily', 'kWh/kW'] if commercial else ['kWh']
+    unit = str(rng.choice(units))
+    for per in range(n_periods):
+        if kind == 'tier' and per < 6:
+            n_tiers = int(rng.integers(2, min(ENERGY_TIERS[per], 4) + 1))
+        else:
+            n_tiers = 1
+        bound = 0
+        for tier in range(n_tiers):
+            prefix = 'energyratestructure/period{0}/tier{1}'.format(per, tier)
+            rate[prefix+'rate'] = round(base * (1 + 0.5*per) * (1 + 0.2*tier), 5)
+            if rng.random() < 0.3:
+                rate[prefix+'adj'] = round(float(rng.uniform(-0.01, 0.02)), 5)
+            rate[prefix+'unit'] = unit
+            if tier < n_tiers - 1:
+                bound += {'kWh': 500, 'kWh daily': 20, 'kWh/kW': 200}[unit]
+                rate[prefix+'max'] = float(bound)
+
+    # Demand structure
+    if kind == 'flat_demand':
+        rate['flatdemandunit'] = 'kW'
+        n_flat = 2 if rng.random() < 0.5 else 1
+        for month_idx, month in enumerate(MONTHS):
+            rate['flatDemandMonth_{}'.format(month)] = 1 if (n_flat == 2 and 5 <= month_idx <= 8) else 0
+        for per in range(n_flat):
+            n_tiers = int(rng.integers(1, 4))
+            for tier in range(n_tiers):
+                prefix = 'flatdemandstructure/period{0}/tier{1}'.format(per, tier)
+                rate[prefix+'rate'] = round(float(rng.uniform(2, 15)) * (1 + 0.3*per), 3)
+                if tier < n_tiers - 1:
+                    rate[prefix+'max'] = float(25 * (tier + 1))
+
+    elif kind == 'tou_demand':
+        rate['demandrateunit'] = 'kW'
+        dmd_wkday = np.zeros((12, 24), dtype=int)
+        peak = int(rng.integers(12, 18))
+        dmd_wkday[:, peak:peak+4] = 1
+        dmd_wkend = np.zeros((12, 24), dtype=int)
+        rate['demandweekdayschedule'] = format_schedule(dmd_wkday, long_suffix, extra_element)
+        rate['demandweekendschedule'] = format_schedule(dmd_wkend, long_suffix, extra_element)
+        for per in range(2):
+            n_tiers = int(rng.integers(1, 3))
+            for tier in range(n_tiers):
+                prefix = 'demandratestructure/period{0}/tier{1}'.format(per, tier)
+                rate[prefix+'rate'] = round(float(rng.uniform(2, 15)) * (1 + per), 3)
+                if tier < n_tiers - 1:
+                    rate[prefix+'max'] = float(25 * (tier + 1))
+
+    elif commercial:
+        rate['demandrateunit'] = 'kW'
+
+    return rate
+
+def generate_dcfc_profile(plugs=1, plug_kw=50, sessions_per_plug_day=3,
+                          session_hours=0.5, base_kw=0., year=2019, seed=0):
+    """
+    Returns pandas.DataFrame of a synthetic 15-minute DCFC station load profile
+    in the format of data/dcfc-load-profiles ('Power, kW' column, timestamp
+    index) for a non-leap year, w/ a constant load of base_kw under the
+    charging sessions. W/o sessions (sessions_per_plug_day=0), every 
+    interval is at its month's peak.
+    """
+
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('{}-01-01 00:00'.format(year), periods=365*96, freq='15min')
+    power = np.full(len(index), float(base_kw))
+    n_intervals = max(int(round(session_hours * 4)), 1)
+    hour_weights = np.array([1, 1, 1, 1, 1, 2, 4, 6, 7, 7, 7, 8, 9, 9, 8, 8, 9, 10, 10, 8, 6, 4, 2, 1], dtype=float)
+    hour_weights = hour_weights / hour_weights.sum()
+    for day in range(365):
+        for _ in range(plugs):
+            n_sessions = rng.poisson(sessions_per_plug_day)
+            hours = rng.choice(24, size=n_sessions, p=hour_weights)
+            for hour in hours:
+                start = day*96 + hour*4 + int(rng.integers(0, 4))
+                kw = plug_kw * float(rng.uniform(0.6, 1.0))
+                taper = np.linspace(1.0, 0.7, n_intervals) #charging power tapers as the battery fills
+                power[start:start+n_intervals] += (kw * taper)[:len(power[start:start+n_intervals])]
+
+    profile_df = pd.DataFrame({'Power, kW': power.round(3)}, index=index)
+    profile_df.index.name = 'Timestamp'
+
+    return profile_df
+
+def generate_res_charging_profile(strategy='immediate', charger_kw=7.2, daily_kwh=10.,
+                                  sessions_per_week=5, year=2019, seed=0):
+    """
+    Returns pandas.DataFrame of a synthetic 15-minute residential charging 
+    load profile in the format of generate_dcfc_profile for a non-leap 
+    year. Each session charges daily_kwh (+/- 30%) at charger_kw, starting
+    when the vehicle arrives home (~18:00, 'immediate'), at 23:00 
+    ('delayed'), or spread evenly over 00:00-06:00 at reduced power 
+    ('smart').
+    """
+
+    if strategy not in ['immediate', 'delayed', 'smart']:
+        raise ValueError("strategy must be 'immediate', 'delayed', or 'smart'!")
+
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('{}-01-01 00:00'.format(year), periods=365*96, freq='15min')
+    power = np.zeros(len(index) + 96) #sessions may run past midnight of the last day
+    for day in range(365):
+        if rng.random() >= sessions_per_week / 7:
+            continue
+
+        kwh = daily_kwh * float(rng.uniform(0.7, 1.3))
+        if strategy == 'smart':
+            start, kw = (day + 1)*96, kwh / 6 #00:00-06:00 of the next day
+            n_intervals = 6*4
+        else:
+            hour = 23 if strategy == 'delayed' else int(np.clip(np.round(rng.normal(18, 1.5)), 14, 22))
+            start, kw = day*96 + hour*4 + int(rng.integers(0, 4)), charger_kw
+            n_intervals = int(np.ceil(kwh / (kw / 4)))
+
+        power[start:start+n_intervals] += kw
+        power[start+n_intervals-1] -= kw - (kwh - kw/4*(n_intervals - 1))*4 #partial last interval
+
+    power[:96] += power[len(index):] #wrap sessions past the end of the year to January 1
+    profile_df = pd.DataFrame({'Power, kW': power[:len(index)].round(3)}, index=index)
+    profile_df.index.name = 'Timestamp'
+
+    return profile_df
+
+def write_fixtures(outdir, counts=None, profiles=None, seed=0, **kwargs):
+    """
+    Writes a synthetic URDB snapshot ('usurdb_synthetic.csv', see 
+    generate_urdb_rates) and DCFC load profiles ('dcfc_<name>.csv') to 
+    outdir. profiles is a dict of name: generate_dcfc_profile kwargs 
+    (default: four profiles resembling p1-p4 of config.DCFC_PROFILES_DICT);
+    profile i is seeded w/ seed+i+1. Returns (urdb_file, profiles_dict) 
+    where profiles_dict maps profile names to file paths, in the format of
+    config.DCFC_PROFILES_DICT.
+    """
+
+    if profiles is None:
+        profiles = {'p1': {'plugs': 1, 'plug_kw': 50, 'sessions_per_plug_day': 2},
+                    'p2': {'plugs': 1, 'plug_kw': 50, 'sessions_per_plug_day': 6},
+                    'p3': {'plugs': 4, 'plug_kw': 150, 'sessions_per_plug_day': 4},
+                    'p4': {'plugs': 20, 'plug_kw': 150, 'sessions_per_plug_day': 5}}
+
+    os.makedirs(outdir, exist_ok=True)
+    urdb_file = os.path.join(outdir, 'usurdb_synthetic.csv')
+    generate_urdb_rates(counts, seed=seed, **kwargs).to_csv(urdb_file, index=False)
+
+    profiles_dict = {}
+    for i, (p, params) in enumerate(profiles.items()):
+        profile_file = os.path.join(outdir, 'dcfc_{}.csv'.format(p))
+        generate_dcfc_profile(seed=seed+i+1, **params).to_csv(profile_file)
+        profiles_dict[p] = profile_file
+
+    return urdb_file, profiles_dict
@@ -5,17 +5,502 @@ https://openei.org.
 #public
 import sys
 import logging
-import warnings
+import multiprocessing
+import contextlib
 import numpy as np
 import pandas as pd
 import os
 import config as config
 import lcoc.readwrite as readwrite
 import lcoc.helpers as helpers
+import lcoc.billing as billing
+import lcoc.profiles as profiles
+from lcoc.structures import RateStructures, StructureArrays
+from lcoc.eligibility import EligibilityIndex
 
 #settings
 pd.options.mode.chained_assignment = None 
 
+SECTORS = {'residential': ['Residential'],
+           'commercial': ['Commercial', 'Industrial']}
+
+URDB_ID_COLS = ['label', 'rate_id', 'eiaid', 'utility', 'name', 'sector', 
+                'description', 'startdate', 'enddate']
+
+DCFC_V2_BYTES_PER_ROW = 128 #working memory of dcfc_costs_v2 per rate x hour w/ energy x (1 + energy tiers)
+
+RES_BYTES_PER_HOUR = 8 + 8 + 1 #working memory of billing.cheapest_period_cost per rate x hour of the (2, 12, 24) schedule: int64 period, float64 rate, int8 schedule
+RES_BYTES_PER_WINDOW_HOUR = 8 + 8 #additional working memory per rate x schedule hour w/ charging windows: float64 window sums & rolled rates
+RES_BYTES_PER_CELL = 5*8 + 3 #working memory of structures.StructureArrays per rate x energy period x tier: float64 rate, max & transient source values, adj, sell; bool & int8 flags
+RES_MEMORY_SHARE = 0.25 #share of available memory used by auto-tuned residential batches
+
+def pipeline_columns(industry):
+    """
+    Returns function that is True for URDB column names read by the 
+    residential or commercial pipeline. The residential pipeline only uses 
+    the tier 0 demand rates (to classify demand rates); the commercial 
+    pipeline also reads demand structures, schedules, fixed charges, and 
+    service limits.
+    """
+
+    industry = industry.lower()
+    if industry == 'residential':
+        keep = ['energyratestructure/', 
+                'flatdemandstructure/period0/tier0rate',
+                'demandratestructure/period0/tier0rate']
+        exact = ['energyweekdayschedule', 'energyweekendschedule']
+    
+    elif industry == 'commercial':
+        keep = ['energyratestructure/', 'flatdemandstructure/', 
+                'demandratestructure/', 'flatdemandmonth',
+                'coincidentratestructure/period0/tier0rate']
+        exact = ['energyweekdayschedule', 'energyweekendschedule',
+                 'demandweekdayschedule', 'demandweekendschedule',
+                 'fixedchargefirstmeter', 'fixedchargeunits', 'demandrateunit',
+                 'flatdemandunit', 'voltageminimum', 'peakkwcapacitymin',
+                 'peakkwcapacitymax', 'peakkwhusagemin', 'peakkwhusagemax']
+    
+    else:
+        raise ValueError("industry must be 'residential' or 'commercial'!")
+
+    def is_pipeline_column(col):
+        return ((col in URDB_ID_COLS) or (col in exact) or 
+                any(col.lower().startswith(prefix) for prefix in keep))
+
+    return is_pipeline_column
+
+def calculation_columns(industry):
+    """
+    Returns function that is True for column names read or written by the 
+    residential or commercial cost calculations (after filtering, 
+    classification, preprocessing, and combine_rates), see 
+    DatabaseRates.release_raw_columns. Schedules are read through 
+    DatabaseRates.get_schedules and are not included.
+    """
+
+    industry = industry.lower()
+    if industry == 'residential':
+        keep = ['energyratestructure/', 'energyrate/', 'is_']
+        exact = []
+    
+    elif industry == 'commercial':
+        keep = ['energyratestructure/', 'flatdemandstructure/', 
+                'demandratestructure/', 'flatdemandmonth', 'energyrate/', 'is_']
+        exact = ['fixedchargefirstmeter', 'fixedchargeunits', 'demandrateunit',
+                 'flatdemandunit', 'peakkwcapacitymin', 'peakkwcapacitymax', 
+                 'peakkwhusagemin', 'peakkwhusagemax']
+    
+    else:
+        raise ValueError("industry must be 'residential' or 'commercial'!")
+
+    def is_calculation_column(col):
+        return ((col in URDB_ID_COLS) or (col in exact) or 
+                any(col.lower().startswith(prefix) for prefix in keep))
+
+    return is_calculation_column
+
+def schedule_long_df(labels, periods):
+    """
+    Returns long format pandas.DataFrame ['label', 'month', 'hour', 'period',
+    'day_type'] of the parsed schedules 'periods' (see 
+    DatabaseRates.get_schedules) of rates 'labels', with weekday rows followed
+    by weekend rows. Rates with missing or malformed schedules are dropped.
+    """
+
+    labels = np.asarray(labels)
+    valid = (periods >= 0).all(axis=(1, 2, 3))
+    labels, periods = labels[valid], periods[valid]
+    n_rates = len(labels)
+    
+    day_type_dfs = []
+    for day_type_idx, day_type in enumerate(['weekday', 'weekend']):
+        day_type_dfs.append(pd.DataFrame({'label': np.repeat(labels, 12*24),
+                                          'month': np.tile(np.repeat(np.arange(1, 13), 24), n_rates),
+                                          'hour': np.tile(np.arange(24), 12*n_rates),
+                                          'period': periods[:, day_type_idx].reshape(-1).astype(int),
+                                          'day_type': day_type}))
+
+    return pd.concat(day_type_dfs, ignore_index=True)
+
+def dcfc_costs_v1(rates, structures, schedules, peak_pwrs, peak_by_tou_hour, hourly_energy_df, p=''):
+    """
+    Returns the rates (pandas.DataFrame w/ 'label', 'fixedchargefirstmeter',
+    'flatdemandstructure/period0/tier0rate', and 
+    'demandratestructure/period0/tier0rate' columns) with 'annual_fixed_cost',
+    'demand_type', 'annual_demand_cost', and 'annual_energy_cost' columns, 
+    costed by the algorithm of DatabaseRates.calculate_annual_cost_dcfc for 
+    profile p (monthly peak power peak_pwrs, peak power by month, day type, 
+    and hour peak_by_tou_hour, and hourly_energy_df; see 
+    profiles.LoadProfile); rates with negative or unknown costs are 
+    dropped. schedules is a dict of 'energy'/'demand': (pandas.Index of 
+    labels, TOU periods) covering the rates (see DatabaseRates.schedules).
+
+    Flat demand charges bill each month's peak in the month's flat demand
+    period. TOU demand charges bill the peak of each TOU demand period of 
+    each month (see billing.period_peaks). Each peak is billed at the first
+    tier that fits it (see billing.demand_cost).
+    """
+
+    def get_schedules(df, kind):
+        labels, periods = schedules[kind]
+        return periods[labels.get_indexer(df['label'])]
+
+    eligible_rates = rates
+
+    # Calculate annual fixed cost charge (1st meter)
+    logging.info("Starting annual fixed cost calculations for {}...".format(p))
+    eligible_rates['annual_fixed_cost'] = eligible_rates['fixedchargefirstmeter'] * 12
+    eligible_rates = eligible_rates[eligible_rates.annual_fixed_cost >= 0]
+    logging.info("Annual fixed cost calculations complete.")
+
+    # Characterize rates (demand/no-demand)
+    flat_dmd_rates = eligible_rates[~eligible_rates['flatdemandstructure/period0/tier0rate'].isnull()]
+    flat_dmd_rates['demand_type'] = 'flat'
+
+    tou_dmd_rates = eligible_rates[(eligible_rates['flatdemandstructure/period0/tier0rate'].isnull())&
+                                   (~eligible_rates['demandratestructure/period0/tier0rate'].isnull())]
+    tou_dmd_rates['demand_type'] = 'tou'
+
+    no_dmd_rates = eligible_rates[(eligible_rates['flatdemandstructure/period0/tier0rate'].isnull())&
+                                  (eligible_rates['demandratestructure/period0/tier0rate'].isnull())]
+    no_dmd_rates['demand_type'] = 'none'
+
+    # Calculate annual demand charges
+    logging.info("Starting annual demand cost calculations for {}...".format(p))
+    ## Flat-demand rates
+    flat_dmd_idx = structures.get_index(flat_dmd_rates['label'])
+    flat_dmd_periods = structures.flat_demand_months[flat_dmd_idx]
+    flat_dmd_rates['annual_demand_cost'] = billing.demand_cost(np.broadcast_to(peak_pwrs, flat_dmd_periods.shape).astype('float64'), 
+                                                               flat_dmd_periods, structures.flatdemand.take(flat_dmd_idx))
+    flat_dmd_rates = flat_dmd_rates[flat_dmd_rates.annual_demand_cost>=0] #remove negative demand costs
+
+    ## TOU-demand rates
+    tou_dmd = structures.demand.take(structures.get_index(tou_dmd_rates['label']))
+    n_periods = tou_dmd.shape[1]
+    tou_peaks = billing.period_peaks(peak_by_tou_hour, get_schedules(tou_dmd_rates, 'demand'), n_periods) #NaN for missing/malformed schedules
+    tou_dmd_rates['annual_demand_cost'] = billing.demand_cost(tou_peaks.reshape(len(tou_peaks), 12*n_periods), 
+                                                              np.tile(np.arange(n_periods), 12), tou_dmd)
+    tou_dmd_rates = tou_dmd_rates[tou_dmd_rates.annual_demand_cost>=0] #remove negative demand costs
+
+    ## No-demand rates
+    no_dmd_rates['annual_demand_cost'] = 0
+    logging.info("Annual demand cost calculations complete.")
+
+    eligible_rates = pd.concat([flat_dmd_rates, tou_dmd_rates, no_dmd_rates])
+
+    # Calculate annual energy charges
+    logging.info("Starting annual energy cost calculations for {0} ({1} total)...".format(p, len(eligible_rates)))
+    energy = structures.energy.take(structures.get_index(eligible_rates['label']))
+    energy_schedules = get_schedules(eligible_rates, 'energy')
+    annual_energy_costs = billing.tiered_energy_cost(hourly_energy_df, energy_schedules, energy)
+
+    eligible_rates['annual_energy_cost'] = annual_energy_costs
+    eligible_rates = eligible_rates[eligible_rates.annual_energy_cost>=0] #remove negative energy costs
+    logging.info(f"{p} - Annual energy cost calculations complete.")
+
+    return eligible_rates
+
+def _merge_cost_shards(rates, shard_costs):
+    """
+    Returns rows of rates (pandas.DataFrame) w/ the cost columns of 
+    shard_costs (list of outputs of dcfc_costs_v1/dcfc_costs_v2 for shards of
+    rates), ordered as if rates were costed in one shard: by demand type 
+    (flat, tou, none), then by position in rates.
+    """
+
+    costs = pd.concat(shard_costs, ignore_index=True)
+    positions = pd.Index(rates['label']).get_indexer(costs['label'])
+    demand_types = costs['demand_type'].map({'flat': 0, 'tou': 1, 'none': 2}).values
+    costs = costs.iloc[np.lexsort((positions, demand_types))]
+    
+    rates = rates.iloc[pd.Index(rates['label']).get_indexer(costs['label'])]
+    rates = rates.reset_index(drop=True)
+    for col in ['annual_fixed_cost', 'demand_type', 'annual_demand_cost', 'annual_energy_cost']:
+        rates[col] = costs[col].values
+
+    return rates
+
+def dcfc_costs_v2(rates, structures, schedules, monthly_peak_pwr_df, hourly_energy_df, p=''):
+    """
+    Returns the rates (pandas.DataFrame w/ 'label', 'fixedchargefirstmeter',
+    'flatdemandstructure/period0/tier0rate', and 
+    'demandratestructure/period0/tier0rate' columns) with 'annual_fixed_cost',
+    'demand_type', 'annual_demand_cost', and 'annual_energy_cost' columns, 
+    costed by the v2 algorithm of DatabaseRates.calculate_annual_cost_dcfc_v2
+    for profile p; rates with negative or unknown costs are dropped. Rates 
+    are costed independently of each other, so shards of rates can be 
+    costed separately (see DatabaseRates.calculate_annual_cost_dcfc_v2). 
+    schedules is a dict of 'energy'/'demand': (pandas.Index of labels, TOU
+    periods) covering the rates (see DatabaseRates.schedules). Only the 
+    first interval at each month's peak in monthly_peak_pwr_df (in time 
+    order, see profiles.LoadProfile.monthly_peak_pwr_df) is billed.
+    """
+
+    def get_schedules(df, kind):
+        labels, periods = schedules[kind]
+        return periods[labels.get_indexer(df['label'])]
+
+    eligible_rates = rates
+    hourly_energy_df = hourly_energy_df.copy()
+    # Months where the peak repeats count the first interval at peak once, 
+    # rather than billing demand and kWh/kW tiers once per repeat
+    monthly_peak_pwr_df = monthly_peak_pwr_df.drop_duplicates(subset='month', keep='first')
+
+    #----------------------------------------------------------------------------
+    ## Calculate annual fixed cost charge (1st meter) ##
+    logging.info(f'Starting annual fixed cost calculations for {p}...')
+    eligible_rates['annual_fixed_cost'] = eligible_rates['fixedchargefirstmeter'] * 12
+    eligible_rates = eligible_rates[eligible_rates.annual_fixed_cost >= 0]
+    logging.info("Annual fixed cost calculations complete.")
+
+    #----------------------------------------------------------------------------
+    ## Calculate annual demand charges ##
+
+    # Characterize rates (demand/no-demand)
+    flat_dmd_rates = eligible_rates[~eligible_rates['flatdemandstructure/period0/tier0rate'].isnull()]
+    flat_dmd_rates['demand_type'] = 'flat'
+
+    tou_dmd_rates = eligible_rates[(eligible_rates['flatdemandstructure/period0/tier0rate'].isnull())&
+                                    (~eligible_rates['demandratestructure/period0/tier0rate'].isnull())]
+    tou_dmd_rates['demand_type'] = 'tou'
+
+    no_dmd_rates = eligible_rates[(eligible_rates['flatdemandstructure/period0/tier0rate'].isnull())&
+                                    (eligible_rates['demandratestructure/period0/tier0rate'].isnull())]
+    no_dmd_rates['demand_type'] = 'none'
+
+    logging.info(f'Starting annual demand cost calculations for {p}...')
+
+    ## FLAT-DEMAND RATES ##
+    # Long format flat demand rate parameters by label, period, and tier
+    flat_dmd_rates_str_w = structures.to_long('flatdemand', flat_dmd_rates['label'])
+    flat_dmd_rates_str_w = flat_dmd_rates_str_w.rename(columns={'rate':'dmd_rate'}).drop(columns='unit')
+    # Create df with flat demand schedule: month with corresponding period
+    flat_dmd_idx = structures.get_index(flat_dmd_rates['label'])
+    flat_dmd_rates_sched_l = pd.DataFrame({'label': np.tile(flat_dmd_rates['label'].values, 12),
+                                           'month': np.repeat(np.arange(1, 13), len(flat_dmd_idx)),
+                                           'period': structures.flat_demand_months[flat_dmd_idx].T.ravel()})
+    # Merge monthly_peak_pwr_df to schedule
+    flat_dmd_rates_byper_bytier = flat_dmd_rates_sched_l.merge(monthly_peak_pwr_df,how='left',on='month')
+    flat_dmd_rates_byper_bytier = flat_dmd_rates_byper_bytier.merge(flat_dmd_rates_str_w,how='left',on=['label','period'])
+    flat_dmd_rates_byper_bytier['max_cumulative'] = flat_dmd_rates_byper_bytier.groupby(['label','month','period'])['max'].cumsum()
+    # determine excess power above tier threshold and shift down to assign to next tier
+    flat_dmd_rates_byper_bytier['dmd_excess'] = np.where(flat_dmd_rates_byper_bytier['pwr_kw'] > flat_dmd_rates_byper_bytier['max_cumulative'], 
+                                                            flat_dmd_rates_byper_bytier['pwr_kw'] - flat_dmd_rates_byper_bytier['max_cumulative'],0)
+    flat_dmd_rates_byper_bytier['dmd_excess_shift'] = flat_dmd_rates_byper_bytier.groupby(['label','month','period'])['dmd_excess'].shift()
+    # select final power value for each tier based on several conditions
+    flat_dmd_rates_byper_bytier['dmd_tier'] = np.select(  condlist=[flat_dmd_rates_byper_bytier['dmd_excess']>0, 
+                                                                            flat_dmd_rates_byper_bytier['dmd_excess_shift']>0,
+                                                                            flat_dmd_rates_byper_bytier['dmd_excess_shift'].isna()],
+                                                                        choicelist=[flat_dmd_rates_byper_bytier['max'],
+                                                                            flat_dmd_rates_byper_bytier['dmd_excess_shift'],
+                                                                            flat_dmd_rates_byper_bytier['pwr_kw']],default=0)
+    # calculate total flat demand cost
+    flat_dmd_rates_byper_bytier['dmd_cost_total'] = flat_dmd_rates_byper_bytier['dmd_rate'] * flat_dmd_rates_byper_bytier['dmd_tier']
+    # calculate annual energy cost for each eligible rate and combine into one df
+    annual_flat_dmd_cost_df = flat_dmd_rates_byper_bytier[['label','dmd_cost_total']].groupby(by='label').sum()
+    annual_flat_dmd_cost_df.rename(columns={'dmd_cost_total':'annual_demand_cost'},inplace=True)
+    flat_dmd_rates = flat_dmd_rates.merge(annual_flat_dmd_cost_df,how='left',on='label')
+    flat_dmd_rates = flat_dmd_rates[flat_dmd_rates.annual_demand_cost>=0] #remove negative demand costs
+
+    ## TOU-DEMAND RATES ##
+    # Long format tou demand rate parameters by label, period, and tier
+    tou_dmd_rates_str_w = structures.to_long('demand', tou_dmd_rates['label'])
+    tou_dmd_rates_str_w = tou_dmd_rates_str_w.rename(columns={'rate':'dmd_rate'}).drop(columns='unit')
+    # Create long format schedule df with label-month-hour-day type index and period value
+    tou_dmd_rates_sched_l = schedule_long_df(tou_dmd_rates['label'], get_schedules(tou_dmd_rates, 'demand'))
+    # Merge monthly_peak_pwr_df to schedule
+    tou_dmd_rates_byper_bytier = tou_dmd_rates_sched_l.merge(monthly_peak_pwr_df,how='left',on=['month','hour','day_type'])
+    tou_dmd_rates_byper_bytier = tou_dmd_rates_byper_bytier.dropna(axis=0,subset=['pwr_kw'])
+    tou_dmd_rates_byper_bytier = tou_dmd_rates_byper_bytier.merge(tou_dmd_rates_str_w,how='left',on=['label','period'])
+    tou_dmd_rates_byper_bytier['max_cumulative'] = tou_dmd_rates_byper_bytier.groupby(['label','month','period'])['max'].cumsum()
+    # determine excess power above tier threshold and shift down to assign to next tier
+    tou_dmd_rates_byper_bytier['dmd_excess'] = np.where(tou_dmd_rates_byper_bytier['pwr_kw'] > tou_dmd_rates_byper_bytier['max_cumulative'], 
+                                                            tou_dmd_rates_byper_bytier['pwr_kw'] - tou_dmd_rates_byper_bytier['max_cumulative'],0)
+    tou_dmd_rates_byper_bytier['dmd_excess_shift'] = tou_dmd_rates_byper_bytier.groupby(['label','month','period'])['dmd_excess'].shift()
+    # select final power value for each tier based on several conditions
+    tou_dmd_rates_byper_bytier['dmd_tier'] = np.select(  condlist=[tou_dmd_rates_byper_bytier['dmd_excess']>0, 
+                                                                            tou_dmd_rates_byper_bytier['dmd_excess_shift']>0,
+                                                                            tou_dmd_rates_byper_bytier['dmd_excess_shift'].isna()],
+                                                                        choicelist=[tou_dmd_rates_byper_bytier['max'],
+                                                                            tou_dmd_rates_byper_bytier['dmd_excess_shift'],
+                                                                            tou_dmd_rates_byper_bytier['pwr_kw']],default=0)
+    # calculate total tou demand cost
+    tou_dmd_rates_byper_bytier['dmd_cost_total'] = tou_dmd_rates_byper_bytier['dmd_rate'] * tou_dmd_rates_byper_bytier['dmd_tier']
+    # calculate annual energy cost for each eligible rate and combine into one df
+    annual_tou_dmd_cost_df = tou_dmd_rates_byper_bytier[['label','dmd_cost_total']].groupby(by='label').sum()
+    annual_tou_dmd_cost_df.rename(columns={'dmd_cost_total':'annual_demand_cost'},inplace=True)
+    # merge annual energy cost to eligible rates
+    tou_dmd_rates = tou_dmd_rates.merge(annual_tou_dmd_cost_df,how='left',on='label')
+    tou_dmd_rates = tou_dmd_rates[tou_dmd_rates.annual_demand_cost>=0] #remove negative demand costs
+
+    ## NO-DEMAND RATES ##
+    no_dmd_rates['annual_demand_cost'] = 0
+
+    logging.info("Annual demand cost calculations complete.")
+
+    eligible_rates = pd.concat([flat_dmd_rates, tou_dmd_rates, no_dmd_rates])
+
+    #----------------------------------------------------------------------------
+    ##  Calculate annual energy charges ##
+    logging.info(f'Starting annual energy cost calculations for {p}')
+    # Long format energy rate parameters by label, period, and tier (rows with no data dropped)
+    energy_rates_str_w = structures.to_long('energy', eligible_rates['label'], dropna=True)
+    energy_rates_str_w = energy_rates_str_w.rename(columns={'rate':'energy_cost'})
+    # Create long format schedule df with label-month-hour-day type index and period value
+    energy_rates_sched_l = schedule_long_df(eligible_rates['label'], get_schedules(eligible_rates, 'energy'))
+    # Process hourly_energy_df
+    hourly_energy_df.query('energy_kwh > 0',inplace=True) # drop hours with 0 energy use to reduce dataframe size
+    hourly_energy_df['day_type'] = np.where(hourly_energy_df['weekday']<=4,'weekday','weekend') # categorize day type
+    # Merge schedules to hourly_energy_df
+    hourly_energy_df_sched = hourly_energy_df.merge(energy_rates_sched_l,how='left',on=['month','hour','day_type'])
+    hourly_energy_df_sched = hourly_energy_df_sched.sort_values(by=['label','month','period','day','hour'])
+    # Max Usage Units == kWh daily
+    daily_energy_byper = hourly_energy_df_sched[['label','month','day','period','energy_kwh']].groupby(by=['label','month','day','period']).sum().reset_index()
+    daily_energy_byper_bytier = daily_energy_byper.merge(energy_rates_str_w,how='left',on=['label','period'])
+    daily_energy_byper_bytier_kWhdaily = daily_energy_byper_bytier.query('unit == "kWh daily"')
+    daily_energy_byper_bytier_kWhdaily['max_cumulative'] = daily_energy_byper_bytier_kWhdaily.groupby(['label','month','day','period'])['max'].cumsum()
+    daily_energy_byper_bytier_kWhdaily['energy_excess'] = np.where(daily_energy_byper_bytier_kWhdaily['energy_kwh'] > daily_energy_byper_bytier_kWhdaily['max_cumulative'], daily_energy_byper_bytier_kWhdaily['energy_kwh'] - daily_energy_byper_bytier_kWhdaily['max_cumulative'],0)
+    daily_energy_byper_bytier_kWhdaily['energy_excess_shift'] = daily_energy_byper_bytier_kWhdaily.groupby(['label','month','day','period'])['energy_excess'].shift()
+    daily_energy_byper_bytier_kWhdaily['energy_tier'] = np.select(  condlist=[daily_energy_byper_bytier_kWhdaily['energy_excess']>0, 
+                                                                        daily_energy_byper_bytier_kWhdaily['energy_excess_shift']>0,
+                                                                        daily_energy_byper_bytier_kWhdaily['energy_excess_shift'].isna()],
+                                                                    choicelist=[daily_energy_byper_bytier_kWhdaily['max'],
+                                                                        daily_energy_byper_bytier_kWhdaily['energy_excess_shift'],
+                                                                        daily_energy_byper_bytier_kWhdaily['energy_kwh']],default=0)
+    daily_energy_byper_bytier_kWhdaily['energy_cost_total'] = daily_energy_byper_bytier_kWhdaily['energy_cost'] * daily_energy_byper_bytier_kWhdaily['energy_tier']
+    # Max Usage Units == kWh or kWh/kW
+    monthly_energy_byper = hourly_energy_df_sched[['label','month','period','energy_kwh']].groupby(by=['label','month','period']).sum().reset_index()
+    monthly_energy_byper_bytier = monthly_energy_byper.merge(energy_rates_str_w,how='left',on=['label','period'])
+    monthly_energy_byper_bytier = monthly_energy_byper_bytier.merge(monthly_peak_pwr_df,how='left',on='month')
+    monthly_energy_byper_bytier_nokWhdaily = monthly_energy_byper_bytier.query('unit != "kWh daily"')
+    # determine final tier threshold (max_final) based on Max Usage units
+    monthly_energy_byper_bytier_nokWhdaily['max_final'] = np.where(monthly_energy_byper_bytier_nokWhdaily['unit']=='kWh/kW',
+                                                                    monthly_energy_byper_bytier_nokWhdaily['max']*monthly_energy_byper_bytier_nokWhdaily['pwr_kw'],
+                                                                    monthly_energy_byper_bytier_nokWhdaily['max'])
+    monthly_energy_byper_bytier_nokWhdaily['max_cumulative'] = monthly_energy_byper_bytier_nokWhdaily.groupby(['label','month','period'])['max_final'].cumsum()
+    # determine excess energy above tier threshold and shift down to assign to next tier
+    monthly_energy_byper_bytier_nokWhdaily['energy_excess'] = np.where(monthly_energy_byper_bytier_nokWhdaily['energy_kwh'] > monthly_energy_byper_bytier_nokWhdaily['max_cumulative'], monthly_energy_byper_bytier_nokWhdaily['energy_kwh'] - monthly_energy_byper_bytier_nokWhdaily['max_cumulative'],0)
+    monthly_energy_byper_bytier_nokWhdaily['energy_excess_shift'] = monthly_energy_byper_bytier_nokWhdaily.groupby(['label','month','period'])['energy_excess'].shift()
+    # select final energy value for each tier based on several conditions
+    monthly_energy_byper_bytier_nokWhdaily['energy_tier'] = np.select(  condlist=[monthly_energy_byper_bytier_nokWhdaily['energy_excess']>0, 
+                                                                            monthly_energy_byper_bytier_nokWhdaily['energy_excess_shift']>0,
+                                                                            monthly_energy_byper_bytier_nokWhdaily['energy_excess_shift'].isna()],
+                                                                        choicelist=[monthly_energy_byper_bytier_nokWhdaily['max_final'],
+                                                                            monthly_energy_byper_bytier_nokWhdaily['energy_excess_shift'],
+                                                                            monthly_energy_byper_bytier_nokWhdaily['energy_kwh']],default=0)
+    # calculate total energy cost
+    monthly_energy_byper_bytier_nokWhdaily['energy_cost_total'] = monthly_energy_byper_bytier_nokWhdaily['energy_cost'] * monthly_energy_byper_bytier_nokWhdaily['energy_tier']
+    # calculate annual energy cost for each eligible rate and combine into one df
+    annual_energy_cost_df_kWhdaily = daily_energy_byper_bytier_kWhdaily[['label','energy_cost_total']].groupby(by='label').sum()
+    annual_energy_cost_df_nokWhdaily = monthly_energy_byper_bytier_nokWhdaily[['label','energy_cost_total']].groupby(by='label').sum()
+    annual_energy_cost_df = pd.concat([annual_energy_cost_df_kWhdaily,annual_energy_cost_df_nokWhdaily])
+    annual_energy_cost_df.rename(columns={'energy_cost_total':'annual_energy_cost'},inplace=True)
+    annual_energy_cost_df = annual_energy_cost_df.reset_index()
+    # merge annual energy cost to eligible rates
+    eligible_rates = eligible_rates.merge(annual_energy_cost_df,how='left',on='label')
+    eligible_rates = eligible_rates[eligible_rates.annual_energy_cost>=0] #remove negative energy costs
+    logging.info(f'{p} - Annual energy cost calculations complete.')
+
+    return eligible_rates
+
+def res_bytes_per_rate(rates, window_hours=1):
+    """
+    Returns the working memory (bytes) of 
+    DatabaseRates.calculate_annual_energy_cost_residential per rate of 
+    'rates' (pandas.DataFrame of URDB rates): the energy StructureArrays of 
+    the rates' period x tier columns (RES_BYTES_PER_CELL), the 2 x 12 x 24 
+    schedule hours of billing.cheapest_period_cost (RES_BYTES_PER_HOUR, 
+    plus RES_BYTES_PER_WINDOW_HOUR for window_hours > 1), and one copy of 
+    the rate's row when it is saved.
+    """
+
+    cells = [readwrite.URDB_STRUCTURE_COL.match(col) for col in rates.columns]
+    cells = [(int(m.group(2)), int(m.group(3))) for m in cells if (m is not None) and (m.group(1) == 'energyratestructure')]
+    n_periods = max([p for p, _ in cells], default=-1) + 1
+    n_tiers = max([t for _, t in cells], default=-1) + 1
+
+    hour_bytes = RES_BYTES_PER_HOUR + (RES_BYTES_PER_WINDOW_HOUR if window_hours > 1 else 0)
+    row_bytes = rates.memory_usage(index=False).sum() // max(len(rates), 1)
+
+    return n_periods*n_tiers*RES_BYTES_PER_CELL + 2*12*24*hour_bytes + row_bytes
+
+def dcfc_v2_batches(labels, structures, hourly_energy_df, memory_budget=None, n_batches=1):
+    """
+    Returns list of arrays of positions in labels (rate labels, in label 
+    order) that split the rates into n_batches batches for dcfc_costs_v2. If
+    memory_budget (bytes) is given, batches are split further so that the 
+    estimated working memory of each fits in it: dcfc_costs_v2 holds a row 
+    per rate and hour w/ energy in hourly_energy_df, and per rate, day (or 
+    month), period, and energy tier (see DCFC_V2_BYTES_PER_ROW). Rates that 
+    do not fit on their own are costed in batches of one.
+    """
+
+    order = np.argsort(labels, kind='stable')
+    batches = np.array_split(order, n_batches)
+    batches = [batch for batch in batches if len(batch) > 0] or batches[:1]
+    if memory_budget is None:
+        return batches
+
+    n_hours = (hourly_energy_df['energy_kwh'] > 0).sum()
+    n_tiers = structures.energy.valid[structures.get_index(labels)].sum(axis=2).max(axis=1, initial=0)
+    rate_bytes = n_hours * (1 + n_tiers) * DCFC_V2_BYTES_PER_ROW
+    if (rate_bytes > memory_budget).any():
+        logging.warning(f'{(rate_bytes > memory_budget).sum()} rates exceed the memory budget of {memory_budget/2**20:.0f} MiB on their own')
+
+    budget_batches = []
+    for batch in batches:
+        start, used = 0, 0
+        for i, size in enumerate(rate_bytes[batch]):
+            if (used + size > memory_budget) and (i > start):
+                budget_batches.append(batch[start:i])
+                start, used = i, 0
+            used += size
+        
+        budget_batches.append(batch[start:])
+
+    return budget_batches
+
+_DCFC_WORKER_STATE = {}
+
+def _init_dcfc_worker(structures, schedules):
+    """
+    Process pool initializer: keeps the rate side of the DCFC calculation in
+    the worker, so it is sent once per worker rather than once per task.
+    """
+
+    _DCFC_WORKER_STATE['structures'] = structures
+    _DCFC_WORKER_STATE['schedules'] = schedules
+
+def _dcfc_costs_v2_shard(rates, monthly_peak_pwr_df, hourly_energy_df, p):
+    return dcfc_costs_v2(rates, _DCFC_WORKER_STATE['structures'], _DCFC_WORKER_STATE['schedules'],
+                         monthly_peak_pwr_df, hourly_energy_df, p)
+
+def profile_energy_costs(determinants, schedules, energy):
+    """
+    Returns dict of name: float64 array of the annual energy cost of each
+    load profile in determinants (dict of name: profiles.LoadProfile) under
+    each rate, given the rates' energy TOU periods schedules (see 
+    DatabaseRates.get_schedules) and energy StructureArrays, in the same 
+    order. Profiles that share the same hours are billed together in one 
+    pass (see billing.cumulative_energy_cost).
+    """
+
+    calendars = {}
+    for p, det in determinants.items():
+        calendar = det.hourly_energy_df[['month', 'day', 'hour', 'weekday']]
+        calendars.setdefault(pd.util.hash_pandas_object(calendar, index=False).sum(), []).append(p)
+    
+    annual_energy_costs = {}
+    for group in calendars.values():
+        logging.info(f'Starting annual energy cost calculations for {group} ({len(schedules)} total)...')
+        calendar = determinants[group[0]].hourly_energy_df[['month', 'day', 'hour', 'weekday']]
+        energy_kwh = np.column_stack([determinants[p].hourly_energy_df['energy_kwh'].values for p in group])
+        peak_pwr = np.array([determinants[p].monthly_peak_kw for p in group])
+        costs = billing.cumulative_energy_cost(calendar, energy_kwh, peak_pwr, schedules, energy)
+        annual_energy_costs.update({p: costs[:, j] for j, p in enumerate(group)})
+
+    return annual_energy_costs
+
 class DatabaseRates(object):
     """
     Object for working with data downloaded from NREL's Utility Rate 
@@ -30,7 +515,9 @@ class DatabaseRates(object):
         URL used to download URDB data
     rate_data: 
         pandas.DataFrame where each row represents a unique utility rate,
-        unfiltered & unprocessed from the URDB.
+        unfiltered from the URDB; shared store of res_rate_data & 
+        com_rate_data, reduced to the rates they still select as they are
+        accessed
     res_rate_data:
         pandas.DataFrame where each row represents a unique residential utility
         rate
@@ -39,15 +526,59 @@ class DatabaseRates(object):
         rate
     prev_exists:
         Boolean indicating whether version of dataset has been previously ran
+    cache_path:
+        Path of the columnar URDB cache for urdb_file (None if not cached)
+    filter_steps:
+        list of dicts, one per filter step applied, see filter_report
+    schedules:
+        dict of 'energy'/'demand': (pandas.Index of labels, int8 numpy array
+        of shape (n_rates, 2, 12, 24)) of schedules parsed so far, see 
+        get_schedules
+
+    The urdb_file is loaded through a columnar cache stored in cache_dir 
+    (default: 'cache' folder next to urdb_file, see readwrite.read_urdb_csv);
+    pass cache_dir=False to always parse the .csv. When industry is 
+    'residential' or 'commercial', only the columns used by that pipeline 
+    (see pipeline_columns) and only active rates of that sector are loaded;
+    the other sector's rate data is then empty.
+
+    Residential and commercial rates are kept as selections of rows of 
+    rate_data rather than copies. Filter methods (filter_stale_rates, 
+    filter_demand_rates, filter_on_phrases, additional_com_rate_filters, 
+    filter_null_rates) only narrow the selection; classification and 
+    preprocessing steps write their columns to the selected rows of rate_data.
+    res_rate_data or com_rate_data are taken out of rate_data once, when 
+    they are first accessed (e.g. by a cost calculation): rate_data itself 
+    when no other industry selects any of its rows and all of its rows & 
+    columns are selected, a copy otherwise. rate_data is then reduced to the
+    rows other industries still select, so the rates are not held twice. 
+    Columns no cost calculation needs can be dropped with 
+    release_raw_columns, after which the rates of a single industry are 
+    taken w/o a copy.
     """
 
-    def __init__(self, urdb_file=None):
+    def __init__(self, urdb_file=None, cache_dir=None, industry=None):
         # Download URDB data
         self.source='https://openei.org/apps/USURDB/download/usurdb.csv.gz'
         
+        self.cache_path = None
+        self.schedules = {}
+        
         # Load URDB data
         if urdb_file is not None:
-            self.rate_data = pd.read_csv(urdb_file, low_memory=False)
+            self.cache_path = readwrite.urdb_cache_path(urdb_file, cache_dir)
+
+        if (urdb_file is not None) and (industry is not None):
+            self.rate_data = readwrite.read_urdb_csv(urdb_file, 
+                                                     cache_path=self.cache_path,
+                                                     cache_dir=cache_dir,
+                                                     usecols=pipeline_columns(industry),
+                                                     sectors=SECTORS[industry.lower()],
+                                                     active_only=True)
+        
+        elif urdb_file is not None:
+            self.rate_data = readwrite.read_urdb_csv(urdb_file, cache_path=self.cache_path, cache_dir=cache_dir)
+        
         else:
             self.rate_data = readwrite.read_urdb_data(self.source)
             
@@ -57,34 +588,298 @@ class DatabaseRates(object):
             # Save copy of URDB data (if unique) to data/urdb
             self.prev_exists = readwrite.write_urdb_rate_data(self.rate_data)
         
-        # Separate residential & commercial rates into separate dfs
-        self.res_rate_data = self.rate_data[self.rate_data['sector']=='Residential']
-        self.com_rate_data = self.rate_data[self.rate_data['sector'].isin(['Commercial', 'Industrial'])]
+            if industry is not None:
+                self.rate_data = self.rate_data[self.rate_data['sector'].isin(SECTORS[industry.lower()])&
+                                                self.rate_data['enddate'].isnull()]
+                self.rate_data = self.rate_data[[col for col in self.rate_data.columns if pipeline_columns(industry)(col)]]
+        
+        # Residential & commercial rates are views (row positions) of rate_data
+        self._rate_frames, self._active_rows, self._rate_columns = {}, {}, {}
+        self._column_dtypes = {ind: {} for ind in SECTORS}
+        self.filter_steps = []
+        for ind, sectors in SECTORS.items():
+            self._rate_frames[ind] = self.rate_data
+            self._active_rows[ind] = np.flatnonzero(self.rate_data['sector'].isin(sectors).values)
+            self._rate_columns[ind] = list(self.rate_data.columns)
+
+    @property
+    def res_rate_data(self):
+        return self._get_rate_data('residential')
+
+    @res_rate_data.setter
+    def res_rate_data(self, df):
+        self._set_rate_data('residential', df)
+
+    @property
+    def com_rate_data(self):
+        return self._get_rate_data('commercial')
+
+    @com_rate_data.setter
+    def com_rate_data(self, df):
+        self._set_rate_data('commercial', df)
+
+    def _check_industry(self, industry):
+        industry = industry.lower()
+        if industry not in SECTORS:
+            raise ValueError("industry must be 'residential' or 'commercial'!")
+        
+        return industry
 
-    def filter_stale_rates(self, industry):
+    def _set_rate_data(self, industry, df):
+        self._rate_frames[industry] = df
+        self._active_rows[industry] = None #all rows active
+        self._rate_columns[industry] = None #all columns
+
+    def _get_columns(self, industry):
+        columns = self._rate_columns[industry]
+        return list(self._rate_frames[industry].columns) if columns is None else columns
+
+    def _get_rate_data(self, industry):
         """
-        Removes rates w/ specified end date, so that only rates without 
-        end dates remain (active rates). The industry arg must be "residential" 
-        or "commercial".
+        Returns the rates of industry remaining after all filters as their own
+        pandas.DataFrame, taking them from the shared rate_data (one row & 
+        column selection) first if needed.
         """
 
-        industry = industry.lower()
-        if industry == 'residential':
-            df = self.res_rate_data
+        rows, columns = self._active_rows[industry], self._rate_columns[industry]
+        if (rows is not None) or (columns is not None):
+            df = self._rate_frames[industry]
+            if rows is None:
+                rows = np.arange(len(df))
+            
+            columns = self._get_columns(industry)
+            shared = any((self._rate_frames[ind] is df) and ((self._active_rows[ind] is None) or (len(self._active_rows[ind]) > 0))
+                         for ind in SECTORS if ind != industry)
+            if shared or not (np.array_equal(rows, np.arange(len(df))) and (list(df.columns) == columns)):
+                df = df.iloc[rows, df.columns.get_indexer(columns)]
+            
+            # Columns shared w/ the other industry may have been upcast
+            dtypes = {col: dtype for col, dtype in self._column_dtypes[industry].items() 
+                      if (col in df.columns) and (df[col].dtype != dtype)}
+            if len(dtypes) > 0:
+                df = df.astype(dtypes)
+            
+            self._set_rate_data(industry, df)
+            self._compact_store()
+
+        return self._rate_frames[industry]
+
+    def _compact_store(self, columns=None):
+        """
+        Keeps only the rows of rate_data still selected by an industry that 
+        views it, and only columns (default: all); rate_data is emptied once
+        no industry views it. Industries whose rates were taken from 
+        rate_data w/o a copy keep it as is.
+        """
+
+        views = [ind for ind in SECTORS if self._rate_frames[ind] is self.rate_data]
+        all_rows = [np.arange(len(self.rate_data)) if self._active_rows[ind] is None else self._active_rows[ind] for ind in views]
+        keep_rows = np.unique(np.concatenate(all_rows + [np.array([], dtype=int)]))
+        if columns is None:
+            columns = list(self.rate_data.columns)
         
-        elif industry == 'commercial':
-            df = self.com_rate_data
+        if (len(keep_rows) == len(self.rate_data)) and (columns == list(self.rate_data.columns)):
+            return
+
+        store = self.rate_data.iloc[keep_rows, self.rate_data.columns.get_indexer(columns)]
+        for ind, rows in zip(views, all_rows):
+            self._rate_frames[ind] = store
+            self._active_rows[ind] = np.searchsorted(keep_rows, rows)
         
-        else:
-            raise ValueError("Industry must be 'residential' or 'commercial'!")
+        self.rate_data = store
 
-        df = df[df.enddate.isnull()]
+    def _rate_view(self, industry, columns):
+        """
+        Returns pandas.DataFrame of columns of the rates of industry remaining 
+        after all filters, without copying the other columns.
+        """
 
-        if industry == 'residential':
-            self.res_rate_data = df
+        df, rows = self._rate_frames[industry], self._active_rows[industry]
+        if rows is None:
+            return df[columns]
         
-        elif industry == 'commercial':
-            self.com_rate_data = df     
+        return df[columns].iloc[rows]
+
+    def _apply_filter(self, industry, step, keep):
+        """
+        Drops the rates of industry where keep (bool array aligned with 
+        _rate_view rows) is False from the selected rows and records the step
+        in self.filter_steps.
+        """
+
+        keep = np.asarray(keep, dtype=bool)
+        rows = self._active_rows[industry]
+        if rows is None:
+            rows = np.arange(len(self._rate_frames[industry]))
+        
+        self._active_rows[industry] = rows[keep]
+        self.filter_steps.append({'industry': industry,
+                                  'step': step,
+                                  'rates_in': len(keep),
+                                  'rates_removed': int((~keep).sum()),
+                                  'rates_out': int(keep.sum())})
+        logging.info(f'{step} ({industry}): {int((~keep).sum())} of {len(keep)} rates removed')
+
+    def _replace_frame(self, old_df, new_df):
+        if self.rate_data is old_df:
+            self.rate_data = new_df
+        
+        for ind, df in self._rate_frames.items():
+            if df is old_df:
+                self._rate_frames[ind] = new_df
+
+    def _set_rate_columns(self, industry, columns):
+        """
+        Sets columns (dict of name: values aligned with _rate_view rows) on 
+        the rates of industry. Only the selected rows are written; other rows 
+        of new columns get NaN (or 0 for int/bool columns, None for object 
+        columns).
+        """
+
+        df, rows = self._rate_frames[industry], self._active_rows[industry]
+        new_columns = {}
+        for col, values in columns.items():
+            values = np.asarray(values)
+            if values.dtype.kind not in 'fciub':
+                values = values.astype(object)
+            
+            self._column_dtypes[industry][col] = values.dtype
+            if rows is not None:
+                if col in df.columns:
+                    full = df[col].to_numpy(copy=True)
+                    full = full.astype(np.result_type(full.dtype, values.dtype), copy=False)
+                
+                else:
+                    full = np.empty(len(df), dtype=values.dtype)
+                    if values.dtype.kind in 'fc':
+                        full.fill(np.nan)
+                    elif values.dtype.kind in 'iub':
+                        full.fill(0)
+                    else:
+                        full.fill(None)
+                
+                full[rows] = values
+                values = full
+
+            if col in df.columns:
+                df[col] = values
+            else:
+                new_columns[col] = values
+
+            if (self._rate_columns[industry] is not None) and (col not in self._rate_columns[industry]):
+                self._rate_columns[industry].append(col)
+
+        if len(new_columns) > 0:
+            new_df = pd.concat([df, pd.DataFrame(new_columns, index=df.index)], axis=1, copy=False)
+            self._replace_frame(df, new_df)
+
+    def release_raw_columns(self, industries=('residential', 'commercial')):
+        """
+        Drops the columns of rate_data (and of res_rate_data/com_rate_data) 
+        that the cost calculations of industries do not read (see 
+        calculation_columns); the rates of other industries are released 
+        entirely. Energy/demand schedules are parsed for the remaining rates
+        (see get_schedules) before their strings are dropped. Call after 
+        filtering, classification, and preprocessing, which need raw columns.
+        Returns the list of dropped columns.
+        """
+
+        industries = [self._check_industry(ind) for ind in industries]
+        for ind in SECTORS:
+            if ind not in industries:
+                self._set_rate_data(ind, self.rate_data.iloc[:0])
+        
+        for ind in industries:
+            kinds = ['energy', 'demand'] if ind == 'commercial' else ['energy']
+            for kind in kinds:
+                self.get_schedules(self._rate_view(ind, ['label', f'{kind}weekdayschedule', f'{kind}weekendschedule']), kind)
+        
+        is_needed = [calculation_columns(ind) for ind in industries]
+        def drop_cols(df):
+            return [col for col in df.columns if not any(needed(col) for needed in is_needed)]
+
+        dropped = drop_cols(self.rate_data)
+        self._compact_store([col for col in self.rate_data.columns if col not in dropped])
+
+        for ind in SECTORS:
+            df = self._rate_frames[ind]
+            if df is not self.rate_data:
+                dropped.extend([col for col in drop_cols(df) if col not in dropped])
+                self._rate_frames[ind] = df.drop(columns=drop_cols(df))
+            
+            if self._rate_columns[ind] is not None:
+                self._rate_columns[ind] = [col for col in self._rate_columns[ind] if col not in dropped]
+        
+        logging.info(f'{len(dropped)} raw URDB columns released')
+        return dropped
+
+    def filter_report(self, industry=None):
+        """
+        Returns pandas.DataFrame ['industry', 'step', 'rates_in', 
+        'rates_removed', 'rates_out'] with one row per filter step applied so 
+        far (all industries if industry is None), in the order applied.
+        """
+
+        report = pd.DataFrame(self.filter_steps, columns=['industry', 'step', 'rates_in', 'rates_removed', 'rates_out'])
+        if industry is not None:
+            report = report[report['industry']==self._check_industry(industry)].reset_index(drop=True)
+
+        return report
+
+    def get_schedules(self, df, kind='energy'):
+        """
+        Returns int8 array of shape (len(df), 2, 12, 24) of the 'energy' or 
+        'demand' TOU periods of the rates in df by [rate, day type (0 = weekday,
+        1 = weekend), month - 1, hour]. Schedule strings are parsed once per 
+        rate (see helpers.parse_schedules) and kept in self.schedules and with 
+        the URDB cache, so later calls and later runs only look them up. 
+        Missing or malformed schedules are -1.
+        """
+
+        assert kind in ['energy', 'demand'], "kind must be 'energy' or 'demand'"
+        
+        labels, periods = self.schedules.get(kind, (pd.Index([]), np.empty((0, 2, 12, 24), dtype=np.int8)))
+        new_rates = df[~df['label'].isin(labels)].drop_duplicates(subset='label')
+        
+        if len(new_rates) > 0:
+            new_periods = np.full((len(new_rates), 2, 12, 24), -1, dtype=np.int8)
+            to_parse = np.ones(len(new_rates), dtype=bool)
+            
+            cached = None if self.cache_path is None else readwrite.read_urdb_schedules(self.cache_path, kind)
+            if cached is not None:
+                cached_idx = pd.Index(cached[0]).get_indexer(new_rates['label'])
+                to_parse = cached_idx < 0
+                new_periods[~to_parse] = cached[1][cached_idx[~to_parse]]
+            
+            if to_parse.any():
+                new_periods[to_parse] = helpers.parse_schedules(new_rates[f'{kind}weekdayschedule'][to_parse], 
+                                                                new_rates[f'{kind}weekendschedule'][to_parse])
+            
+            labels = labels.append(pd.Index(new_rates['label']))
+            periods = np.concatenate([periods, new_periods])
+            self.schedules[kind] = (labels, periods)
+
+            if to_parse.any() and (self.cache_path is not None):
+                if cached is not None:
+                    all_labels = np.concatenate([cached[0], new_rates['label'].values[to_parse]])
+                    all_periods = np.concatenate([cached[1], new_periods[to_parse]])
+                else:
+                    all_labels, all_periods = new_rates['label'].values, new_periods
+                
+                readwrite.write_urdb_schedules(self.cache_path, kind, all_labels, all_periods)
+
+        return periods[labels.get_indexer(df['label'])]
+
+    def filter_stale_rates(self, industry):
+        """
+        Removes rates w/ specified end date, so that only rates without 
+        end dates remain (active rates). The industry arg must be "residential" 
+        or "commercial".
+        """
+
+        industry = self._check_industry(industry)
+        df = self._rate_view(industry, ['enddate'])
+        self._apply_filter(industry, 'filter_stale_rates', df.enddate.isnull().values)
 
     def classify_rate_structures(self, industry, ev_rate_words_file=os.path.join('filters','urdb_res_ev_specific_rate_words.txt')):
         """
@@ -97,25 +892,8 @@ class DatabaseRates(object):
         'is_tier_rate'==0, it is a flat rate.
         """
 
-        industry = industry.lower()
-        if industry == 'residential':
-            df = self.res_rate_data
-            
-            with open(ev_rate_words_file, 'r') as f:
-                filters = f.read().splitlines()
-            
-            df['is_ev_rate'] = ((df.name.apply(lambda x: helpers.contains_filter_phrases(x, filters)==True))|
-            (df.description.apply(lambda x: helpers.contains_filter_phrases(x, filters)))==True).map(int)
-
-        elif industry == 'commercial':
-            df = self.com_rate_data
-        
-        else:
-            raise ValueError("industry must be 'residential' or 'commercial'!")
-            
-        # Classify by rate structure
-        is_demand, is_tier, is_seasonal, is_tou = [], [], [], []
-
+        industry = self._check_industry(industry)
+        new_cols = {}
         tier_cols = []
         for tier in range(1,11): #period 0
             tier_cols.append('energyratestructure/period0/tier{}rate'.format(tier))
@@ -127,63 +905,52 @@ class DatabaseRates(object):
             for tier in range(1,5):
                 tier_cols.append('energyratestructure/period{0}/tier{1}rate'.format(per, tier))
 
-        for _, row in df.iterrows():
-            # Demand rate check
-            if (np.isnan(float(row['flatdemandstructure/period0/tier0rate'])) 
-            and np.isnan(float(row['demandratestructure/period0/tier0rate']))):
-                is_demand.append(0)
-            
-            else:
-                is_demand.append(1)
-
-            # Tier rate check
-            tier_check = int(row[tier_cols].isnull().all()==False)
-            is_tier.append(tier_check)
-
-            # Seasonal & TOU rate check
-            try:
-                year_wkdays = [ls.replace('[', '').replace(',', '').replace(' ', '') for ls in str(row['energyweekdayschedule']).split(']')][:-2]
-                year_wknds = [ls.replace('[', '').replace(',', '').replace(' ', '') for ls in str(row['energyweekendschedule']).split(']')][:-2]
-
-                #seasonal
-                if (len(set(year_wkdays))>1) or (len(set(year_wknds))>1):
-                    seasonal=1
-                else:
-                    seasonal=0
-
-                is_seasonal.append(seasonal)
+        df = self._rate_view(industry, ['label', 'name', 'description', 
+                                        'flatdemandstructure/period0/tier0rate',
+                                        'demandratestructure/period0/tier0rate',
+                                        'energyweekdayschedule', 'energyweekendschedule'] + tier_cols)
 
-                #TOU
-                tous =[]
-                for wkday_month, wknd_month in zip(year_wkdays, year_wknds):
-                    if (len(set(wkday_month))>1) or (len(set(wknd_month))>1):
-                        tous.append(1)
-                    
-                    else:
-                        tous.append(0)
-                
-                if np.array(tous).sum()==0:
-                    tou=0
-                
-                else:
-                    tou=1
-
-                is_tou.append(tou)
+        if industry == 'residential':
+            with open(ev_rate_words_file, 'r') as f:
+                filters = f.read().splitlines()
             
-            except:
-                is_seasonal.append(np.nan)
-                is_tou.append(np.nan)
+            new_cols['is_ev_rate'] = (helpers.find_filter_phrases(df.name, filters).notnull()|
+                                      helpers.find_filter_phrases(df.description, filters).notnull()).map(int).values
+            
+        # Classify by rate structure
+        # Demand rate check
+        is_demand = ((df['flatdemandstructure/period0/tier0rate'].astype(float).notnull())|
+                     (df['demandratestructure/period0/tier0rate'].astype(float).notnull())).astype(int).values
+
+        # Tier rate check
+        is_tier = df[tier_cols].notnull().any(axis=1).astype(int).values
+
+        # Seasonal & TOU rate check: seasonal if any month's periods differ, 
+        # TOU if any day has more than one period (weekday or weekend)
+        schedules = self.get_schedules(df, 'energy')
+        is_seasonal = (schedules != schedules[:, :, :1, :]).any(axis=(1, 2, 3)).astype(float)
+        is_tou = (schedules != schedules[:, :, :, :1]).any(axis=(1, 2, 3)).astype(float)
+
+        # Schedules with missing, multi-digit, or irregular periods keep the 
+        # character-based check of helpers.classify_schedule
+        wkdays, wknds = df['energyweekdayschedule'].values, df['energyweekendschedule'].values
+        simple = ((schedules >= 0) & (schedules < 10)).all(axis=(1, 2, 3))
+        simple &= helpers.simple_schedule_mask(wkdays) & helpers.simple_schedule_mask(wknds)
+        checked = {}
+        for i in np.flatnonzero(~simple):
+            if (wkdays[i], wknds[i]) not in checked:
+                checked[(wkdays[i], wknds[i])] = helpers.classify_schedule(wkdays[i], wknds[i])
+            
+            is_seasonal[i], is_tou[i] = checked[(wkdays[i], wknds[i])]
 
-        df['is_demand_rate'] = is_demand
-        df['is_tier_rate'] = is_tier
-        df['is_seasonal_rate'] = is_seasonal
-        df['is_tou_rate'] = is_tou
+        if not (np.isnan(is_seasonal).any() or np.isnan(is_tou).any()):
+            is_seasonal, is_tou = is_seasonal.astype(int), is_tou.astype(int)
 
-        if industry == 'residential':
-            self.res_rate_data = df
-        
-        elif industry == 'commercial':
-            self.com_rate_data = df
+        new_cols['is_demand_rate'] = is_demand
+        new_cols['is_tier_rate'] = is_tier
+        new_cols['is_seasonal_rate'] = is_seasonal
+        new_cols['is_tou_rate'] = is_tou
+        self._set_rate_columns(industry, new_cols)
 
     def generate_classification_tree_values(self, industry):
         """
@@ -191,15 +958,8 @@ class DatabaseRates(object):
         in the rate structure classification tree.
         """
 
-        industry = industry.lower()
-        if industry == 'residential':
-            df = self.res_rate_data
-        
-        elif industry == 'commercial':
-            df = self.com_rate_data
-        
-        else:
-            raise ValueError("industry must be 'residential' or 'commercial'!")
+        industry = self._check_industry(industry)
+        df = self._rate_view(industry, ['is_demand_rate', 'is_tier_rate', 'is_seasonal_rate', 'is_tou_rate'])
 
         class_tree_cnts = {}
         class_tree_cnts['demand'] = len(df[df.is_demand_rate==1])
@@ -240,40 +1000,27 @@ class DatabaseRates(object):
         Filters rates w/ demand charges.
         """
 
-        industry = industry.lower()
-        if industry == 'residential':
-            df = self.res_rate_data
-        
-        elif industry == 'commercial':
-            df = self.com_rate_data
-        
-        else:
-            raise ValueError("industry must be 'residential' or 'commercial'!")
-
-        df = df[df.is_demand_rate==0]
+        industry = self._check_industry(industry)
+        df = self._rate_view(industry, ['is_demand_rate'])
+        self._apply_filter(industry, 'filter_demand_rates', (df.is_demand_rate==0).values)
 
-        if industry == 'residential':
-            self.res_rate_data = df
-        
-        elif industry == 'commercial':
-            self.com_rate_data = df
-
-    def filter_on_phrases(self, industry, filters_path=os.path.join(config.HOME_PATH,'filters')):
+    def filter_on_phrases(self, industry, filters_path=os.path.join(config.HOME_PATH,'filters'), audit=False):
         """Filters rates on lists of filter phrases: 
         filters/urdb_res_filters.txt for residential rates and
-        filters/urdb_dcfc_filters.txt for commercial rates.
+        filters/urdb_dcfc_filters.txt for commercial rates. Phrases are 
+        matched case-insensitively anywhere in 'name' or 'description' (see 
+        helpers.find_filter_phrases). If audit, returns pandas.DataFrame of 
+        the removed rates ['label', 'name', 'description'] with the phrase 
+        that triggered each removal ('name_phrase', 'description_phrase').
         """
-        industry = industry.lower()
+        industry = self._check_industry(industry)
         if industry == 'residential':
-            df = self.res_rate_data
             filters_file = os.path.join(filters_path,'urdb_res_filters.txt')
         
         elif industry == 'commercial':
-            df = self.com_rate_data
             filters_file = os.path.join(filters_path,'urdb_dcfc_filters.txt')
-        
-        else:
-            raise ValueError("industry must be 'residential' or 'commercial'!")
+
+        df = self._rate_view(industry, ['label', 'name', 'description'])
 
         with open(filters_file, 'r') as f:
             filters = f.read().splitlines()
@@ -282,14 +1029,19 @@ class DatabaseRates(object):
         filters = filters.str.strip()
         filters = filters.to_list()
 
-        df = df[((df.name.apply(lambda x: helpers.contains_filter_phrases(x, filters)))==False)&
-        ((df.description.apply(lambda x: helpers.contains_filter_phrases(x, filters)))==False)]
+        name_phrases = helpers.find_filter_phrases(df.name, filters)
+        description_phrases = helpers.find_filter_phrases(df.description, filters)
+        excluded = (name_phrases.notnull()|description_phrases.notnull()).values
 
-        if industry == 'residential':
-            self.res_rate_data = df
-        
-        elif industry == 'commercial':
-            self.com_rate_data = df
+        if audit:
+            audit_df = df.loc[excluded, ['label', 'name', 'description']]
+            audit_df['name_phrase'] = name_phrases.values[excluded]
+            audit_df['description_phrase'] = description_phrases.values[excluded]
+
+        self._apply_filter(industry, 'filter_on_phrases', ~excluded)
+
+        if audit:
+            return audit_df.reset_index(drop=True)
 
     def additional_com_rate_filters(self):
         """
@@ -297,32 +1049,28 @@ class DatabaseRates(object):
         cost of electricity.
         """
 
-        df = self.com_rate_data
-        
-        # Filter rates that don't use kW, kWh
-        df = df[(df.demandrateunit == 'kW')|
-                (df.flatdemandunit == 'kW')]
-
-        # Filter rates in $/day (fixed charge)
-        df = df[df.fixedchargeunits != '$/day']
-
-        # Filter rates w/ min voltages higher than 900 V
-        df = df[(df.voltageminimum <= 900)|(df.voltageminimum.isnull())]
-
-        # Filter rates w/ coincident demand structure (can't predict utility peak dmnd)
-        df = df[df['coincidentratestructure/period0/tier0rate'].isnull()]
+        filters = [('demand units not kW', lambda df: (df.demandrateunit == 'kW')|(df.flatdemandunit == 'kW')),
+                   ('fixed charge in $/day', lambda df: df.fixedchargeunits != '$/day'),
+                   ('min voltage > 900 V', lambda df: (df.voltageminimum <= 900)|(df.voltageminimum.isnull())),
+                   ('coincident demand rate', lambda df: df['coincidentratestructure/period0/tier0rate'].isnull()), #can't predict utility peak dmnd
+                   ('no energy rate', lambda df: ~df['energyratestructure/period0/tier0rate'].isnull())]
 
-        # Filter rates w/o energy rate information
-        df = df[~df['energyratestructure/period0/tier0rate'].isnull()]
-
-        self.com_rate_data = df
+        df = self._rate_view('commercial', ['demandrateunit', 'flatdemandunit', 'fixedchargeunits', 'voltageminimum',
+                                            'coincidentratestructure/period0/tier0rate', 
+                                            'energyratestructure/period0/tier0rate'])
+        for step, keep_rates in filters:
+            keep = keep_rates(df).values
+            self._apply_filter('commercial', f'additional_com_rate_filters: {step}', keep)
+            df = df[keep]
 
     def com_rate_preprocessing(self):
         """
         Standardizes units and reporting for commercial rates.
         """
 
-        df = self.com_rate_data
+        df = self._rate_view('commercial', ['fixedchargefirstmeter', 'fixedchargeunits', 
+                                            'peakkwcapacitymin', 'peakkwhusagemin', 
+                                            'peakkwcapacitymax', 'peakkwhusagemax'])
 
         # Set: fixed charge = 0 when fixed charge == NULL 
         df['fixedchargefirstmeter'] = df['fixedchargefirstmeter'].fillna(0)
@@ -355,364 +1103,210 @@ class DatabaseRates(object):
         df['peakkwcapacitymax'] = df['peakkwcapacitymax'].fillna(np.inf)
         df['peakkwhusagemax'] = df['peakkwhusagemax'].fillna(np.inf)
 
-        self.com_rate_data = df
+        self._set_rate_columns('commercial', {col: df[col].values for col in df.columns})
 
     def combine_rates(self, industry):
         """
-        Adds 57 columns to self.res_rate_data and self.com_rate_data that are the 
-        sum of the base rate and adjusted rate.
+        Adds an 'energyrate/period{p}/tier{t}' column to self.res_rate_data or 
+        self.com_rate_data for every 'energyratestructure/period{p}/tier{t}rate' 
+        column present, that is the sum of the base rate and adjusted rate 
+        (NULL adj = 0). The combined rates are computed as one block and 
+        appended in period, tier order.
         """
 
-        industry = industry.lower()
-        if industry == 'residential':
-            df = self.res_rate_data
-        
-        elif industry == 'commercial':
-            df = self.com_rate_data
-        
-        else:
-            raise ValueError("industry must be 'residential' or 'commercial'!")
+        industry = self._check_industry(industry)
+        columns = self._get_columns(industry)
 
-        #period 0 (11 tiers)
-        df['energyrate/period0/tier0'] = df['energyratestructure/period0/tier0rate'] + df['energyratestructure/period0/tier0adj'].fillna(0)
-        df['energyrate/period0/tier1'] = df['energyratestructure/period0/tier1rate'] + df['energyratestructure/period0/tier1adj'].fillna(0)
-        df['energyrate/period0/tier2'] = df['energyratestructure/period0/tier2rate'] + df['energyratestructure/period0/tier2adj'].fillna(0)
-        df['energyrate/period0/tier3'] = df['energyratestructure/period0/tier3rate'] + df['energyratestructure/period0/tier3adj'].fillna(0)
-        df['energyrate/period0/tier4'] = df['energyratestructure/period0/tier4rate'] + df['energyratestructure/period0/tier4adj'].fillna(0)
-        df['energyrate/period0/tier5'] = df['energyratestructure/period0/tier5rate'] + df['energyratestructure/period0/tier5adj'].fillna(0)
-        df['energyrate/period0/tier6'] = df['energyratestructure/period0/tier6rate'] + df['energyratestructure/period0/tier6adj'].fillna(0)
-        df['energyrate/period0/tier7'] = df['energyratestructure/period0/tier7rate'] + df['energyratestructure/period0/tier7adj'].fillna(0)
-        df['energyrate/period0/tier8'] = df['energyratestructure/period0/tier8rate'] + df['energyratestructure/period0/tier8adj'].fillna(0)
-        df['energyrate/period0/tier9'] = df['energyratestructure/period0/tier9rate'] + df['energyratestructure/period0/tier9adj'].fillna(0)
-        df['energyrate/period0/tier10'] = df['energyratestructure/period0/tier10rate'] + df['energyratestructure/period0/tier10adj'].fillna(0)
-        
-        #period 1 (8 tiers)
-        df['energyrate/period1/tier0'] = df['energyratestructure/period1/tier0rate'] + df['energyratestructure/period1/tier0adj'].fillna(0)
-        df['energyrate/period1/tier1'] = df['energyratestructure/period1/tier1rate'] + df['energyratestructure/period1/tier1adj'].fillna(0)
-        df['energyrate/period1/tier2'] = df['energyratestructure/period1/tier2rate'] + df['energyratestructure/period1/tier2adj'].fillna(0)
-        df['energyrate/period1/tier3'] = df['energyratestructure/period1/tier3rate'] + df['energyratestructure/period1/tier3adj'].fillna(0)
-        df['energyrate/period1/tier4'] = df['energyratestructure/period1/tier4rate'] + df['energyratestructure/period1/tier4adj'].fillna(0)
-        df['energyrate/period1/tier5'] = df['energyratestructure/period1/tier5rate'] + df['energyratestructure/period1/tier5adj'].fillna(0)
-        df['energyrate/period1/tier6'] = df['energyratestructure/period1/tier6rate'] + df['energyratestructure/period1/tier6adj'].fillna(0)
-        df['energyrate/period1/tier7'] = df['energyratestructure/period1/tier7rate'] + df['energyratestructure/period1/tier7adj'].fillna(0)
-
-        #period 2 (5 tiers)
-        df['energyrate/period2/tier0'] = df['energyratestructure/period2/tier0rate'] + df['energyratestructure/period2/tier0adj'].fillna(0)
-        df['energyrate/period2/tier1'] = df['energyratestructure/period2/tier1rate'] + df['energyratestructure/period2/tier1adj'].fillna(0)
-        df['energyrate/period2/tier2'] = df['energyratestructure/period2/tier2rate'] + df['energyratestructure/period2/tier2adj'].fillna(0)
-        df['energyrate/period2/tier3'] = df['energyratestructure/period2/tier3rate'] + df['energyratestructure/period2/tier3adj'].fillna(0)
-        df['energyrate/period2/tier4'] = df['energyratestructure/period2/tier4rate'] + df['energyratestructure/period2/tier4adj'].fillna(0)
-
-        #period 3 (5 tiers)
-        df['energyrate/period3/tier0'] = df['energyratestructure/period3/tier0rate'] + df['energyratestructure/period3/tier0adj'].fillna(0)
-        df['energyrate/period3/tier1'] = df['energyratestructure/period3/tier1rate'] + df['energyratestructure/period3/tier1adj'].fillna(0)
-        df['energyrate/period3/tier2'] = df['energyratestructure/period3/tier2rate'] + df['energyratestructure/period3/tier2adj'].fillna(0)
-        df['energyrate/period3/tier3'] = df['energyratestructure/period3/tier3rate'] + df['energyratestructure/period3/tier3adj'].fillna(0)
-        df['energyrate/period3/tier4'] = df['energyratestructure/period3/tier4rate'] + df['energyratestructure/period3/tier4adj'].fillna(0)
-
-        #period 4 (5 tiers)
-        df['energyrate/period4/tier0'] = df['energyratestructure/period4/tier0rate'] + df['energyratestructure/period4/tier0adj'].fillna(0)
-        df['energyrate/period4/tier1'] = df['energyratestructure/period4/tier1rate'] + df['energyratestructure/period4/tier1adj'].fillna(0)
-        df['energyrate/period4/tier2'] = df['energyratestructure/period4/tier2rate'] + df['energyratestructure/period4/tier2adj'].fillna(0)
-        df['energyrate/period4/tier3'] = df['energyratestructure/period4/tier3rate'] + df['energyratestructure/period4/tier3adj'].fillna(0)
-        df['energyrate/period4/tier4'] = df['energyratestructure/period4/tier4rate'] + df['energyratestructure/period4/tier4adj'].fillna(0)
-
-        #period 5 (5 tiers)
-        df['energyrate/period5/tier0'] = df['energyratestructure/period5/tier0rate'] + df['energyratestructure/period5/tier0adj'].fillna(0)
-        df['energyrate/period5/tier1'] = df['energyratestructure/period5/tier1rate'] + df['energyratestructure/period5/tier1adj'].fillna(0)
-        df['energyrate/period5/tier2'] = df['energyratestructure/period5/tier2rate'] + df['energyratestructure/period5/tier2adj'].fillna(0)
-        df['energyrate/period5/tier3'] = df['energyratestructure/period5/tier3rate'] + df['energyratestructure/period5/tier3adj'].fillna(0)
-        df['energyrate/period5/tier4'] = df['energyratestructure/period5/tier4rate'] + df['energyratestructure/period5/tier4adj'].fillna(0)
-
-        #period 6-23
-        df['energyrate/period6/tier0'] = df['energyratestructure/period6/tier0rate'] + df['energyratestructure/period6/tier0adj'].fillna(0)
-        df['energyrate/period7/tier0'] = df['energyratestructure/period7/tier0rate'] + df['energyratestructure/period7/tier0adj'].fillna(0)
-        df['energyrate/period8/tier0'] = df['energyratestructure/period8/tier0rate'] + df['energyratestructure/period8/tier0adj'].fillna(0)
-        df['energyrate/period9/tier0'] = df['energyratestructure/period9/tier0rate'] + df['energyratestructure/period9/tier0adj'].fillna(0)
-        df['energyrate/period10/tier0'] = df['energyratestructure/period10/tier0rate'] + df['energyratestructure/period10/tier0adj'].fillna(0)
-        df['energyrate/period11/tier0'] = df['energyratestructure/period11/tier0rate'] + df['energyratestructure/period11/tier0adj'].fillna(0)
-        df['energyrate/period12/tier0'] = df['energyratestructure/period12/tier0rate'] + df['energyratestructure/period12/tier0adj'].fillna(0)
-        df['energyrate/period13/tier0'] = df['energyratestructure/period13/tier0rate'] + df['energyratestructure/period13/tier0adj'].fillna(0)
-        df['energyrate/period14/tier0'] = df['energyratestructure/period14/tier0rate'] + df['energyratestructure/period14/tier0adj'].fillna(0)
-        df['energyrate/period15/tier0'] = df['energyratestructure/period15/tier0rate'] + df['energyratestructure/period15/tier0adj'].fillna(0)
-        df['energyrate/period16/tier0'] = df['energyratestructure/period16/tier0rate'] + df['energyratestructure/period16/tier0adj'].fillna(0)
-        df['energyrate/period17/tier0'] = df['energyratestructure/period17/tier0rate'] + df['energyratestructure/period17/tier0adj'].fillna(0)
-        df['energyrate/period18/tier0'] = df['energyratestructure/period18/tier0rate'] + df['energyratestructure/period18/tier0adj'].fillna(0)
-        df['energyrate/period19/tier0'] = df['energyratestructure/period19/tier0rate'] + df['energyratestructure/period19/tier0adj'].fillna(0)
-        df['energyrate/period20/tier0'] = df['energyratestructure/period20/tier0rate'] + df['energyratestructure/period20/tier0adj'].fillna(0)
-        df['energyrate/period21/tier0'] = df['energyratestructure/period21/tier0rate'] + df['energyratestructure/period21/tier0adj'].fillna(0)
-        df['energyrate/period22/tier0'] = df['energyratestructure/period22/tier0rate'] + df['energyratestructure/period22/tier0adj'].fillna(0)
-        df['energyrate/period23/tier0'] = df['energyratestructure/period23/tier0rate'] + df['energyratestructure/period23/tier0adj'].fillna(0)
+        cells = []
+        for col in columns:
+            match = readwrite.URDB_STRUCTURE_COL.match(col)
+            if (match is not None) and (match.group(1) == 'energyratestructure') and (match.group(4) == 'rate'):
+                cells.append((int(match.group(2)), int(match.group(3))))
+        cells.sort()
 
-        if industry == 'residential':
-            self.res_rate_data = df
+        rate_cols = ['energyratestructure/period{0}/tier{1}rate'.format(p, t) for p, t in cells]
+        adj_cols = ['energyratestructure/period{0}/tier{1}adj'.format(p, t) for p, t in cells]
+        df = self._rate_view(industry, rate_cols + [col for col in adj_cols if col in columns])
         
-        elif industry == 'commercial':
-            self.com_rate_data = df
+        rates = df[rate_cols].to_numpy(dtype='float64')
+        adjs = df.reindex(columns=adj_cols).to_numpy(dtype='float64')
+        combined = rates + np.nan_to_num(adjs, nan=0)
+        
+        self._set_rate_columns(industry, {'energyrate/period{0}/tier{1}'.format(p, t): combined[:, i] 
+                                          for i, (p, t) in enumerate(cells)})
 
     def filter_null_rates(self, industry):
         """
         Filters rates with no cost information.
         """
 
-        industry = industry.lower()
-        if industry == 'residential':
-            df = self.res_rate_data
-        
-        elif industry == 'commercial':
-            df = self.com_rate_data
-        
-        else:
-            raise ValueError("industry must be 'residential' or 'commercial'!")
+        industry = self._check_industry(industry)
+        df = self._rate_view(industry, ['energyrate/period0/tier0'])
+        self._apply_filter(industry, 'filter_null_rates', df['energyrate/period0/tier0'].notnull().values)
 
-        df = df.dropna(subset=['energyrate/period0/tier0'])
-
-        if industry == 'residential':
-            self.res_rate_data = df
-        
-        elif industry == 'commercial':
-            self.com_rate_data = df
-
-    def calculate_annual_energy_cost_residential(self, outpath=os.path.join(config.OUTPUT_PATH,'cost-of-electricity','urdb-res-rates')):
+    def calculate_annual_energy_cost_residential(self, outpath=os.path.join(config.OUTPUT_PATH,'cost-of-electricity','urdb-res-rates'), structures=None,
+                                                 batch_size=None, memory_budget=None, charging_hours=1,
+                                                 household_kwh=None, ev_kwh=None):
         """
         Calculates the annualized energy costs for residential rates. Estimates 
         account for seasonal, tier, and TOU rate structures. Key assumptions 
-        include: 1) Charging occurs with the same freqency irregardless of 
+        include: 1) Charging occurs with the same frequency regardless of 
         weekday vs. weekend or season (time of year); 2) Charging occurs with 
-        the same frequency across rate tiers; 3) For TOU rates, charging will 
-        always occur when it is cheapest to do so (off-peak). Adds 
-        'electricity_cost_per_kwh' col to self.res_rate_data.
+        the same frequency across rate tiers (tier rates are averaged, see 
+        billing.period_average_rates); 3) For TOU rates, charging will 
+        always occur when it is cheapest to do so (off-peak): in the 
+        cheapest period, or, for charging_hours > 1, in the cheapest window 
+        of charging_hours consecutive hours, e.g. 4-10 for overnight L1/L2 
+        sessions (see billing.cheapest_period_cost). If household_kwh 
+        (baseline monthly energy of a sample of households) and ev_kwh 
+        (monthly EV energy) are given, tiered rates are instead priced at 
+        the expected marginal rate of the EV energy on top of each 
+        household's energy (see billing.marginal_tier_rates). Adds 
+        'electricity_cost_per_kwh' col to self.res_rate_data, removes rates 
+        w/ negative or missing costs, and saves the rates to res_rates.csv 
+        in outpath. Rate structures are read from structures 
+        (structures.RateStructures of self.res_rate_data), or, if None, 
+        compiled batch by batch.
+
+        Rates are costed and appended to res_rates.csv batch_size rates at a 
+        time; only the cost of each rate is kept across batches, so the 
+        working memory does not grow w/ the number of rates. Energy 
+        structures and TOU schedules (parsed once per rate, see 
+        get_schedules) are taken per batch. If batch_size is None, it is set
+        from memory_budget (bytes, default: RES_MEMORY_SHARE of 
+        helpers.available_memory()) at res_bytes_per_rate per rate. Results
+        do not depend on batch_size.
         """
 
-        # Fixed Rates - incl. seasonal & TOU
-        res_rates_fixed = self.res_rate_data[self.res_rate_data.is_tier_rate==0]
-        avg_costs = []
-        for i in range(len(res_rates_fixed)):
-            month_rates = []
-            
-            #weekday
-            for month in [ls.replace('[', '').replace(',', '').replace(' ', '').replace('L','') for ls in str(res_rates_fixed.iloc[i]['energyweekdayschedule']).split(']')][:-2]: #seasonal
-                periods = (list(set(month)))
-                day_rates = []
-                
-                for per in periods: #TOU
-                    rate_str = 'energyrate/period{}/tier0'.format(per)
-                    rate = res_rates_fixed.iloc[i][rate_str]
-                    day_rates.append(rate)
-
-                min_day_rate = min(np.array(day_rates))       
-                month_rates.extend([min_day_rate]*5)
-
-            #weekend
-            for month in [ls.replace('[', '').replace(',', '').replace(' ', '').replace('L','') for ls in str(res_rates_fixed.iloc[i]['energyweekendschedule']).split(']')][:-2]: #seasonal
-                periods = (list(set(month)))
-                day_rates = []
-                
-                for per in periods: #TOU
-                    rate_str = 'energyrate/period{}/tier0'.format(per)
-                    rate = res_rates_fixed.iloc[i][rate_str]
-                    day_rates.append(rate)
+        if (household_kwh is None) != (ev_kwh is None):
+            raise ValueError("household_kwh and ev_kwh must be given together!")
 
-                min_day_rate = min(np.array(day_rates))       
-                month_rates.extend([min_day_rate]*2)
+        res_df = self.res_rate_data
+        if batch_size is None:
+            if memory_budget is None:
+                available = helpers.available_memory()
+                memory_budget = RES_MEMORY_SHARE * available if available is not None else np.inf
 
-            avg_cost = np.array(month_rates).mean() #dow-weighted cost
-            avg_costs.append(avg_cost)
+            batch_size = len(res_df) if np.isinf(memory_budget) else int(memory_budget // res_bytes_per_rate(res_df, charging_hours))
+        
+        batch_size = max(1, batch_size)
+        logging.info(f'residential costs, {len(res_df)} rates in batches of {batch_size}')
+
+        outfile = os.path.join(outpath,'res_rates.csv')
+        costs = np.full(len(res_df), np.nan)
+        for start in range(0, max(len(res_df), 1), batch_size):
+            batch = slice(start, start + batch_size)
+            batch_df = res_df.iloc[batch]
+            if structures is None:
+                energy = StructureArrays(batch_df, 'energyratestructure')
+            else:
+                energy = structures.energy.take(structures.get_index(batch_df['label']))
+            period_rates = billing.period_average_rates(energy)
+            if household_kwh is not None:
+                tiered = np.flatnonzero(batch_df['is_tier_rate'].values==1)
+                period_rates[tiered] = billing.marginal_tier_rates(energy.take(tiered), household_kwh, ev_kwh)
             
-        res_rates_fixed['electricity_cost_per_kwh'] = avg_costs
-
-        # Tier Rates - incl. seasonal & TOU
-        res_rates_tier = self.res_rate_data[self.res_rate_data.is_tier_rate==1]
-        avg_costs = []
-        for i in range(len(res_rates_tier)): #tier rate = avg of all tiers
-            avg_tier_rates = []
-            avg_tier_month_rates = []
-            for p in range(24):
-                if p==0:
-                    tier_rates = []
-                    for t in range(11):
-                        rate_str = 'energyrate/period{0}/tier{1}'.format(p,t)
-                        rate = res_rates_tier.iloc[i][rate_str]
-                        tier_rates.append(rate)
-                    
-                    with warnings.catch_warnings(): #supress warnings
-                        warnings.simplefilter("ignore", category=RuntimeWarning)
-                        avg_tier_rate = np.nanmean(np.array(tier_rates))  
-                    
-                    avg_tier_rates.append(avg_tier_rate)
-
-                elif p==1:
-                    tier_rates = []
-                    for t in range(8):
-                        rate_str = 'energyrate/period{0}/tier{1}'.format(p,t)
-                        rate = res_rates_tier.iloc[i][rate_str]
-                        tier_rates.append(rate)
-                    
-                    with warnings.catch_warnings(): #supress warnings
-                        warnings.simplefilter("ignore", category=RuntimeWarning)
-                        avg_tier_rate = np.nanmean(np.array(tier_rates))
-    
-                    avg_tier_rates.append(avg_tier_rate)
+            costs[batch] = billing.cheapest_period_cost(self.get_schedules(batch_df, 'energy'), period_rates,
+                                                        window_hours=charging_hours)
 
-                elif p>=2 and p<6:
-                    tier_rates = []
-                    for t in range(5):
-                        rate_str = 'energyrate/period{0}/tier{1}'.format(p,t)
-                        rate = res_rates_tier.iloc[i][rate_str]
-                        tier_rates.append(rate)
-                    
-                    with warnings.catch_warnings(): #supress warnings
-                        warnings.simplefilter("ignore", category=RuntimeWarning)
-                        avg_tier_rate = np.nanmean(np.array(tier_rates))
+            keep = costs[batch] >= 0 # remove negative rates
+            batch_df[keep].assign(electricity_cost_per_kwh=costs[batch][keep]).to_csv(
+                outfile, index=False, mode='w' if start == 0 else 'a', header=(start == 0))
 
-                    avg_tier_rates.append(avg_tier_rate)
+        res_df['electricity_cost_per_kwh'] = costs
+        self.res_rate_data = res_df[costs >= 0].reset_index(drop=True)
+        logging.info(f'residential costs complete, {len(self.res_rate_data)} rates included.')
 
-                else:
-                    rate_str = 'energyrate/period{0}/tier0'.format(p)
-                    rate = res_rates_tier.iloc[i][rate_str]
-                    avg_tier_rates.append(rate)
-   
-
-            #weekday rates
-            months = [ls.replace('[', '').replace(',', '').replace(' ', '').replace('L','') for ls in str(res_rates_tier.iloc[i]['energyweekdayschedule']).split(']')][:-2] 
-            for month in months: #seasonal
-                periods = (list(set(month)))
-                avg_rates = []
-                for per in periods: #TOU
-                    per = int(per)
-                    avg_tier_rate = avg_tier_rates[per]
-                    avg_rates.append(avg_tier_rate)
-
-                min_avg_tier_day_rate = min(np.array(avg_rates))
-                avg_tier_month_rates.extend([min_avg_tier_day_rate]*5)
-
-            #weekend rates
-            months = [ls.replace('[', '').replace(',', '').replace(' ', '').replace('L','') for ls in str(res_rates_tier.iloc[i]['energyweekendschedule']).split(']')][:-2]
-            for month in months:
-                periods = (list(set(month)))
-                avg_rates = []
-                for per in periods:
-                    per = int(per)
-                    avg_tier_rate = avg_tier_rates[per]
-                    avg_rates.append(avg_tier_rate)
-
-                min_avg_tier_day_rate = min(np.array(avg_rates))
-                avg_tier_month_rates.extend([min_avg_tier_day_rate]*2)
-                
-            avg_cost = np.array(avg_tier_month_rates).mean() #dow-weighted cost
-            avg_costs.append(avg_cost)
+    def calculate_annual_energy_cost_residential_v2(self,outpath=os.path.join(config.OUTPUT_PATH,'cost-of-electricity','urdb-res-rates'), structures=None,
+                                                    batch_size=None, memory_budget=None, charging_hours=1,
+                                                    household_kwh=None, ev_kwh=None):
+        """
+        Same as calculate_annual_energy_cost_residential, which replaced the 
+        v1 (per rate) and v2 (long format) implementations; kept for 
+        existing callers.
+        """
 
-        res_rates_tier['electricity_cost_per_kwh'] = avg_costs
-        res_df = pd.concat([res_rates_fixed, res_rates_tier], sort=False)
-        res_df = res_df[res_df.electricity_cost_per_kwh>=0]  #remove negative rates
-        self.res_rate_data = res_df
-        
-        self.res_rate_data.to_csv(os.path.join(outpath,'res_rates_v1.csv'), index=False)
-        print("Complete, {} rates included.".format(len(self.res_rate_data)))
-    
-    def calculate_annual_energy_cost_residential_v2(self,outpath=os.path.join(config.OUTPUT_PATH,'cost-of-electricity','urdb-res-rates')):
+        self.calculate_annual_energy_cost_residential(outpath=outpath, structures=structures, 
+                                                      batch_size=batch_size, memory_budget=memory_budget,
+                                                      charging_hours=charging_hours, household_kwh=household_kwh,
+                                                      ev_kwh=ev_kwh)
+
+
+    def calculate_annual_cost_residential_profiles(self, 
+                                                   res_load_profiles,
+                                                   outpath = os.path.join(config.OUTPUT_PATH,'cost-of-electricity','urdb-res-rates'),
+                                                   structures = None):
         """
-        V2 = faster version using pandas vectorization
-        Calculates the annualized energy costs for residential rates. Estimates 
-        account for seasonal, tier, and TOU rate structures. Key assumptions 
-        include: 1) Charging occurs with the same frequency regardless of 
-        weekday vs. weekend or season (time of year); 2) Charging occurs with 
-        the same frequency across rate tiers; 3) For TOU rates, charging will 
-        always occur when it is cheapest to do so (off-peak). Adds 
-        'electricity_cost_per_kwh' col to self.res_rate_data.
+        Bills residential charging load profiles (e.g. immediate, delayed, 
+        or smart charging) against every residential rate, instead of 
+        assuming charging in the cheapest period. res_load_profiles is a 
+        dict of name: .csv path, 15-min load profile pandas.DataFrame w/ 
+        'Power, kW' column, or profiles.LoadProfile. Energy of each month 
+        and period fills the rate's tiers in order, as for DCFC profiles 
+        (see billing.cumulative_energy_cost), so profiles are billed on 
+        their own unless they include household load; all profiles are 
+        billed in one pass over the rates. Returns (and saves as 
+        res_profile_costs.csv at outpath) a rates x profiles table 
+        ['label', 'eiaid', 'utility', 'name', '{p}_cost_per_kwh'...]; costs 
+        are NaN where a rate has a negative or unknown cost. Rate structures
+        are read from structures (structures.RateStructures of 
+        self.res_rate_data, compiled here if None).
         """
 
-        res_df = self.res_rate_data
-        # Create df with deconstructed energy rate structure columns
-        cols_energyratestructure = [x for x in res_df.columns.tolist() if 'energyratestructure' in x]
-        energyratestructure_key = pd.DataFrame(data={'col_name':cols_energyratestructure})
-        energyratestructure_key[['energyratestructure','period','tier']] = energyratestructure_key['col_name'].str.split('/',expand=True)
-        energyratestructure_key['period'] = energyratestructure_key['period'].str.replace('period','').astype(int)
-        energyratestructure_key['tier'] = energyratestructure_key['tier'].str.replace('tier','')
-        energyratestructure_key['type'] = energyratestructure_key['tier']
-        energyratestructure_key['tier'] = energyratestructure_key['tier'].str.extract('(\d+)').astype(int)
-        energyratestructure_key['type'] = energyratestructure_key['type'].str.replace('\d+','')
-        # Create long format df with deconstructed energy rate parameters and corresponding values
-        energy_rates_str = res_df.reindex(columns=['label']+cols_energyratestructure)
-        energy_rates_str_l = energy_rates_str.melt(id_vars='label',var_name='col_name')
-        energy_rates_str_l = energy_rates_str_l.merge(energyratestructure_key,how='left',on='col_name',validate='many_to_one')
-        # Create wide format df with deconstructed energy rate parameters and corresponding values
-        energy_rates_str_w = energy_rates_str_l.pivot(values='value',index=['label','period','tier'],columns='type').reset_index()
-        energy_rates_str_w = energy_rates_str_w.sort_values(by=['label','period','tier'])
-        energy_rates_str_w = energy_rates_str_w.rename_axis(None,axis=1)
-        energy_rates_str_w = energy_rates_str_w.dropna(how='all',subset=['adj','max','rate','sell']) # drop rows with no data
-        energy_rates_str_w['max'] = energy_rates_str_w['max'].fillna(np.inf)
-        energy_rates_str_w['rate'] = energy_rates_str_w['rate'].fillna(0)
-        energy_rates_str_w['adj'] = energy_rates_str_w['adj'].fillna(0)
-        energy_rates_str_w['energy_cost'] = energy_rates_str_w['rate'] + energy_rates_str_w['adj']
-        energy_rates_str_w['max'] = energy_rates_str_w['max'].astype('float64')
-        energy_rates_str_w.drop(columns=['adj','rate','sell'],inplace=True)
-        energy_rates_str_w = energy_rates_str_w.reset_index(drop=True)
-        # Calculate average rate for each period (applicable to periods with multiple tiered rates)
-        energy_rates_str_avg = energy_rates_str_w[['label','period','energy_cost']].groupby(by=['label','period'],as_index=False).mean()
-        # Create long format schedule dfs with label-month-hour index and period value for weekday and weekend schedules
-        # weekday
-        energy_rates_wkday = res_df.reindex(columns=['label','energyweekdayschedule'])
-        energy_rates_wkday['energyweekdayschedule_mod'] = res_df['energyweekdayschedule'].str.replace('L','')
-        energy_rates_wkday[list(range(1,13))] = energy_rates_wkday['energyweekdayschedule_mod'].str.split('], ',expand=True)
-        energy_rates_wkday_l = energy_rates_wkday.melt(id_vars='label',value_vars=list(range(1,13)),var_name='month',value_name='hour_period')
-        energy_rates_wkday_l['hour_period'] = energy_rates_wkday_l['hour_period'].str.replace('[','')
-        energy_rates_wkday_l['hour_period'] = energy_rates_wkday_l['hour_period'].str.replace(']','')
-        energy_rates_wkday_l[list(range(0,24))] = energy_rates_wkday_l['hour_period'].str.split(', ',expand=True)
-        energy_rates_wkday_l = energy_rates_wkday_l.melt(id_vars=['label','month'],value_vars=list(range(0,24)),var_name='hour',value_name='period')
-        energy_rates_wkday_l['day_type'] = 'weekday'
-        energy_rates_wkday_l['month'] = energy_rates_wkday_l['month'].astype(int)
-        energy_rates_wkday_l['hour'] = energy_rates_wkday_l['hour'].astype(int)
-        energy_rates_wkday_l['period'] = energy_rates_wkday_l['period'].astype(int)
-        energy_rates_wkday_l = energy_rates_wkday_l.sort_values(by=['label','month','hour','period']).reset_index(drop=True)
-        # weekend
-        energy_rates_wkend = res_df.reindex(columns=['label','energyweekendschedule'])
-        energy_rates_wkend['energyweekendschedule_mod'] = res_df['energyweekendschedule'].str.replace('L','')
-        energy_rates_wkend[list(range(1,13))] = energy_rates_wkend['energyweekendschedule_mod'].str.split('], ',expand=True)
-        energy_rates_wkend_l = energy_rates_wkend.melt(id_vars='label',value_vars=list(range(1,13)),var_name='month',value_name='hour_period')
-        energy_rates_wkend_l['hour_period'] = energy_rates_wkend_l['hour_period'].str.replace('[','')
-        energy_rates_wkend_l['hour_period'] = energy_rates_wkend_l['hour_period'].str.replace(']','')
-        energy_rates_wkend_l[list(range(0,24))] = energy_rates_wkend_l['hour_period'].str.split(', ',expand=True)
-        energy_rates_wkend_l = energy_rates_wkend_l.melt(id_vars=['label','month'],value_vars=list(range(0,24)),var_name='hour',value_name='period')
-        energy_rates_wkend_l['day_type'] = 'weekend'
-        energy_rates_wkend_l['month'] = energy_rates_wkend_l['month'].astype(int)
-        energy_rates_wkend_l['hour'] = energy_rates_wkend_l['hour'].astype(int)
-        energy_rates_wkend_l['period'] = energy_rates_wkend_l['period'].astype(int)
-        energy_rates_wkend_l = energy_rates_wkend_l.sort_values(by=['label','month','hour','period']).reset_index(drop=True)
-        # Concatenate weekday and weekend dfs
-        energy_rates_sched_l = pd.concat([energy_rates_wkday_l,energy_rates_wkend_l])
-        # Merge schedule and rates
-        energy_rates_sched = energy_rates_sched_l.merge(energy_rates_str_avg,how='left',on=['label','period'])
-        # Calculate minimum rate for each month and day type
-        energy_rates_min = energy_rates_sched[['label','month','day_type','energy_cost']].groupby(by=['label','month','day_type'],as_index=False).min()
-        # Weight rates by day type
-        energy_rates_min['dow_wgt'] = energy_rates_min['day_type'].map({'weekday':5/7,'weekend':2/7})
-        energy_rates_min['energy_cost_wtd'] = energy_rates_min['energy_cost'] * energy_rates_min['dow_wgt']
-        # Calculate annual average rate
-        energy_rates_month_avg = energy_rates_min[['label','month','energy_cost_wtd']].groupby(by=['label','month'],as_index=False).sum()
-        energy_rates_avg = energy_rates_month_avg[['label','energy_cost_wtd']].groupby(by=['label'],as_index=False).mean()
-        energy_rates_avg.rename(columns={'energy_cost_wtd':'electricity_cost_per_kwh'},inplace=True)
-        # Merge to df
-        res_df = res_df.merge(energy_rates_avg,how='left',on='label',validate='one_to_one')
-        res_df = res_df[res_df.electricity_cost_per_kwh>=0] # remove negative rates
-        self.res_rate_data = res_df
-
-        self.res_rate_data.to_csv(os.path.join(outpath,'res_rates.csv'),index=False)
-        print(f'Complete, {len(self.res_rate_data)} rates included.')
+        rates = self.res_rate_data
+        if structures is None:
+            structures = RateStructures(rates)
+
+        energy = structures.energy.take(structures.get_index(rates['label']))
+        determinants = {p: profiles.load_profile(profile) for p, profile in res_load_profiles.items()}
+        annual_energy_costs = profile_energy_costs(determinants, self.get_schedules(rates, 'energy'), energy)
 
+        cost_table = rates[['label', 'eiaid', 'utility', 'name']].reset_index(drop=True)
+        for p, det in determinants.items():
+            annual_energy_cost = annual_energy_costs[p]
+            included = annual_energy_cost >= 0 #remove negative & unknown costs
+            cost_table[f'{p}_cost_per_kwh'] = np.where(included, annual_energy_cost/det.annual_energy_kwh, np.nan)
+            logging.info(f'{p} - {included.sum()} rates costed.')
+
+        cost_table.to_csv(os.path.join(outpath,'res_profile_costs.csv'), index=False)
+
+        return cost_table
 
     def calculate_annual_cost_dcfc(self, 
                                    dcfc_load_profiles = config.DCFC_PROFILES_DICT,
                                    outpath = os.path.join(config.OUTPUT_PATH,'cost-of-electricity','urdb-dcfc-rates'),
-                                   log_lvl = 1):
+                                   log_lvl = 1,
+                                   structures = None,
+                                   batch_size = None,
+                                   eligibility = None):
         """
         Calculates the annualized average daily cost to charge for 
         commercial rates under an annual dcfc_load_profile. Estimates account 
         for demand, seasonal, tier, and TOU rate structures. Due to it's
         significant runtime, function outputs a .csv at outpath for each profile 
-        in dcfc_load_profiles. The log_lvl parameter must be in [0,1,2] where higher
-        levels reflect more verbose logs.
+        in dcfc_load_profiles (dict of name: .csv path, 15-min load profile 
+        pandas.DataFrame, or profiles.LoadProfile; billing determinants of 
+        .csv profiles are cached next to them). The log_lvl parameter must be
+        in [0,1,2] where higher levels reflect more verbose logs. Rate 
+        structures are read from structures (structures.RateStructures of 
+        self.com_rate_data, compiled here if None) and rates eligible for 
+        each profile from eligibility (eligibility.EligibilityIndex of 
+        self.com_rate_data, built here if None).
+
+        If batch_size is given, eligible rates are costed in batches of 
+        batch_size rates (by label, see dcfc_costs_v1) and each completed 
+        batch is saved to the checkpoint directory 'dcfc_rates_{p}_batches' at
+        outpath (see readwrite.open_checkpoint). A rerun with the same inputs
+        (rates, rate structures, schedules, profile, and batch_size) loads 
+        the completed batches instead of costing them again; batches saved 
+        for other inputs are discarded.
         """
+
+        if structures is None:
+            structures = RateStructures(self.com_rate_data)
+
+        if eligibility is None:
+            eligibility = EligibilityIndex(self.com_rate_data)
         
         assert log_lvl in [0,1,2], "Unexpected log_lvl, must be in [0,1,2]"
         
@@ -726,526 +1320,64 @@ class DatabaseRates(object):
             log_lbl = logging.DEBUG
             
         logging.basicConfig(level=log_lbl)
+
+        schedules = {kind: (pd.Index(self.com_rate_data['label']), self.get_schedules(self.com_rate_data, kind)) 
+                     for kind in ['energy', 'demand']}
        
         for p in dcfc_load_profiles.keys():
-            # Load profile
-            profile_path = dcfc_load_profiles[p]
-            profile_df = pd.read_csv(profile_path, index_col=0, parse_dates=True)
-            
-            # Deconstruct timestamp
-            months = profile_df.index.month
-            days = profile_df.index.day
-            hours = profile_df.index.hour
-            minutes = profile_df.index.minute
-            weekday = profile_df.index.weekday
-
-            # Convert load profile -> energy profile
-            energy_profile_df = pd.DataFrame({'month': months, 
-                                              'day': days, 
-                                              'hour': hours, 
-                                              'minute': minutes, 
-                                              'weekday': weekday, 
-                                              'pwr_kw': profile_df['Power, kW']})
-            energy_profile_df = energy_profile_df.sort_values(by=['month', 'day', 'hour', 'minute'])
-            energy_profile_df = energy_profile_df.reset_index()
-            energy_profile_df['energy_kwh'] = energy_profile_df['pwr_kw']/4
-            energy_profile_df.to_csv(os.path.join('C:\\','Users','Jesse Vega-Perkins','Documents','thesis_ev','02_analysis','lcoc-ldevs','energy_profile_df.csv'))
-
-            # Aggregate 15-min energy profile -> hourly energy profile
-            hourly_energy_df = energy_profile_df.groupby(['month', 'day', 'hour', 'weekday'])['energy_kwh'].sum()
-            hourly_energy_df = hourly_energy_df.reset_index()
-            hourly_energy_df.to_csv(os.path.join('C:\\','Users','Jesse Vega-Perkins','Documents','thesis_ev','02_analysis','lcoc-ldevs','hourly_energy_df.csv'))
-
-            # Aggregate hourly energy profile -> monthly energy profile
-            monthly_energy_df = hourly_energy_df.groupby('month')['energy_kwh'].sum()
-            monthly_energy_df = monthly_energy_df.reset_index()
-            
-            # Calculate peak power by month
-            monthly_peak_pwr_df = energy_profile_df.groupby('month')['pwr_kw'].max()
-            monthly_peak_pwr_df = monthly_peak_pwr_df.reset_index()
-
-            # Calculate annual energy
-            annual_energy_kwh = monthly_energy_df['energy_kwh'].sum()
-
-            # Determine times of peak demand
-            peak_demand_times = []
-            for month, peak_pwr_kw in zip(range(1,13), monthly_peak_pwr_df['pwr_kw']):
-                peak_demand_dow = energy_profile_df[(energy_profile_df.month==month)&\
-                                                    (energy_profile_df.pwr_kw==peak_pwr_kw)]['weekday'].values[0]
-                peak_demand_hod = energy_profile_df[(energy_profile_df.month==month)&\
-                                                    (energy_profile_df.pwr_kw==peak_pwr_kw)]['hour'].values[0]
-                peak_demand_time = (peak_demand_dow, peak_demand_hod)
-                peak_demand_times.append(peak_demand_time)
+            # Load profile -> billing determinants
+            profile = profiles.load_profile(dcfc_load_profiles[p])
+            hourly_energy_df = profile.hourly_energy_df
+            annual_energy_kwh = profile.annual_energy_kwh
 
             # Filter ineligible rates by peak capacity, energy consumption limits
-            def is_eligible(rates, monthly_energy, monthly_peak_pwr):
-                eligible = ((rates['peakkwcapacitymin'] <= monthly_peak_pwr.min())&
-                (rates['peakkwcapacitymax'] >= monthly_peak_pwr.max())&
-                (rates['peakkwhusagemin'] <= monthly_energy.min())&
-                (rates['peakkwhusagemax'] >= monthly_energy.max()))
-                return eligible
-
-            eligibility = is_eligible(self.com_rate_data, monthly_energy_df['energy_kwh'], monthly_peak_pwr_df['pwr_kw'])
-
-            self.com_rate_data['eligible'] = eligibility
-            eligible_rates = self.com_rate_data[self.com_rate_data.eligible==True]
+            eligible_idx = eligibility.eligible(profile)
+            eligible_rates = self.com_rate_data.iloc[eligible_idx]
+            eligible_rates['eligible'] = True
             # print_str = """rates determined to be ineligible for {} (violated peak capacity/energy consumption constraints)""".format(p)
-            logging.info(f'{len(self.com_rate_data[self.com_rate_data.eligible==False])} rates determined to be ineligible for {p} (violated peak capacity/energy consumption constraints)')
+            logging.info(f'{len(eligibility) - len(eligible_idx)} rates determined to be ineligible for {p} (violated peak capacity/energy consumption constraints)')
 
-            eligible_rates.to_csv(os.path.join('C:\\','Users','Jesse Vega-Perkins','Documents','thesis_ev','02_analysis','lcoc-ldevs','eligible_rates.csv'))
-            print('eligible_rates.csv saved')
 
             ###                             ###
             ## Calculate cost of electricity ##
             ###                             ###
 
-            # Energy rates == 0 if NULL; Max = inf if NULL
-            for tier in range(11):
-                maxim = 'energyratestructure/period0/tier{}max'.format(tier)
-                rate = 'energyratestructure/period0/tier{}rate'.format(tier)
-                adj = 'energyratestructure/period0/tier{}adj'.format(tier)
-                eligible_rates[maxim] = eligible_rates[maxim].fillna(np.inf)
-                eligible_rates[rate] = eligible_rates[rate].fillna(0)
-                eligible_rates[adj] = eligible_rates[adj].fillna(0)
-                
-            for tier in range(8):
-                maxim = 'energyratestructure/period1/tier{}max'.format(tier)
-                rate = 'energyratestructure/period1/tier{}rate'.format(tier)
-                adj = 'energyratestructure/period1/tier{}adj'.format(tier)
-                eligible_rates[maxim] = eligible_rates[maxim].fillna(np.inf)
-                eligible_rates[rate] = eligible_rates[rate].fillna(0)
-                eligible_rates[adj] = eligible_rates[adj].fillna(0)
-
-            for period in range(2,6):
-                for tier in range(5):
-                    maxim = 'energyratestructure/period{0}/tier{1}max'.format(period, tier)
-                    rate = 'energyratestructure/period{0}/tier{1}rate'.format(period, tier)
-                    adj = 'energyratestructure/period{0}/tier{1}adj'.format(period, tier)
-                    eligible_rates[maxim] = eligible_rates[maxim].fillna(np.inf)
-                    eligible_rates[rate] = eligible_rates[rate].fillna(0)
-                    eligible_rates[adj] = eligible_rates[adj].fillna(0)
-                    
-            for period in range(6,24):
-                maxim = 'energyratestructure/period{}/tier0max'.format(period)
-                rate = 'energyratestructure/period{}/tier0rate'.format(period)
-                adj = 'energyratestructure/period{}/tier0adj'.format(period)
-                eligible_rates[maxim] = eligible_rates[maxim].fillna(np.inf)
-                eligible_rates[rate] = eligible_rates[rate].fillna(0)
-                eligible_rates[adj] = eligible_rates[adj].fillna(0)
-
-            # Calculate annual fixed cost charge (1st meter)
-            logging.info("Starting annual fixed cost calculations for {}...".format(p))
-            eligible_rates['annual_fixed_cost'] = eligible_rates['fixedchargefirstmeter'] * 12
-            eligible_rates = eligible_rates[eligible_rates.annual_fixed_cost >= 0]
-            logging.info("Annual fixed cost calculations complete.")
-
-            # Characterize rates (demand/no-demand)
-            flat_dmd_rates = eligible_rates[~eligible_rates['flatdemandstructure/period0/tier0rate'].isnull()]
-            flat_dmd_rates['demand_type'] = 'flat'
-
-            tou_dmd_rates = eligible_rates[(eligible_rates['flatdemandstructure/period0/tier0rate'].isnull())&
-                                           (~eligible_rates['demandratestructure/period0/tier0rate'].isnull())]
-            tou_dmd_rates['demand_type'] = 'tou'
-
-            no_dmd_rates = eligible_rates[(eligible_rates['flatdemandstructure/period0/tier0rate'].isnull())&
-                                          (eligible_rates['demandratestructure/period0/tier0rate'].isnull())]
-            no_dmd_rates['demand_type'] = 'none'
-
-            # Demand Charge Rates = 0 when NULL; max = inf when NULL
-            for tier in range(17):
-                maxim = 'flatdemandstructure/period0/tier{}max'.format(tier)
-                rate = 'flatdemandstructure/period0/tier{}rate'.format(tier)
-                adj = 'flatdemandstructure/period0/tier{}adj'.format(tier)
-                flat_dmd_rates[maxim] = flat_dmd_rates[maxim].fillna(np.inf)
-                tou_dmd_rates[maxim] = tou_dmd_rates[maxim].fillna(np.inf)
-                no_dmd_rates[maxim] = no_dmd_rates[maxim].fillna(np.inf)
-                flat_dmd_rates[rate] = flat_dmd_rates[rate].fillna(0)
-                tou_dmd_rates[rate] = tou_dmd_rates[rate].fillna(0)
-                no_dmd_rates[rate] = no_dmd_rates[rate].fillna(0)
-                flat_dmd_rates[adj] = flat_dmd_rates[adj].fillna(0)
-                tou_dmd_rates[adj] = tou_dmd_rates[adj].fillna(0)
-                no_dmd_rates[adj] = no_dmd_rates[adj].fillna(0)
-                
-            for tier in range(5):
-                maxim = 'flatdemandstructure/period1/tier{}max'.format(tier)
-                rate = 'flatdemandstructure/period1/tier{}rate'.format(tier)
-                adj = 'flatdemandstructure/period1/tier{}adj'.format(tier)
-                flat_dmd_rates[maxim] = flat_dmd_rates[maxim].fillna(np.inf)
-                tou_dmd_rates[maxim] = tou_dmd_rates[maxim].fillna(np.inf)
-                no_dmd_rates[maxim] = no_dmd_rates[maxim].fillna(np.inf)
-                flat_dmd_rates[rate] = flat_dmd_rates[rate].fillna(0)
-                tou_dmd_rates[rate] = tou_dmd_rates[rate].fillna(0)
-                no_dmd_rates[rate] = no_dmd_rates[rate].fillna(0)
-                flat_dmd_rates[adj] = flat_dmd_rates[adj].fillna(0)
-                tou_dmd_rates[adj] = tou_dmd_rates[adj].fillna(0)
-                no_dmd_rates[adj] = no_dmd_rates[adj].fillna(0)
-                
-            for tier in range(3):
-                maxim = 'flatdemandstructure/period2/tier{}max'.format(tier)
-                rate = 'flatdemandstructure/period2/tier{}rate'.format(tier)
-                adj = 'flatdemandstructure/period2/tier{}adj'.format(tier)
-                flat_dmd_rates[maxim] = flat_dmd_rates[maxim].fillna(np.inf)
-                tou_dmd_rates[maxim] = tou_dmd_rates[maxim].fillna(np.inf)
-                no_dmd_rates[maxim] = no_dmd_rates[maxim].fillna(np.inf)
-                flat_dmd_rates[rate] = flat_dmd_rates[rate].fillna(0)
-                tou_dmd_rates[rate] = tou_dmd_rates[rate].fillna(0)
-                no_dmd_rates[rate] = no_dmd_rates[rate].fillna(0)
-                flat_dmd_rates[adj] = flat_dmd_rates[adj].fillna(0)
-                tou_dmd_rates[adj] = tou_dmd_rates[adj].fillna(0)
-                no_dmd_rates[adj] = no_dmd_rates[adj].fillna(0)
-                
-            for period in range(3,8):
-                maxim = 'flatdemandstructure/period{}/tier0max'.format(period)
-                rate = 'flatdemandstructure/period{}/tier0rate'.format(period)
-                adj = 'flatdemandstructure/period{}/tier0adj'.format(period)
-                flat_dmd_rates[maxim] = flat_dmd_rates[maxim].fillna(np.inf)
-                tou_dmd_rates[maxim] = tou_dmd_rates[maxim].fillna(np.inf)
-                no_dmd_rates[maxim] = no_dmd_rates[maxim].fillna(np.inf)
-                flat_dmd_rates[rate] = flat_dmd_rates[rate].fillna(0)
-                tou_dmd_rates[rate] = tou_dmd_rates[rate].fillna(0)
-                no_dmd_rates[rate] = no_dmd_rates[rate].fillna(0)
-                flat_dmd_rates[adj] = flat_dmd_rates[adj].fillna(0)
-                tou_dmd_rates[adj] = tou_dmd_rates[adj].fillna(0)
-                no_dmd_rates[adj] = no_dmd_rates[adj].fillna(0)
-                
-            for period in range(2):
-                for tier in range(16):
-                    maxim = 'demandratestructure/period{0}/tier{1}max'.format(period, tier)
-                    rate = 'demandratestructure/period{0}/tier{1}rate'.format(period, tier)
-                    adj = 'demandratestructure/period{0}/tier{1}adj'.format(period, tier)
-                    flat_dmd_rates[maxim] = flat_dmd_rates[maxim].fillna(np.inf)
-                    tou_dmd_rates[maxim] = tou_dmd_rates[maxim].fillna(np.inf)
-                    no_dmd_rates[maxim] = no_dmd_rates[maxim].fillna(np.inf)
-                    flat_dmd_rates[rate] = flat_dmd_rates[rate].fillna(0)
-                    tou_dmd_rates[rate] = tou_dmd_rates[rate].fillna(0)
-                    no_dmd_rates[rate] = no_dmd_rates[rate].fillna(0)
-                    flat_dmd_rates[adj] = flat_dmd_rates[adj].fillna(0)
-                    tou_dmd_rates[adj] = tou_dmd_rates[adj].fillna(0)
-                    no_dmd_rates[adj] = no_dmd_rates[adj].fillna(0)
-
-            for period in range(2, 4):
-                for tier in range(3):
-                    maxim = 'demandratestructure/period{0}/tier{1}max'.format(period, tier)
-                    rate = 'demandratestructure/period{0}/tier{1}rate'.format(period, tier)
-                    adj = 'demandratestructure/period{0}/tier{1}adj'.format(period, tier)
-                    flat_dmd_rates[maxim] = flat_dmd_rates[maxim].fillna(np.inf)
-                    tou_dmd_rates[maxim] = tou_dmd_rates[maxim].fillna(np.inf)
-                    no_dmd_rates[maxim] = no_dmd_rates[maxim].fillna(np.inf)
-                    flat_dmd_rates[rate] = flat_dmd_rates[rate].fillna(0)
-                    tou_dmd_rates[rate] = tou_dmd_rates[rate].fillna(0)
-                    no_dmd_rates[rate] = no_dmd_rates[rate].fillna(0)
-                    flat_dmd_rates[adj] = flat_dmd_rates[adj].fillna(0)
-                    tou_dmd_rates[adj] = tou_dmd_rates[adj].fillna(0)
-                    no_dmd_rates[adj] = no_dmd_rates[adj].fillna(0)
-
-            for tier in range(2):
-                maxim = 'demandratestructure/period4/tier{}max'.format(tier)
-                rate = 'demandratestructure/period4/tier{}rate'.format(tier)
-                adj = 'demandratestructure/period4/tier{}adj'.format(tier)
-                flat_dmd_rates[maxim] = flat_dmd_rates[maxim].fillna(np.inf)
-                tou_dmd_rates[maxim] = tou_dmd_rates[maxim].fillna(np.inf)
-                no_dmd_rates[maxim] = no_dmd_rates[maxim].fillna(np.inf)
-                flat_dmd_rates[rate] = flat_dmd_rates[rate].fillna(0)
-                tou_dmd_rates[rate] = tou_dmd_rates[rate].fillna(0)
-                no_dmd_rates[rate] = no_dmd_rates[rate].fillna(0)
-                flat_dmd_rates[adj] = flat_dmd_rates[adj].fillna(0)
-                tou_dmd_rates[adj] = tou_dmd_rates[adj].fillna(0)
-                no_dmd_rates[adj] = no_dmd_rates[adj].fillna(0)
-                    
-            for period in range(5,9):
-                maxim = 'demandratestructure/period{}/tier0max'.format(period)
-                rate = 'demandratestructure/period{}/tier0rate'.format(period)
-                adj = 'demandratestructure/period{}/tier0adj'.format(period)
-                flat_dmd_rates[maxim] = flat_dmd_rates[maxim].fillna(np.inf)
-                tou_dmd_rates[maxim] = tou_dmd_rates[maxim].fillna(np.inf)
-                no_dmd_rates[maxim] = no_dmd_rates[maxim].fillna(np.inf)
-                flat_dmd_rates[rate] = flat_dmd_rates[rate].fillna(0)
-                tou_dmd_rates[rate] = tou_dmd_rates[rate].fillna(0)
-                no_dmd_rates[rate] = no_dmd_rates[rate].fillna(0)
-                flat_dmd_rates[adj] = flat_dmd_rates[adj].fillna(0)
-                tou_dmd_rates[adj] = tou_dmd_rates[adj].fillna(0)
-                no_dmd_rates[adj] = no_dmd_rates[adj].fillna(0)
-
-            # Calculate annual demand charges
-            logging.info("Starting annual demand cost calculations for {}...".format(p))
-            ## Flat-demand rates
-            annual_dmd_charges = []
-            # flat_dmd_rates.to_csv(os.path.join('C:\\','Users','Jesse Vega-Perkins','Documents','thesis_ev','02_analysis','lcoc-ldevs','flat_dmd_rates.csv'))
-            for i in range(len(flat_dmd_rates)):
-                periods = []
-                
-                # month column labels changed from integer to string
-
-                # for month in range(1,13):
-                #     flat_dmd_mnth = "flatdemandmonth{}".format(month)
-                #     period = int(flat_dmd_rates.iloc[i][flat_dmd_mnth])
-                #     periods.append(period)
-                
-                month_list = ['jan','feb','mar','apr','may','jun','jul','aug','sep','oct','nov','dec']
-                for month in month_list:
-                    flat_dmd_mnth = "flatDemandMonth_{}".format(month)
-                    period = int(flat_dmd_rates.iloc[i][flat_dmd_mnth])
-                    periods.append(period)
-
-                annual_dmd_charge = 0
-                for month, period in zip(monthly_peak_pwr_df['month'], periods):
-                    peak_pwr = monthly_peak_pwr_df[monthly_peak_pwr_df.month==month]['pwr_kw'].values[0]
-                    if period == 0:
-                        for tier in range(17):
-                            maxim = 'flatdemandstructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'flatdemandstructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'flatdemandstructure/period{0}/tier{1}adj'.format(period, tier)
-                            dmd_rate = flat_dmd_rates.iloc[i][rate] + flat_dmd_rates.iloc[i][adj]
-                            dmd_charge = peak_pwr * dmd_rate
-                            if peak_pwr <= flat_dmd_rates.iloc[i][maxim]:
-                                annual_dmd_charge += dmd_charge
-                                break
-                            else:
-                                continue 
-                                
-                    elif period == 1:
-                        for tier in range(5):
-                            maxim = 'flatdemandstructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'flatdemandstructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'flatdemandstructure/period{0}/tier{1}adj'.format(period, tier)
-                            dmd_rate = flat_dmd_rates.iloc[i][rate] + flat_dmd_rates.iloc[i][adj]
-                            dmd_charge = peak_pwr * dmd_rate
-                            if peak_pwr <= flat_dmd_rates.iloc[i][maxim]:
-                                annual_dmd_charge += dmd_charge
-                                break
-                            else:
-                                continue
-                                
-                    elif period == 2:
-                        for tier in range(3):
-                            maxim = 'flatdemandstructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'flatdemandstructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'flatdemandstructure/period{0}/tier{1}adj'.format(period, tier)
-                            dmd_rate = flat_dmd_rates.iloc[i][rate] + flat_dmd_rates.iloc[i][adj]
-                            dmd_charge = peak_pwr * dmd_rate
-                            if peak_pwr <= flat_dmd_rates.iloc[i][maxim]:
-                                annual_dmd_charge += dmd_charge
-                                break
-                            else:
-                                continue
-                                
-                    else:
-                        maxim = 'flatdemandstructure/period{0}/tier0max'.format(period)
-                        rate = 'flatdemandstructure/period{0}/tier0rate'.format(period)
-                        adj = 'flatdemandstructure/period{0}/tier0adj'.format(period)
-                        dmd_rate = flat_dmd_rates.iloc[i][rate] + flat_dmd_rates.iloc[i][adj]
-                        dmd_charge = peak_pwr * dmd_rate
-                        annual_dmd_charge += dmd_charge
-
-                annual_dmd_charges.append(annual_dmd_charge)
+            #----------------------------------------------------------------------------
+            ## Calculate annual fixed, demand & energy costs by batch of rates ##
+            cost_cols = ['label', 'fixedchargefirstmeter', 
+                         'flatdemandstructure/period0/tier0rate', 
+                         'demandratestructure/period0/tier0rate']
+            n_batches = 1 if batch_size is None else max(1, int(np.ceil(len(eligible_rates)/batch_size)))
+            batches = np.array_split(np.argsort(eligible_rates['label'].values, kind='stable'), n_batches)
+            peak_pwrs = profile.monthly_peak_kw
+
+            completed = []
+            if batch_size is not None:
+                checkpoint_path = os.path.join(outpath, f'dcfc_rates_{p}_batches')
+                idx = structures.get_index(eligible_rates['label'])
+                input_hash = helpers.array_digest(eligible_rates[cost_cols], peak_pwrs, profile.peak_by_tou_hour, 
+                                                  hourly_energy_df, schedules['energy'][1][idx], schedules['demand'][1][idx],
+                                                  structures.flat_demand_months[idx], np.array([batch_size]),
+                                                  *[getattr(getattr(structures, kind), attr)[idx] 
+                                                    for kind in ['energy', 'flatdemand', 'demand'] 
+                                                    for attr in ['rate', 'max', 'valid', 'unit']])
+                completed = readwrite.open_checkpoint(checkpoint_path, input_hash)
+                logging.info(f'{p} - {len(completed)}/{n_batches} rate batches already completed')
+
+            batch_costs = []
+            for batch_id, batch in enumerate(batches):
+                if batch_id in completed:
+                    batch_costs.append(readwrite.read_checkpoint_batch(checkpoint_path, batch_id))
+                    continue
                 
-            flat_dmd_rates['annual_demand_cost'] = annual_dmd_charges
-            flat_dmd_rates = flat_dmd_rates[flat_dmd_rates.annual_demand_cost>=0] #remove negative demand costs
-
-            ## TOU-demand rates
-            annual_dmd_charges = []
-            for i in range(len(tou_dmd_rates)):
-                wkday_dmd_tou_periods = []
-                wknd_dmd_tou_periods = []
-                for monthly_wkday_dmd_tou in tou_dmd_rates['demandweekdayschedule'].iloc[i].replace('L','').replace('[', '').split(']')[:-2]:
-                    wkday_dmd_tou_period = monthly_wkday_dmd_tou.replace(' ','').split(',')
-                    if len(wkday_dmd_tou_period) == 24:
-                        wkday_dmd_tou_periods.append(wkday_dmd_tou_period)
-                    
-                    elif len(wkday_dmd_tou_period) == 25:
-                        wkday_dmd_tou_periods.append(wkday_dmd_tou_period[1:])
-
-                for monthly_wknd_dmd_tou in tou_dmd_rates['demandweekendschedule'].iloc[i].replace('L','').replace('[', '').split(']')[:-2]:
-                    wknd_dmd_tou_period = monthly_wknd_dmd_tou.replace(' ','').split(',')
-                    if len(wknd_dmd_tou_period) == 24:
-                        wknd_dmd_tou_periods.append(wknd_dmd_tou_period)
-                    
-                    elif len(wknd_dmd_tou_period) == 25:
-                        wknd_dmd_tou_periods.append(wknd_dmd_tou_period[1:])
-
-                periods = []
-                for month_idx, peak_time in enumerate(peak_demand_times):
-                    dow = peak_time[0]
-                    hr = peak_time[1]
-
-                    if dow < 5:
-                        periods.append(wkday_dmd_tou_periods[month_idx][hr])
-                    
-                    elif dow in [5,6]:
-                        periods.append(wknd_dmd_tou_periods[month_idx][hr])
-
-                annual_dmd_charge = 0
-                for month, period in zip(monthly_peak_pwr_df['month'], periods):
-                    peak_pwr = monthly_peak_pwr_df[monthly_peak_pwr_df.month==month]['pwr_kw'].values[0]
-                        
-                    if period in [0,1]:
-                        for tier in range(16):
-                            maxim = 'demandratestructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'demandratestructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'demandratestructure/period{0}/tier{1}adj'.format(period, tier)
-                            dmd_rate = tou_dmd_rates.iloc[i][rate] + tou_dmd_rates.iloc[i][adj]
-                            dmd_charge = peak_pwr * dmd_rate
-                            if peak_pwr <= tou_dmd_rates.iloc[i][maxim]:
-                                annual_dmd_charge += dmd_charge
-                                break
-                            else:
-                                continue             
-                    
-                    elif period in [2,3]:
-                        for tier in range(3):
-                            maxim = 'demandratestructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'demandratestructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'demandratestructure/period{0}/tier{1}adj'.format(period, tier)
-                            dmd_rate = tou_dmd_rates.iloc[i][rate] + tou_dmd_rates.iloc[i][adj]
-                            dmd_charge = peak_pwr * dmd_rate
-                            if peak_pwr <= tou_dmd_rates.iloc[i][maxim]:
-                                annual_dmd_charge += dmd_charge
-                                break
-                            else:
-                                continue             
-                    
-                    elif period == 4:
-                        for tier in range(2):
-                            maxim = 'demandratestructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'demandratestructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'demandratestructure/period{0}/tier{1}adj'.format(period, tier)
-                            dmd_rate = tou_dmd_rates.iloc[i][rate] + tou_dmd_rates.iloc[i][adj]
-                            dmd_charge = peak_pwr * dmd_rate
-                            if peak_pwr <= tou_dmd_rates.iloc[i][maxim]:
-                                annual_dmd_charge += dmd_charge
-                                break
-                            else:
-                                continue    
-                    
-                    else:
-                        maxim = 'demandratestructure/period{0}/tier0max'.format(period)
-                        rate = 'demandratestructure/period{0}/tier0rate'.format(period)
-                        adj = 'demandratestructure/period{0}/tier0adj'.format(period)
-                        dmd_rate = tou_dmd_rates.iloc[i][rate] + tou_dmd_rates.iloc[i][adj]
-                        dmd_charge = peak_pwr * dmd_rate
-                        annual_dmd_charge += dmd_charge
-            
-                annual_dmd_charges.append(annual_dmd_charge)
-
-            tou_dmd_rates['annual_demand_cost'] = annual_dmd_charges
-            tou_dmd_rates = tou_dmd_rates[tou_dmd_rates.annual_demand_cost>=0] #remove negative demand costs
-
-            ## No-demand rates
-            no_dmd_rates['annual_demand_cost'] = 0
-            logging.info("Annual demand cost calculations complete.")
-
-            eligible_rates = pd.concat([flat_dmd_rates, tou_dmd_rates, no_dmd_rates])
-            # eligible_rates.to_csv(os.path.join('C:\\','Users','Jesse Vega-Perkins','Documents','thesis_ev','02_analysis','lcoc-ldevs','eligible_rates.csv'))
-            # print('eligible_rates.csv saved')
-
-            # Calculate annual energy charges
-            logging.info("Starting annual energy cost calculations for {0} ({1} total)...".format(p, len(eligible_rates)))
-            annual_energy_costs = []
-            for i in range(len(eligible_rates)):
-                if (i % 10 == 0) and (i!=0):
-                    logging.info("{0}/{1} rates completed".format(i, len(eligible_rates)))
-                wkday_tou_periods = []
-                wknd_tou_periods = []
-                for monthly_wkday_tou in eligible_rates['energyweekdayschedule'].iloc[i].replace('L','').replace('[', '').split(']')[:-2]: 
-                    wkday_tou_period = monthly_wkday_tou.replace(' ','').split(',')
-                    if len(wkday_tou_period) == 24:
-                        wkday_tou_periods.append(wkday_tou_period)
-                    
-                    elif len(wkday_tou_period) == 25:
-                        wkday_tou_periods.append(wkday_tou_period[1:])
-
-                for monthly_wknd_tou in eligible_rates['energyweekendschedule'].iloc[i].replace('L','').replace('[', '').split(']')[:-2]:
-                    wknd_tou_period = monthly_wknd_tou.replace(' ','').split(',')
-                    if len(wknd_tou_period) == 24:
-                        wknd_tou_periods.append(wknd_tou_period)
-                    
-                    elif len(wknd_tou_period) == 25:
-                        wknd_tou_periods.append(wknd_tou_period[1:])           
+                costs = dcfc_costs_v1(eligible_rates[cost_cols].iloc[np.sort(batch)], structures, schedules, 
+                                      peak_pwrs, profile.peak_by_tou_hour, hourly_energy_df, p)
+                if batch_size is not None:
+                    readwrite.write_checkpoint_batch(checkpoint_path, batch_id, costs)
                 
-                periods = []
-                for month, dow, hr, energy_kwh in zip(hourly_energy_df['month'], 
-                                                      hourly_energy_df['weekday'], 
-                                                      hourly_energy_df['hour'],
-                                                      hourly_energy_df['energy_kwh']):
-                    month_idx = month - 1
-
-                    if dow < 5:
-                        periods.append(wkday_tou_periods[month_idx][hr])
-                    
-                    elif dow in [5,6]:
-                        periods.append(wknd_tou_periods[month_idx][hr])
-                        
-                annual_energy_cost = 0
-                prev_month = 1 #init prev month var
-                month_energy = 0 #init monthly energy tracking
-                for month, period, energy_kwh in zip(hourly_energy_df['month'], periods, hourly_energy_df['energy_kwh']):
-                    period = int(period)
-                    
-                    #update monthly energy
-                    if month == prev_month:
-                        month_energy += float(energy_kwh)
-                    
-                    else:
-                        month_energy = energy_kwh
-                    
-                    prev_month = month
-
-                    if period == 0:
-                        for tier in range(11):
-                            maxim = 'energyratestructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'energyratestructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'energyratestructure/period{0}/tier{1}adj'.format(period, tier)
-                            energy_cost = eligible_rates.iloc[i][rate] + eligible_rates.iloc[i][adj]
-                            hourly_energy_cost = energy_kwh * energy_cost
-                            tier_max = float(eligible_rates.iloc[i][maxim])
-
-                            if month_energy <= tier_max:
-                                annual_energy_cost += hourly_energy_cost
-                                break
-                            else:
-                                continue       
-                    
-                    elif period == 1:
-                        for tier in range(8):
-                            maxim = 'energyratestructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'energyratestructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'energyratestructure/period{0}/tier{1}adj'.format(period, tier)
-                            energy_cost = eligible_rates.iloc[i][rate] + eligible_rates.iloc[i][adj]
-                            hourly_energy_cost = energy_kwh * energy_cost
-                            tier_max = float(eligible_rates.iloc[i][maxim])
-                            if month_energy <= tier_max:
-                                annual_energy_cost += hourly_energy_cost
-                                break
-                            else:
-                                continue           
-                    
-                    elif period in range(2,6):
-                        for tier in range(5):
-                            maxim = 'energyratestructure/period{0}/tier{1}max'.format(period, tier)
-                            rate = 'energyratestructure/period{0}/tier{1}rate'.format(period, tier)
-                            adj = 'energyratestructure/period{0}/tier{1}adj'.format(period, tier)
-                            energy_cost = eligible_rates.iloc[i][rate] + eligible_rates.iloc[i][adj]
-                            hourly_energy_cost = energy_kwh * energy_cost
-                            tier_max = float(eligible_rates.iloc[i][maxim])
-                            if month_energy <= tier_max:
-                                annual_energy_cost += hourly_energy_cost
-                                break
-                            else:
-                                continue              
-                    
-                    else:
-                        maxim = 'energyratestructure/period{0}/tier0max'.format(period)
-                        rate = 'energyratestructure/period{0}/tier0rate'.format(period)
-                        adj = 'energyratestructure/period{0}/tier0adj'.format(period)
-                        energy_cost = eligible_rates.iloc[i][rate] + eligible_rates.iloc[i][adj]
-                        hourly_energy_cost = energy_kwh * energy_cost
-                        annual_energy_cost += hourly_energy_cost
-
-                annual_energy_costs.append(annual_energy_cost)
+                batch_costs.append(costs)
 
-            eligible_rates['annual_energy_cost'] = annual_energy_costs
-            eligible_rates = eligible_rates[eligible_rates.annual_energy_cost>=0] #remove negative energy costs
-            logging.info(f"{p} - Annual energy cost calculations complete.")
+            eligible_rates = _merge_cost_shards(eligible_rates, batch_costs)
 
             eligible_rates['annual_cost_total'] = eligible_rates['annual_fixed_cost'] + eligible_rates['annual_demand_cost'] + eligible_rates['annual_energy_cost']
             new_field = f'{p}_lvl_cost_per_kwh'
@@ -1256,15 +1388,44 @@ class DatabaseRates(object):
     def calculate_annual_cost_dcfc_v2(self, 
                                    dcfc_load_profiles = config.DCFC_PROFILES_DICT,
                                    outpath = os.path.join(config.OUTPUT_PATH,'cost-of-electricity','urdb-dcfc-rates'),
-                                   log_lvl = 1):
+                                   log_lvl = 1,
+                                   structures = None,
+                                   n_jobs = 1,
+                                   shards_per_job = 4,
+                                   memory_budget = None,
+                                   eligibility = None):
         """
         Calculates the annualized average daily cost to charge for 
         commercial rates under an annual dcfc_load_profile. Estimates account 
         for demand, seasonal, tier, and TOU rate structures. Due to it's
         significant runtime, function outputs a .csv at outpath for each profile 
-        in dcfc_load_profiles. The log_lvl parameter must be in [0,1,2] where higher
-        levels reflect more verbose logs.
+        in dcfc_load_profiles (dict of name: .csv path, 15-min load profile 
+        pandas.DataFrame, or profiles.LoadProfile; billing determinants of 
+        .csv profiles are cached next to them). The log_lvl parameter must be
+        in [0,1,2] where higher levels reflect more verbose logs. Rate 
+        structures are read from structures (structures.RateStructures of 
+        self.com_rate_data, compiled here if None) and rates eligible for 
+        each profile from eligibility (eligibility.EligibilityIndex of 
+        self.com_rate_data, built here if None).
+
+        With n_jobs > 1, eligible rates are split by label into 
+        n_jobs*shards_per_job shards that are costed (see dcfc_costs_v2) in a
+        pool of n_jobs processes. Rate structures and schedules are handed to
+        each worker once, when it starts; tasks only carry the shard's labels,
+        fixed charges, and demand rate flags. Shard results are merged back in
+        the order of a serial run, so outputs are identical.
+
+        If memory_budget (bytes) is given, shards are split further into 
+        batches whose estimated working memory fits in memory_budget/n_jobs 
+        (see dcfc_v2_batches), so peak memory does not grow w/ the number of
+        rates. Outputs are identical to an unbatched run.
         """
+
+        if structures is None:
+            structures = RateStructures(self.com_rate_data)
+
+        if eligibility is None:
+            eligibility = EligibilityIndex(self.com_rate_data)
         
         assert log_lvl in [0,1,2], "Unexpected log_lvl, must be in [0,1,2]"
         
@@ -1278,359 +1439,140 @@ class DatabaseRates(object):
             log_lbl = logging.DEBUG
             
         logging.basicConfig(level=log_lbl)
-       
-        for p in dcfc_load_profiles.keys():
-            # Load profile
-            profile_path = dcfc_load_profiles[p]
-            profile_df = pd.read_csv(profile_path, index_col=0, parse_dates=True)
-            
-            # Deconstruct timestamp
-            months = profile_df.index.month
-            days = profile_df.index.day
-            hours = profile_df.index.hour
-            minutes = profile_df.index.minute
-            weekday = profile_df.index.weekday
-
-            # Convert load profile -> energy profile
-            energy_profile_df = pd.DataFrame({'month': months, 
-                                              'day': days, 
-                                              'hour': hours, 
-                                              'minute': minutes, 
-                                              'weekday': weekday, 
-                                              'pwr_kw': profile_df['Power, kW']})
-            energy_profile_df = energy_profile_df.sort_values(by=['month', 'day', 'hour', 'minute'])
-            energy_profile_df = energy_profile_df.reset_index()
-            energy_profile_df['energy_kwh'] = energy_profile_df['pwr_kw']/4
-
-            # Aggregate 15-min energy profile -> hourly energy profile
-            hourly_energy_df = energy_profile_df.groupby(['month', 'day', 'hour', 'weekday'])['energy_kwh'].sum()
-            hourly_energy_df = hourly_energy_df.reset_index()
-
-            # Aggregate hourly energy profile -> monthly energy profile
-            monthly_energy_df = hourly_energy_df.groupby('month')['energy_kwh'].sum()
-            monthly_energy_df = monthly_energy_df.reset_index()
-            
-            # Calculate peak power by month
-            monthly_peak_pwr_df = energy_profile_df.groupby('month')['pwr_kw'].max()
-            monthly_peak_pwr_df = monthly_peak_pwr_df.reset_index()
-            monthly_peak_pwr_df = monthly_peak_pwr_df.merge(energy_profile_df[['month','pwr_kw','hour','weekday']],how='left',on=['month','pwr_kw'])
-            monthly_peak_pwr_df['day_type'] = np.where(monthly_peak_pwr_df['weekday']<=4,'weekday','weekend')
-            monthly_peak_pwr_df.drop(columns='weekday',inplace=True)
-
-            # Calculate annual energy
-            annual_energy_kwh = monthly_energy_df['energy_kwh'].sum()
-
-            # Determine times of peak demand
-            peak_demand_times = []
-            for month, peak_pwr_kw in zip(range(1,13), monthly_peak_pwr_df['pwr_kw']):
-                peak_demand_dow = energy_profile_df[(energy_profile_df.month==month)&\
-                                                    (energy_profile_df.pwr_kw==peak_pwr_kw)]['weekday'].values[0]
-                peak_demand_hod = energy_profile_df[(energy_profile_df.month==month)&\
-                                                    (energy_profile_df.pwr_kw==peak_pwr_kw)]['hour'].values[0]
-                peak_demand_time = (peak_demand_dow, peak_demand_hod)
-                peak_demand_times.append(peak_demand_time)
-
-            # Filter ineligible rates by peak capacity, energy consumption limits
-            def is_eligible(rates, monthly_energy, monthly_peak_pwr):
-                eligible = ((rates['peakkwcapacitymin'] <= monthly_peak_pwr.min())&
-                (rates['peakkwcapacitymax'] >= monthly_peak_pwr.max())&
-                (rates['peakkwhusagemin'] <= monthly_energy.min())&
-                (rates['peakkwhusagemax'] >= monthly_energy.max()))
-                return eligible
 
-            eligibility = is_eligible(self.com_rate_data, monthly_energy_df['energy_kwh'], monthly_peak_pwr_df['pwr_kw'])
+        schedules = {kind: (pd.Index(self.com_rate_data['label']), self.get_schedules(self.com_rate_data, kind)) 
+                     for kind in ['energy', 'demand']}
+        
+        # fork (where available) shares the rate side w/ workers w/o pickling it
+        mp_context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        pool_context = contextlib.nullcontext() if n_jobs <= 1 else mp_context.Pool(n_jobs, initializer=_init_dcfc_worker, 
+                                                                                      initargs=(structures, schedules))
+        with pool_context as pool:
+            for p in dcfc_load_profiles.keys():
+                # Load profile -> billing determinants
+                profile = profiles.load_profile(dcfc_load_profiles[p])
+                hourly_energy_df = profile.hourly_energy_df
+                monthly_peak_pwr_df = profile.monthly_peak_pwr_df
+                annual_energy_kwh = profile.annual_energy_kwh
+
+                # Filter ineligible rates by peak capacity, energy consumption limits
+                eligible_idx = eligibility.eligible(profile)
+                eligible_rates = self.com_rate_data.iloc[eligible_idx]
+                eligible_rates['eligible'] = True
+                logging.info(f'{len(eligibility) - len(eligible_idx)} rates determined to be ineligible for {p} (violated peak capacity/energy consumption constraints)')
+
+                ###                             ###
+                ## Calculate cost of electricity ##
+                ###                             ###
+
+                #----------------------------------------------------------------------------
+                ## Calculate annual fixed, demand & energy costs by shard of rates ##
+                cost_cols = ['label', 'fixedchargefirstmeter', 
+                             'flatdemandstructure/period0/tier0rate', 
+                             'demandratestructure/period0/tier0rate']
+                n_shards = 1 if pool is None else n_jobs*shards_per_job
+                shards = dcfc_v2_batches(eligible_rates['label'].values, structures, hourly_energy_df, 
+                                         None if memory_budget is None else memory_budget/max(1, n_jobs), n_shards)
+                logging.info(f'{p} - costing {len(eligible_rates)} rates in {len(shards)} batches')
+                shard_rates = [eligible_rates[cost_cols].iloc[np.sort(shard)] for shard in shards]
+            
+                if pool is None:
+                    shard_costs = [dcfc_costs_v2(rates, structures, schedules, monthly_peak_pwr_df, hourly_energy_df, p) 
+                                   for rates in shard_rates]
+                else:
+                    n_shards = len(shard_rates)
+                    shard_costs = pool.starmap(_dcfc_costs_v2_shard, zip(shard_rates, [monthly_peak_pwr_df]*n_shards, 
+                                                                         [hourly_energy_df]*n_shards, [p]*n_shards))
+
+                # Merge shards in the order of a single-shard run: by demand type, then rate order
+                eligible_rates = _merge_cost_shards(eligible_rates, shard_costs)
+
+                #----------------------------------------------------------------------------
+                # calculate total annual costs
+                eligible_rates['annual_cost_total'] = eligible_rates['annual_fixed_cost'] + eligible_rates['annual_demand_cost'] + eligible_rates['annual_energy_cost']
+                new_field = f'{p}_lvl_cost_per_kwh'
+                eligible_rates[new_field] = eligible_rates['annual_cost_total']/annual_energy_kwh
+
+                eligible_rates.to_csv(os.path.join(outpath,f'dcfc_rates_{p}.csv'), index=False)
+
+    def calculate_annual_cost_dcfc_batch(self, 
+                                         dcfc_load_profiles = config.DCFC_PROFILES_DICT,
+                                         outpath = os.path.join(config.OUTPUT_PATH,'cost-of-electricity','urdb-dcfc-rates'),
+                                         log_lvl = 1,
+                                         structures = None,
+                                         eligibility = None):
+        """
+        Batch version of calculate_annual_cost_dcfc_v2: the rate side (rate 
+        structures, schedules, fixed charges) is prepared once and every 
+        profile in dcfc_load_profiles (dict of name: .csv path, 15-min 
+        load profile pandas.DataFrame w/ 'Power, kW' column, or 
+        profiles.LoadProfile) is billed 
+        against it with the array kernels in lcoc.billing, using the same 
+        cumulative tier semantics. Returns (and saves as dcfc_rate_costs.csv
+        at outpath) a rates x profiles table ['label', 'eiaid', 'utility', 
+        'name', '{p}_lvl_cost_per_kwh'...]; costs are NaN where a rate is 
+        ineligible for the profile or has a negative or unknown cost. 
+        Months where a peak repeats count the first peak once. Eligible 
+        rates are read from eligibility (eligibility.EligibilityIndex of 
+        self.com_rate_data, built here if None). The log_lvl parameter must
+        be in [0,1,2] where higher levels reflect more verbose logs.
+        """
 
-            self.com_rate_data['eligible'] = eligibility
-            eligible_rates = self.com_rate_data[self.com_rate_data.eligible==True]
-            logging.info(f'{len(self.com_rate_data[self.com_rate_data.eligible==False])} rates determined to be ineligible for {p} (violated peak capacity/energy consumption constraints)')
+        assert log_lvl in [0,1,2], "Unexpected log_lvl, must be in [0,1,2]"
+        logging.basicConfig(level=[logging.WARNING, logging.INFO, logging.DEBUG][log_lvl])
 
-            ###                             ###
-            ## Calculate cost of electricity ##
-            ###                             ###
+        rates = self.com_rate_data
+        if structures is None:
+            structures = RateStructures(rates)
 
-            #----------------------------------------------------------------------------
-            ## Calculate annual fixed cost charge (1st meter) ##
-            logging.info(f'Starting annual fixed cost calculations for {p}...')
-            eligible_rates['annual_fixed_cost'] = eligible_rates['fixedchargefirstmeter'] * 12
-            eligible_rates = eligible_rates[eligible_rates.annual_fixed_cost >= 0]
-            logging.info("Annual fixed cost calculations complete.")
+        if eligibility is None:
+            eligibility = EligibilityIndex(rates)
 
-            #----------------------------------------------------------------------------
-            ## Calculate annual demand charges ##
-
-            # Characterize rates (demand/no-demand)
-            flat_dmd_rates = eligible_rates[~eligible_rates['flatdemandstructure/period0/tier0rate'].isnull()]
-            flat_dmd_rates['demand_type'] = 'flat'
-
-            tou_dmd_rates = eligible_rates[(eligible_rates['flatdemandstructure/period0/tier0rate'].isnull())&
-                                            (~eligible_rates['demandratestructure/period0/tier0rate'].isnull())]
-            tou_dmd_rates['demand_type'] = 'tou'
-
-            no_dmd_rates = eligible_rates[(eligible_rates['flatdemandstructure/period0/tier0rate'].isnull())&
-                                            (eligible_rates['demandratestructure/period0/tier0rate'].isnull())]
-            no_dmd_rates['demand_type'] = 'none'
-
-            logging.info(f'Starting annual demand cost calculations for {p}...')
-
-            ## FLAT-DEMAND RATES ##
-            # Create df with deconstructed flat demand rate structure columns
-            cols_flatdemandstructure = [x for x in flat_dmd_rates.columns.tolist() if 'flatdemandstructure' in x]
-            flatdemandstructure_key = pd.DataFrame(data={'col_name':cols_flatdemandstructure})
-            flatdemandstructure_key[['flatdemandstructure','period','tier']] = flatdemandstructure_key['col_name'].str.split('/',expand=True)
-            flatdemandstructure_key['period'] = flatdemandstructure_key['period'].str.replace('period','').astype(int)
-            flatdemandstructure_key['tier'] = flatdemandstructure_key['tier'].str.replace('tier','')
-            flatdemandstructure_key['type'] = flatdemandstructure_key['tier']
-            flatdemandstructure_key['tier'] = flatdemandstructure_key['tier'].str.extract('(\d+)').astype(int)
-            flatdemandstructure_key['type'] = flatdemandstructure_key['type'].str.replace('\d+','')
-            # Create long format df with deconstructed flat demand rate parameters and corresponding values
-            flat_dmd_rates_str = flat_dmd_rates.reindex(columns=['label']+cols_flatdemandstructure)
-            flat_dmd_rates_str_l = flat_dmd_rates_str.melt(id_vars='label',var_name='col_name')
-            flat_dmd_rates_str_l = flat_dmd_rates_str_l.merge(flatdemandstructure_key,how='left',on='col_name',validate='many_to_one')
-            # Create wide format df with deconstructed flat demand rate parameters and corresponding values
-            flat_dmd_rates_str_w = flat_dmd_rates_str_l.pivot(values='value',index=['label','period','tier'],columns='type').reset_index()
-            flat_dmd_rates_str_w = flat_dmd_rates_str_w.sort_values(by=['label','period','tier'])
-            flat_dmd_rates_str_w = flat_dmd_rates_str_w.rename_axis(None,axis=1)
-            flat_dmd_rates_str_w['max'] = flat_dmd_rates_str_w['max'].fillna(np.inf)
-            flat_dmd_rates_str_w['rate'] = flat_dmd_rates_str_w['rate'].fillna(0)
-            flat_dmd_rates_str_w['adj'] = flat_dmd_rates_str_w['adj'].fillna(0)
-            flat_dmd_rates_str_w['dmd_rate'] = flat_dmd_rates_str_w['rate'] + flat_dmd_rates_str_w['adj']
-            flat_dmd_rates_str_w['max'] = flat_dmd_rates_str_w['max'].astype('float64')
-            flat_dmd_rates_str_w.drop(columns=['adj','rate'],inplace=True)
-            flat_dmd_rates_str_w = flat_dmd_rates_str_w.reset_index(drop=True)
-            # Create df with flat demand schedule: month with corresponding period
-            cols_flatdemand_sched = [x for x in flat_dmd_rates.columns.tolist() if 'flatDemandMonth' in x]
-            flat_dmd_rates_sched = flat_dmd_rates.reindex(columns=['label']+cols_flatdemand_sched)
-            flat_dmd_rates_sched_l = flat_dmd_rates_sched.melt(id_vars='label',value_vars=cols_flatdemand_sched,var_name='month',value_name='period')
-            flat_dmd_rates_sched_l['month_txt'] = flat_dmd_rates_sched_l['month'].str.replace('flatDemandMonth_','')
-            dict_month = {'jan':1, 'feb':2, 'mar':3, 'apr':4, 'may':5, 'jun':6, 'jul':7, 'aug':8, 'sep':9, 'oct':10, 'nov':11, 'dec':12}
-            flat_dmd_rates_sched_l['month'] = flat_dmd_rates_sched_l['month_txt'].map(dict_month)
-            # Merge monthly_peak_pwr_df to schedule
-            flat_dmd_rates_byper_bytier = flat_dmd_rates_sched_l.merge(monthly_peak_pwr_df,how='left',on='month')
-            flat_dmd_rates_byper_bytier = flat_dmd_rates_byper_bytier.merge(flat_dmd_rates_str_w,how='left',on=['label','period'])
-            flat_dmd_rates_byper_bytier['max_cumulative'] = flat_dmd_rates_byper_bytier.groupby(['label','month','period'])['max'].cumsum()
-            # determine excess power above tier threshold and shift down to assign to next tier
-            flat_dmd_rates_byper_bytier['dmd_excess'] = np.where(flat_dmd_rates_byper_bytier['pwr_kw'] > flat_dmd_rates_byper_bytier['max_cumulative'], 
-                                                                    flat_dmd_rates_byper_bytier['pwr_kw'] - flat_dmd_rates_byper_bytier['max_cumulative'],0)
-            flat_dmd_rates_byper_bytier['dmd_excess_shift'] = flat_dmd_rates_byper_bytier.groupby(['label','month','period'])['dmd_excess'].shift()
-            # select final power value for each tier based on several conditions
-            flat_dmd_rates_byper_bytier['dmd_tier'] = np.select(  condlist=[flat_dmd_rates_byper_bytier['dmd_excess']>0, 
-                                                                                    flat_dmd_rates_byper_bytier['dmd_excess_shift']>0,
-                                                                                    flat_dmd_rates_byper_bytier['dmd_excess_shift'].isna()],
-                                                                                choicelist=[flat_dmd_rates_byper_bytier['max'],
-                                                                                    flat_dmd_rates_byper_bytier['dmd_excess_shift'],
-                                                                                    flat_dmd_rates_byper_bytier['pwr_kw']],default=0)
-            # calculate total flat demand cost
-            flat_dmd_rates_byper_bytier['dmd_cost_total'] = flat_dmd_rates_byper_bytier['dmd_rate'] * flat_dmd_rates_byper_bytier['dmd_tier']
-            # calculate annual energy cost for each eligible rate and combine into one df
-            annual_flat_dmd_cost_df = flat_dmd_rates_byper_bytier[['label','dmd_cost_total']].groupby(by='label').sum()
-            annual_flat_dmd_cost_df.rename(columns={'dmd_cost_total':'annual_demand_cost'},inplace=True)
-            flat_dmd_rates = flat_dmd_rates.merge(annual_flat_dmd_cost_df,how='left',on='label')
-            flat_dmd_rates = flat_dmd_rates[flat_dmd_rates.annual_demand_cost>=0] #remove negative demand costs
-
-            ## TOU-DEMAND RATES ##
-            # Create df with deconstructed tou demand rate structure columns
-            cols_demandratestructure = [x for x in tou_dmd_rates.columns.tolist() if 'demandratestructure' in x]
-            demandratestructure_key = pd.DataFrame(data={'col_name':cols_demandratestructure})
-            demandratestructure_key[['demandratestructure','period','tier']] = demandratestructure_key['col_name'].str.split('/',expand=True)
-            demandratestructure_key['period'] = demandratestructure_key['period'].str.replace('period','').astype(int)
-            demandratestructure_key['tier'] = demandratestructure_key['tier'].str.replace('tier','')
-            demandratestructure_key['type'] = demandratestructure_key['tier']
-            demandratestructure_key['tier'] = demandratestructure_key['tier'].str.extract('(\d+)').astype(int)
-            demandratestructure_key['type'] = demandratestructure_key['type'].str.replace('\d+','')
-            # Create long format df with deconstructed tou demand rate parameters and corresponding values
-            tou_dmd_rates_str = tou_dmd_rates.reindex(columns=['label']+cols_demandratestructure)
-            tou_dmd_rates_str_l = tou_dmd_rates_str.melt(id_vars='label',var_name='col_name')
-            tou_dmd_rates_str_l = tou_dmd_rates_str_l.merge(demandratestructure_key,how='left',on='col_name',validate='many_to_one')
-            # Create wide format df with deconstructed tou demand rate parameters and corresponding values
-            tou_dmd_rates_str_w = tou_dmd_rates_str_l.pivot(values='value',index=['label','period','tier'],columns='type').reset_index()
-            tou_dmd_rates_str_w = tou_dmd_rates_str_w.sort_values(by=['label','period','tier'])
-            tou_dmd_rates_str_w = tou_dmd_rates_str_w.rename_axis(None,axis=1)
-            tou_dmd_rates_str_w['max'] = tou_dmd_rates_str_w['max'].fillna(np.inf)
-            tou_dmd_rates_str_w['rate'] = tou_dmd_rates_str_w['rate'].fillna(0)
-            tou_dmd_rates_str_w['adj'] = tou_dmd_rates_str_w['adj'].fillna(0)
-            tou_dmd_rates_str_w['dmd_rate'] = tou_dmd_rates_str_w['rate'] + tou_dmd_rates_str_w['adj']
-            tou_dmd_rates_str_w['max'] = tou_dmd_rates_str_w['max'].astype('float64')
-            tou_dmd_rates_str_w.drop(columns=['adj','rate'],inplace=True)
-            tou_dmd_rates_str_w = tou_dmd_rates_str_w.reset_index(drop=True)
-            # Create long format schedule dfs with label-month-hour index and period value for weekday and weekend schedules
-            # weekday
-            tou_dmd_rates_wkday = tou_dmd_rates.reindex(columns=['label','demandweekdayschedule'])
-            tou_dmd_rates_wkday['demandweekdayschedule_mod'] = tou_dmd_rates['demandweekdayschedule'].str.replace('L','')
-            tou_dmd_rates_wkday[list(range(1,13))] = tou_dmd_rates_wkday['demandweekdayschedule_mod'].str.split('], ',expand=True)
-            tou_dmd_rates_wkday_l = tou_dmd_rates_wkday.melt(id_vars='label',value_vars=list(range(1,13)),var_name='month',value_name='hour_period')
-            tou_dmd_rates_wkday_l['hour_period'] = tou_dmd_rates_wkday_l['hour_period'].str.replace('[','')
-            tou_dmd_rates_wkday_l['hour_period'] = tou_dmd_rates_wkday_l['hour_period'].str.replace(']','')
-            tou_dmd_rates_wkday_l[list(range(0,24))] = tou_dmd_rates_wkday_l['hour_period'].str.split(', ',expand=True)
-            tou_dmd_rates_wkday_l = tou_dmd_rates_wkday_l.melt(id_vars=['label','month'],value_vars=list(range(0,24)),var_name='hour',value_name='period')
-            tou_dmd_rates_wkday_l['day_type'] = 'weekday'
-            tou_dmd_rates_wkday_l['month'] = tou_dmd_rates_wkday_l['month'].astype(int)
-            tou_dmd_rates_wkday_l['hour'] = tou_dmd_rates_wkday_l['hour'].astype(int)
-            tou_dmd_rates_wkday_l['period'] = tou_dmd_rates_wkday_l['period'].astype(int)
-            tou_dmd_rates_wkday_l = tou_dmd_rates_wkday_l.sort_values(by=['label','month','hour','period']).reset_index(drop=True)
-            # weekend
-            tou_dmd_rates_wkend = tou_dmd_rates.reindex(columns=['label','demandweekendschedule'])
-            tou_dmd_rates_wkend['demandweekendschedule_mod'] = tou_dmd_rates['demandweekendschedule'].str.replace('L','')
-            tou_dmd_rates_wkend[list(range(1,13))] = tou_dmd_rates_wkend['demandweekendschedule_mod'].str.split('], ',expand=True)
-            tou_dmd_rates_wkend_l = tou_dmd_rates_wkend.melt(id_vars='label',value_vars=list(range(1,13)),var_name='month',value_name='hour_period')
-            tou_dmd_rates_wkend_l['hour_period'] = tou_dmd_rates_wkend_l['hour_period'].str.replace('[','')
-            tou_dmd_rates_wkend_l['hour_period'] = tou_dmd_rates_wkend_l['hour_period'].str.replace(']','')
-            tou_dmd_rates_wkend_l[list(range(0,24))] = tou_dmd_rates_wkend_l['hour_period'].str.split(', ',expand=True)
-            tou_dmd_rates_wkend_l = tou_dmd_rates_wkend_l.melt(id_vars=['label','month'],value_vars=list(range(0,24)),var_name='hour',value_name='period')
-            tou_dmd_rates_wkend_l['day_type'] = 'weekend'
-            tou_dmd_rates_wkend_l['month'] = tou_dmd_rates_wkend_l['month'].astype(int)
-            tou_dmd_rates_wkend_l['hour'] = tou_dmd_rates_wkend_l['hour'].astype(int)
-            tou_dmd_rates_wkend_l['period'] = tou_dmd_rates_wkend_l['period'].astype(int)
-            tou_dmd_rates_wkend_l = tou_dmd_rates_wkend_l.sort_values(by=['label','month','hour','period']).reset_index(drop=True)
-            # Concatenate weekday and weekend dfs
-            tou_dmd_rates_sched_l = pd.concat([tou_dmd_rates_wkday_l,tou_dmd_rates_wkend_l])
-            # Merge monthly_peak_pwr_df to schedule
-            tou_dmd_rates_byper_bytier = tou_dmd_rates_sched_l.merge(monthly_peak_pwr_df,how='left',on=['month','hour','day_type'])
-            tou_dmd_rates_byper_bytier = tou_dmd_rates_byper_bytier.dropna(axis=0,subset=['pwr_kw'])
-            tou_dmd_rates_byper_bytier = tou_dmd_rates_byper_bytier.merge(tou_dmd_rates_str_w,how='left',on=['label','period'])
-            tou_dmd_rates_byper_bytier['max_cumulative'] = tou_dmd_rates_byper_bytier.groupby(['label','month','period'])['max'].cumsum()
-            # determine excess power above tier threshold and shift down to assign to next tier
-            tou_dmd_rates_byper_bytier['dmd_excess'] = np.where(tou_dmd_rates_byper_bytier['pwr_kw'] > tou_dmd_rates_byper_bytier['max_cumulative'], 
-                                                                    tou_dmd_rates_byper_bytier['pwr_kw'] - tou_dmd_rates_byper_bytier['max_cumulative'],0)
-            tou_dmd_rates_byper_bytier['dmd_excess_shift'] = tou_dmd_rates_byper_bytier.groupby(['label','month','period'])['dmd_excess'].shift()
-            # select final power value for each tier based on several conditions
-            tou_dmd_rates_byper_bytier['dmd_tier'] = np.select(  condlist=[tou_dmd_rates_byper_bytier['dmd_excess']>0, 
-                                                                                    tou_dmd_rates_byper_bytier['dmd_excess_shift']>0,
-                                                                                    tou_dmd_rates_byper_bytier['dmd_excess_shift'].isna()],
-                                                                                choicelist=[tou_dmd_rates_byper_bytier['max'],
-                                                                                    tou_dmd_rates_byper_bytier['dmd_excess_shift'],
-                                                                                    tou_dmd_rates_byper_bytier['pwr_kw']],default=0)
-            # calculate total tou demand cost
-            tou_dmd_rates_byper_bytier['dmd_cost_total'] = tou_dmd_rates_byper_bytier['dmd_rate'] * tou_dmd_rates_byper_bytier['dmd_tier']
-            # calculate annual energy cost for each eligible rate and combine into one df
-            annual_tou_dmd_cost_df = tou_dmd_rates_byper_bytier[['label','dmd_cost_total']].groupby(by='label').sum()
-            annual_tou_dmd_cost_df.rename(columns={'dmd_cost_total':'annual_demand_cost'},inplace=True)
-            # merge annual energy cost to eligible rates
-            tou_dmd_rates = tou_dmd_rates.merge(annual_tou_dmd_cost_df,how='left',on='label')
-            tou_dmd_rates = tou_dmd_rates[tou_dmd_rates.annual_demand_cost>=0] #remove negative demand costs
-
-            ## NO-DEMAND RATES ##
-            no_dmd_rates['annual_demand_cost'] = 0
-
-            logging.info("Annual demand cost calculations complete.")
-
-            eligible_rates = pd.concat([flat_dmd_rates, tou_dmd_rates, no_dmd_rates])
+        # Rate side
+        idx = structures.get_index(rates['label'])
+        energy = structures.energy.take(idx)
+        energy_schedules = self.get_schedules(rates, 'energy')
+        dmd_schedules = self.get_schedules(rates, 'demand')
+        annual_fixed_cost = rates['fixedchargefirstmeter'].values * 12
+        
+        is_flat = rates['flatdemandstructure/period0/tier0rate'].notnull().values
+        is_tou = ~is_flat & rates['demandratestructure/period0/tier0rate'].notnull().values
+        flat_idx, tou_idx = np.flatnonzero(is_flat), np.flatnonzero(is_tou)
+        flat_dmd = structures.flatdemand.take(idx[flat_idx])
+        flat_periods = structures.flat_demand_months[idx[flat_idx]]
+        tou_dmd = structures.demand.take(idx[tou_idx])
+        tou_valid = (dmd_schedules[tou_idx] >= 0).all(axis=(1, 2, 3))
+
+        # Profile side
+        determinants = {p: profiles.load_profile(profile) for p, profile in dcfc_load_profiles.items()}
+        
+        # Energy costs, profiles sharing the same hours billed together
+        annual_energy_costs = profile_energy_costs(determinants, energy_schedules, energy)
+
+        # Demand costs & totals by profile
+        cost_table = rates[['label', 'eiaid', 'utility', 'name']].reset_index(drop=True)
+        for p, det in determinants.items():
+            monthly_peak = det.monthly_peak_kw
+            eligible = np.zeros(len(rates), dtype=bool)
+            eligible[eligibility.eligible(det)] = True
+            logging.info(f'{(~eligible).sum()} rates determined to be ineligible for {p} (violated peak capacity/energy consumption constraints)')
+
+            annual_demand_cost = np.zeros(len(rates))
+            annual_demand_cost[flat_idx] = billing.cumulative_demand_cost(monthly_peak, flat_periods, flat_dmd)
+            
+            tou_periods = dmd_schedules[tou_idx][:, det.peak_day_types, np.arange(12), det.peak_hours]
+            tou_periods = np.where(tou_valid[:, np.newaxis], tou_periods, np.nan)
+            annual_demand_cost[tou_idx] = billing.cumulative_demand_cost(monthly_peak, tou_periods, tou_dmd)
+            annual_demand_cost[tou_idx[~tou_valid]] = np.nan
 
-            #----------------------------------------------------------------------------
-            ##  Calculate annual energy charges ##
-            logging.info(f'Starting annual energy cost calculations for {p}')
-            # Create df with deconstructed energy rate structure columns
-            cols_energyratestructure = [x for x in eligible_rates.columns.tolist() if 'energyratestructure' in x]
-            energyratestructure_key = pd.DataFrame(data={'col_name':cols_energyratestructure})
-            energyratestructure_key[['energyratestructure','period','tier']] = energyratestructure_key['col_name'].str.split('/',expand=True)
-            energyratestructure_key['period'] = energyratestructure_key['period'].str.replace('period','').astype(int)
-            energyratestructure_key['tier'] = energyratestructure_key['tier'].str.replace('tier','')
-            energyratestructure_key['type'] = energyratestructure_key['tier']
-            energyratestructure_key['tier'] = energyratestructure_key['tier'].str.extract('(\d+)').astype(int)
-            energyratestructure_key['type'] = energyratestructure_key['type'].str.replace('\d+','')
-            # Create long format df with deconstructed energy rate parameters and corresponding values
-            energy_rates_str = eligible_rates.reindex(columns=['label']+cols_energyratestructure)
-            energy_rates_str_l = energy_rates_str.melt(id_vars='label',var_name='col_name')
-            energy_rates_str_l = energy_rates_str_l.merge(energyratestructure_key,how='left',on='col_name',validate='many_to_one')
-            # Create wide format df with deconstructed energy rate parameters and corresponding values
-            energy_rates_str_w = energy_rates_str_l.pivot(values='value',index=['label','period','tier'],columns='type').reset_index()
-            energy_rates_str_w = energy_rates_str_w.sort_values(by=['label','period','tier'])
-            energy_rates_str_w = energy_rates_str_w.rename_axis(None,axis=1)
-            energy_rates_str_w = energy_rates_str_w.dropna(how='all',subset=['adj','max','rate','sell']) # drop rows with no data
-            energy_rates_str_w['max'] = energy_rates_str_w['max'].fillna(np.inf)
-            energy_rates_str_w['rate'] = energy_rates_str_w['rate'].fillna(0)
-            energy_rates_str_w['adj'] = energy_rates_str_w['adj'].fillna(0)
-            energy_rates_str_w['energy_cost'] = energy_rates_str_w['rate'] + energy_rates_str_w['adj']
-            energy_rates_str_w['max'] = energy_rates_str_w['max'].astype('float64')
-            energy_rates_str_w.drop(columns=['adj','rate','sell'],inplace=True)
-            energy_rates_str_w = energy_rates_str_w.reset_index(drop=True)
-            # Create long format schedule dfs with label-month-hour index and period value for weekday and weekend schedules
-            # weekday
-            energy_rates_wkday = eligible_rates.reindex(columns=['label','energyweekdayschedule'])
-            energy_rates_wkday['energyweekdayschedule_mod'] = eligible_rates['energyweekdayschedule'].str.replace('L','')
-            energy_rates_wkday[list(range(1,13))] = energy_rates_wkday['energyweekdayschedule_mod'].str.split('], ',expand=True)
-            energy_rates_wkday_l = energy_rates_wkday.melt(id_vars='label',value_vars=list(range(1,13)),var_name='month',value_name='hour_period')
-            energy_rates_wkday_l['hour_period'] = energy_rates_wkday_l['hour_period'].str.replace('[','')
-            energy_rates_wkday_l['hour_period'] = energy_rates_wkday_l['hour_period'].str.replace(']','')
-            energy_rates_wkday_l[list(range(0,24))] = energy_rates_wkday_l['hour_period'].str.split(', ',expand=True)
-            energy_rates_wkday_l = energy_rates_wkday_l.melt(id_vars=['label','month'],value_vars=list(range(0,24)),var_name='hour',value_name='period')
-            energy_rates_wkday_l['day_type'] = 'weekday'
-            energy_rates_wkday_l['month'] = energy_rates_wkday_l['month'].astype(int)
-            energy_rates_wkday_l['hour'] = energy_rates_wkday_l['hour'].astype(int)
-            energy_rates_wkday_l['period'] = energy_rates_wkday_l['period'].astype(int)
-            energy_rates_wkday_l = energy_rates_wkday_l.sort_values(by=['label','month','hour','period']).reset_index(drop=True)
-            # weekend
-            energy_rates_wkend = eligible_rates.reindex(columns=['label','energyweekendschedule'])
-            energy_rates_wkend['energyweekendschedule_mod'] = eligible_rates['energyweekendschedule'].str.replace('L','')
-            energy_rates_wkend[list(range(1,13))] = energy_rates_wkend['energyweekendschedule_mod'].str.split('], ',expand=True)
-            energy_rates_wkend_l = energy_rates_wkend.melt(id_vars='label',value_vars=list(range(1,13)),var_name='month',value_name='hour_period')
-            energy_rates_wkend_l['hour_period'] = energy_rates_wkend_l['hour_period'].str.replace('[','')
-            energy_rates_wkend_l['hour_period'] = energy_rates_wkend_l['hour_period'].str.replace(']','')
-            energy_rates_wkend_l[list(range(0,24))] = energy_rates_wkend_l['hour_period'].str.split(', ',expand=True)
-            energy_rates_wkend_l = energy_rates_wkend_l.melt(id_vars=['label','month'],value_vars=list(range(0,24)),var_name='hour',value_name='period')
-            energy_rates_wkend_l['day_type'] = 'weekend'
-            energy_rates_wkend_l['month'] = energy_rates_wkend_l['month'].astype(int)
-            energy_rates_wkend_l['hour'] = energy_rates_wkend_l['hour'].astype(int)
-            energy_rates_wkend_l['period'] = energy_rates_wkend_l['period'].astype(int)
-            energy_rates_wkend_l = energy_rates_wkend_l.sort_values(by=['label','month','hour','period']).reset_index(drop=True)
-            # Concatenate weekday and weekend dfs
-            energy_rates_sched_l = pd.concat([energy_rates_wkday_l,energy_rates_wkend_l])
-            # Process hourly_energy_df
-            hourly_energy_df.query('energy_kwh > 0',inplace=True) # drop hours with 0 energy use to reduce dataframe size
-            hourly_energy_df['day_type'] = np.where(hourly_energy_df['weekday']<=4,'weekday','weekend') # categorize day type
-            # Merge schedules to hourly_energy_df
-            hourly_energy_df_sched = hourly_energy_df.merge(energy_rates_sched_l,how='left',on=['month','hour','day_type'])
-            hourly_energy_df_sched = hourly_energy_df_sched.sort_values(by=['label','month','period','day','hour'])
-            # Max Usage Units == kWh daily
-            daily_energy_byper = hourly_energy_df_sched[['label','month','day','period','energy_kwh']].groupby(by=['label','month','day','period']).sum().reset_index()
-            daily_energy_byper_bytier = daily_energy_byper.merge(energy_rates_str_w,how='left',on=['label','period'])
-            daily_energy_byper_bytier_kWhdaily = daily_energy_byper_bytier.query('unit == "kWh daily"')
-            daily_energy_byper_bytier_kWhdaily['max_cumulative'] = daily_energy_byper_bytier_kWhdaily.groupby(['label','month','day','period'])['max'].cumsum()
-            daily_energy_byper_bytier_kWhdaily['energy_excess'] = np.where(daily_energy_byper_bytier_kWhdaily['energy_kwh'] > daily_energy_byper_bytier_kWhdaily['max_cumulative'], daily_energy_byper_bytier_kWhdaily['energy_kwh'] - daily_energy_byper_bytier_kWhdaily['max_cumulative'],0)
-            daily_energy_byper_bytier_kWhdaily['energy_excess_shift'] = daily_energy_byper_bytier_kWhdaily.groupby(['label','month','day','period'])['energy_excess'].shift()
-            daily_energy_byper_bytier_kWhdaily['energy_tier'] = np.select(  condlist=[daily_energy_byper_bytier_kWhdaily['energy_excess']>0, 
-                                                                                daily_energy_byper_bytier_kWhdaily['energy_excess_shift']>0,
-                                                                                daily_energy_byper_bytier_kWhdaily['energy_excess_shift'].isna()],
-                                                                            choicelist=[daily_energy_byper_bytier_kWhdaily['max'],
-                                                                                daily_energy_byper_bytier_kWhdaily['energy_excess_shift'],
-                                                                                daily_energy_byper_bytier_kWhdaily['energy_kwh']],default=0)
-            daily_energy_byper_bytier_kWhdaily['energy_cost_total'] = daily_energy_byper_bytier_kWhdaily['energy_cost'] * daily_energy_byper_bytier_kWhdaily['energy_tier']
-            # Max Usage Units == kWh or kWh/kW
-            monthly_energy_byper = hourly_energy_df_sched[['label','month','period','energy_kwh']].groupby(by=['label','month','period']).sum().reset_index()
-            monthly_energy_byper_bytier = monthly_energy_byper.merge(energy_rates_str_w,how='left',on=['label','period'])
-            monthly_energy_byper_bytier = monthly_energy_byper_bytier.merge(monthly_peak_pwr_df,how='left',on='month')
-            monthly_energy_byper_bytier_nokWhdaily = monthly_energy_byper_bytier.query('unit != "kWh daily"')
-            # determine final tier threshold (max_final) based on Max Usage units
-            monthly_energy_byper_bytier_nokWhdaily['max_final'] = np.where(monthly_energy_byper_bytier_nokWhdaily['unit']=='kWh/kW',
-                                                                            monthly_energy_byper_bytier_nokWhdaily['max']*monthly_energy_byper_bytier_nokWhdaily['pwr_kw'],
-                                                                            monthly_energy_byper_bytier_nokWhdaily['max'])
-            monthly_energy_byper_bytier_nokWhdaily['max_cumulative'] = monthly_energy_byper_bytier_nokWhdaily.groupby(['label','month','period'])['max_final'].cumsum()
-            # determine excess energy above tier threshold and shift down to assign to next tier
-            monthly_energy_byper_bytier_nokWhdaily['energy_excess'] = np.where(monthly_energy_byper_bytier_nokWhdaily['energy_kwh'] > monthly_energy_byper_bytier_nokWhdaily['max_cumulative'], monthly_energy_byper_bytier_nokWhdaily['energy_kwh'] - monthly_energy_byper_bytier_nokWhdaily['max_cumulative'],0)
-            monthly_energy_byper_bytier_nokWhdaily['energy_excess_shift'] = monthly_energy_byper_bytier_nokWhdaily.groupby(['label','month','period'])['energy_excess'].shift()
-            # select final energy value for each tier based on several conditions
-            monthly_energy_byper_bytier_nokWhdaily['energy_tier'] = np.select(  condlist=[monthly_energy_byper_bytier_nokWhdaily['energy_excess']>0, 
-                                                                                    monthly_energy_byper_bytier_nokWhdaily['energy_excess_shift']>0,
-                                                                                    monthly_energy_byper_bytier_nokWhdaily['energy_excess_shift'].isna()],
-                                                                                choicelist=[monthly_energy_byper_bytier_nokWhdaily['max_final'],
-                                                                                    monthly_energy_byper_bytier_nokWhdaily['energy_excess_shift'],
-                                                                                    monthly_energy_byper_bytier_nokWhdaily['energy_kwh']],default=0)
-            # calculate total energy cost
-            monthly_energy_byper_bytier_nokWhdaily['energy_cost_total'] = monthly_energy_byper_bytier_nokWhdaily['energy_cost'] * monthly_energy_byper_bytier_nokWhdaily['energy_tier']
-            # calculate annual energy cost for each eligible rate and combine into one df
-            annual_energy_cost_df_kWhdaily = daily_energy_byper_bytier_kWhdaily[['label','energy_cost_total']].groupby(by='label').sum()
-            annual_energy_cost_df_nokWhdaily = monthly_energy_byper_bytier_nokWhdaily[['label','energy_cost_total']].groupby(by='label').sum()
-            annual_energy_cost_df = pd.concat([annual_energy_cost_df_kWhdaily,annual_energy_cost_df_nokWhdaily])
-            annual_energy_cost_df.rename(columns={'energy_cost_total':'annual_energy_cost'},inplace=True)
-            annual_energy_cost_df = annual_energy_cost_df.reset_index()
-            # merge annual energy cost to eligible rates
-            eligible_rates = eligible_rates.merge(annual_energy_cost_df,how='left',on='label')
-            eligible_rates = eligible_rates[eligible_rates.annual_energy_cost>=0] #remove negative energy costs
-            logging.info(f'{p} - Annual energy cost calculations complete.')
+            annual_energy_cost = annual_energy_costs[p]
+            annual_cost_total = annual_fixed_cost + annual_demand_cost + annual_energy_cost
+            
+            #remove ineligible rates, negative & unknown costs
+            included = eligible & (annual_fixed_cost >= 0) & (annual_demand_cost >= 0) & (annual_energy_cost >= 0)
+            cost_table[f'{p}_lvl_cost_per_kwh'] = np.where(included, annual_cost_total/det.annual_energy_kwh, np.nan)
+            logging.info(f'{p} - {included.sum()} rates costed.')
 
-            #----------------------------------------------------------------------------
-            # calculate total annual costs
-            eligible_rates['annual_cost_total'] = eligible_rates['annual_fixed_cost'] + eligible_rates['annual_demand_cost'] + eligible_rates['annual_energy_cost']
-            new_field = f'{p}_lvl_cost_per_kwh'
-            eligible_rates[new_field] = eligible_rates['annual_cost_total']/annual_energy_kwh
+        cost_table.to_csv(os.path.join(outpath,'dcfc_rate_costs.csv'), index=False)
 
-            eligible_rates.to_csv(os.path.join(outpath,f'dcfc_rates_{p}.csv'), index=False)
\ No newline at end of file
+        return cost_table
@@ -0,0 +1,20 @@
+import os
+import sys
+import logging
+import pandas as pd
+import lcoc.benchmark as benchmark
+
+#sizes (synthetic rates per URDB snapshot) from the command line, e.g. python run_benchmarks.py 300 1200
+sizes = [int(n) for n in sys.argv[1:]] or benchmark.BENCHMARK_SIZES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+outpath = os.path.join('outputs','benchmarks')
+timings, agreement = benchmark.run_benchmarks(sizes, outpath=outpath)
+
+with pd.option_context('display.width', 200, 'display.max_columns', 20):
+    print(timings.to_string(index=False, float_format='{:.3f}'.format))
+    print()
+    print(agreement.to_string(index=False))
+
+print(f'\nBenchmark results saved to {outpath}')
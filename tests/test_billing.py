@@ -0,0 +1,131 @@
+"""
+Billing kernels (lcoc.billing) on small, hand-computed rate structures.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import lcoc.billing as billing
+import lcoc.structures as structures
+
+def rate_structure(rates, structure='energyratestructure'):
+    """
+    StructureArrays of the structure of rates, a list (one per rate) of 
+    lists (one per period) of (rate, max, unit) tiers; max may be None.
+    """
+
+    rows = []
+    for periods in rates:
+        row = {}
+        for p, tiers in enumerate(periods):
+            for t, (rate, tier_max, unit) in enumerate(tiers):
+                col = f'{structure}/period{p}/tier{t}'
+                row[col + 'rate'] = rate
+                row[col + 'max'] = np.nan if tier_max is None else tier_max
+                row[col + 'unit'] = unit
+        rows.append(row)
+
+    return structures.StructureArrays(pd.DataFrame(rows), structure)
+
+# Period 0: 0.10 up to 100 kWh, 0.20 up to 200 kWh, 0.30 above; period 1: flat 0.05
+TIERED = [[[(0.10, 100, 'kWh'), (0.20, 200, 'kWh'), (0.30, None, 'kWh')],
+           [(0.05, None, 'kWh')]]]
+
+def test_select_tiers_first_fit():
+    energy = rate_structure(TIERED)
+    usage = np.array([[50., 150., 250., 500., 500., 50.]])
+    periods = np.array([[0, 0, 0, 0, 1, 2]]) #period 2 does not exist
+
+    tiers = billing.select_tiers(usage, periods, energy.max, energy.n_tiers)
+
+    # Each value is billed whole at the first tier whose max it does not exceed
+    assert tiers.tolist() == [[0, 1, 2, 2, 0, -1]]
+
+def test_allocate_tiers_cumulative_fill():
+    energy = rate_structure(TIERED)
+    tier_max = energy.max[0, 0]
+    in_chain = energy.tier_mask()[0]
+
+    # Maximums are tier widths: 250 kWh fills 100 + 150, not tier 2 as w/ select_tiers
+    amounts = billing.allocate_tiers(np.array([50., 250., 350.]), tier_max, in_chain)
+
+    np.testing.assert_allclose(amounts, [[50, 0, 0], [100, 150, 0], [100, 200, 50]])
+    assert billing.select_tiers(np.array([[250.]]), np.array([[0]]), energy.max, energy.n_tiers)[0, 0] == 2
+
+def test_tiered_energy_cost():
+    energy = rate_structure(TIERED * 2)
+    hourly_energy_df = pd.DataFrame({'month': 1, 'hour': [0, 1, 2, 3], 'weekday': 0, 'energy_kwh': 60.})
+    schedules = np.zeros((2, 2, 12, 24))
+    schedules[1, 0, 0, 0] = -1 #malformed
+
+    costs = billing.tiered_energy_cost(hourly_energy_df, schedules, energy)
+
+    # Energy to date 60, 120, 180, 240 kWh -> tiers 0, 1, 1, 2
+    assert costs[0] == pytest.approx(60*(0.10 + 0.20 + 0.20 + 0.30))
+    assert np.isnan(costs[1])
+
+@pytest.mark.parametrize('window_hours, expected', [(1, 0.05), (2, 0.05), (3, (0.20 + 0.05 + 0.05)/3)])
+def test_cheapest_period_cost_window_wraps_midnight(window_hours, expected):
+    period_rates = np.array([[0.20, 0.05]])
+    schedules = np.zeros((1, 2, 12, 24))
+    schedules[0, 0, :, [23, 0]] = 1 #cheap period on weekdays from 11pm to 1am
+
+    costs = billing.cheapest_period_cost(schedules, period_rates, window_hours=window_hours)
+
+    # Weekends are all period 0; w/o wrapping, the best 2-hour window would be 0.125
+    weekday, weekend = billing.DAY_TYPE_WEIGHTS
+    assert costs[0] == pytest.approx(weekday*expected + weekend*0.20)
+
+@pytest.mark.parametrize('window_hours', [0, 25])
+def test_cheapest_period_cost_window_hours_range(window_hours):
+    with pytest.raises(ValueError):
+        billing.cheapest_period_cost(np.zeros((1, 2, 12, 24)), np.array([[0.1]]), window_hours=window_hours)
+
+def test_marginal_tier_rates():
+    empty = [(np.nan, None, np.nan)] #NULL tier
+    energy = rate_structure([[[(0.10, 100, 'kWh'), (0.30, None, 'kWh')], empty],
+                               [[(0.10, 10, 'kWh daily'), (0.30, None, 'kWh daily')], empty]])
+
+    # Monthly tiers: 80 + 40 kWh -> 20 kWh at 0.10 & 20 at 0.30 (0.20/kWh); 200 + 40 kWh -> all at 0.30
+    prices = billing.marginal_tier_rates(energy, [80., 200.], 40., weights=[3, 1])
+    assert prices[0, 0] == pytest.approx(0.75*0.20 + 0.25*0.30)
+
+    # Daily tiers: 10 kWh/day is a monthly max of 10*365/12 kWh
+    prices = billing.marginal_tier_rates(energy, [300.], 10.)
+    first_tier = 10*billing.DAYS_PER_MONTH - 300
+    assert prices[1, 0] == pytest.approx((first_tier*0.10 + (10 - first_tier)*0.30)/10)
+    assert np.isnan(prices[:, 1]).all() #period w/o tier values
+
+def test_marginal_tier_rates_requires_ev_energy():
+    with pytest.raises(ValueError):
+        billing.marginal_tier_rates(rate_structure(TIERED), [100.], 0.)
+
+def test_period_peaks():
+    peak_by_tou_hour = np.full((12, 2, 24), np.nan)
+    peak_by_tou_hour[0, 0, [10, 20]] = [50, 80] #Jan weekdays
+    peak_by_tou_hour[0, 1, 10] = 90 #Jan weekends
+    peak_by_tou_hour[1, 0, 3] = 30 #Feb weekdays
+    schedules = np.zeros((2, 2, 12, 24))
+    schedules[:, 0, :, 8:18] = 1 #weekday daytime peak period
+    schedules[1, 1, 5, 0] = -1 #malformed
+
+    peaks = billing.period_peaks(peak_by_tou_hour, schedules, 2)
+
+    expected = np.zeros((12, 2))
+    expected[0] = [90, 50] #off-peak: weekend 10am beats weekday 8pm
+    expected[1] = [30, 0]
+    np.testing.assert_array_equal(peaks[0], expected)
+    assert np.isnan(peaks[1]).all()
+
+def test_demand_cost_first_fit_tiers():
+    # Period 0: $10/kW up to 100 kW, $15/kW above; period 1: single tier ($20/kW, max ignored)
+    demand = rate_structure([[[(10, 100, 'kW'), (15, None, 'kW')], [(20, 50, 'kW')]]] * 2,
+                            structure='demandratestructure')
+    peaks = np.array([[80., 120., 60., 40.], [80., np.nan, 0., 0.]])
+    periods = np.array([0, 0, 1, np.nan]) #last peak w/o a period
+
+    costs = billing.demand_cost(peaks, periods, demand)
+
+    # Each peak is billed whole at one tier: 80*10 + 120*15 + 60*20
+    assert costs[0] == pytest.approx(800 + 1800 + 1200)
+    assert np.isnan(costs[1])
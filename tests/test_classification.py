@@ -0,0 +1,92 @@
+"""
+Rate classification and phrase filters of DatabaseRates against the
+row-by-row string checks they replaced.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import lcoc.urdb as urdb
+import lcoc.helpers as helpers
+import lcoc.synthetic as synthetic
+
+TIER_COLS = (['energyratestructure/period0/tier{}rate'.format(t) for t in range(1, 11)] +
+             ['energyratestructure/period1/tier{}rate'.format(t) for t in range(1, 8)] +
+             ['energyratestructure/period{}/tier{}rate'.format(p, t) for p in range(2, 6) for t in range(1, 5)])
+
+FILTER_FILES = {'residential': 'filters/urdb_res_filters.txt', 'commercial': 'filters/urdb_dcfc_filters.txt'}
+
+@pytest.fixture(scope='module')
+def urdb_file(tmp_path_factory):
+    urdb_file, _ = synthetic.write_fixtures(str(tmp_path_factory.mktemp('fixtures')), {kind: 40 for kind in synthetic.RATE_KINDS},
+                                            profiles={}, filter_phrase_share=0.3, odd_schedule_share=0.2)
+    return urdb_file
+
+def active_rates(urdb_file, industry):
+    db = urdb.DatabaseRates(urdb_file, cache_dir=False, industry=industry)
+    db.filter_stale_rates(industry)
+    raw = pd.read_csv(urdb_file, low_memory=False).set_index('label')
+    labels = (db.res_rate_data if industry == 'residential' else db.com_rate_data)['label']
+    return db, raw.loc[labels].reset_index()
+
+def read_phrases(filters_file):
+    with open(filters_file, 'r') as f:
+        return [phrase.strip() for phrase in f.read().splitlines()]
+
+def first_phrase(text, phrases):
+    """
+    Per-phrase loop: the phrase found at the earliest position of text, the
+    longest of those, NaN if none.
+    """
+    if isinstance(text, float):
+        return np.nan
+
+    found = [(text.lower().find(phrase.lower()), -len(phrase), phrase) for phrase in phrases
+             if phrase.lower() in text.lower()]
+    return min(found)[2] if found else np.nan
+
+@pytest.mark.parametrize('industry', ['residential', 'commercial'])
+def test_classification_matches_row_by_row(urdb_file, industry):
+    db, raw = active_rates(urdb_file, industry)
+    db.classify_rate_structures(industry, ev_rate_words_file='filters/urdb_res_ev_specific_rate_words.txt')
+    rates = db.res_rate_data if industry == 'residential' else db.com_rate_data
+
+    expected = pd.DataFrame({'is_demand_rate': [int(not (np.isnan(float(row['flatdemandstructure/period0/tier0rate'])) and
+                                                           np.isnan(float(row['demandratestructure/period0/tier0rate']))))
+                                                 for _, row in raw.iterrows()],
+                             'is_tier_rate': [int(row[TIER_COLS].isnull().all() == False) for _, row in raw.iterrows()]})
+    expected[['is_seasonal_rate', 'is_tou_rate']] = [helpers.classify_schedule(wkday, wknd) for wkday, wknd in
+                                                     zip(raw['energyweekdayschedule'], raw['energyweekendschedule'])]
+    if industry == 'residential':
+        ev_words = read_phrases('filters/urdb_res_ev_specific_rate_words.txt')
+        expected['is_ev_rate'] = [int(helpers.contains_filter_phrases(name, ev_words) or helpers.contains_filter_phrases(desc, ev_words))
+                                  for name, desc in zip(raw['name'], raw['description'])]
+
+    assert raw['energyweekdayschedule'].str.contains('L').any()
+    for col in expected.columns:
+        np.testing.assert_array_equal(rates[col].values.astype(float), expected[col].values.astype(float), err_msg=col)
+
+@pytest.mark.parametrize('industry', ['residential', 'commercial'])
+def test_phrase_filter_matches_per_phrase_loop(urdb_file, industry):
+    db, raw = active_rates(urdb_file, industry)
+    audit = db.filter_on_phrases(industry, filters_path='filters', audit=True)
+    rates = db.res_rate_data if industry == 'residential' else db.com_rate_data
+
+    phrases = read_phrases(FILTER_FILES[industry])
+    excluded = np.array([helpers.contains_filter_phrases(name, phrases) or helpers.contains_filter_phrases(desc, phrases)
+                         for name, desc in zip(raw['name'], raw['description'])])
+
+    assert excluded.any()
+    assert rates['label'].tolist() == raw['label'][~excluded].tolist()
+    assert audit['label'].tolist() == raw['label'][excluded].tolist()
+    for col, phrase_col in [('name', 'name_phrase'), ('description', 'description_phrase')]:
+        expected = [first_phrase(text, phrases) for text in raw[col][excluded]]
+        assert audit[phrase_col].fillna('').tolist() == pd.Series(expected, dtype=object).fillna('').tolist()
+
+def test_find_filter_phrases_prefers_earliest_longest():
+    phrases = ['EV', 'ev charging', 'Charging', 'heat pump', 'heat']
+    texts = ['Residential EV Charging', 'charging for evs', 'Heat Pump water heat', 'flat rate', np.nan, 'levels']
+
+    found = helpers.find_filter_phrases(texts, phrases)
+
+    assert found.fillna('').tolist() == ['ev charging', 'Charging', 'heat pump', '', '', 'EV']
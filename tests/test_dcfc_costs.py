@@ -0,0 +1,100 @@
+"""
+DCFC cost implementations of DatabaseRates on synthetic URDB fixtures.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+import lcoc.urdb as urdb
+import lcoc.synthetic as synthetic
+
+PROFILES = {'p1': {'plugs': 1, 'plug_kw': 50, 'sessions_per_plug_day': 2},
+            'constant': {'sessions_per_plug_day': 0, 'base_kw': 50}} #every interval at its month's peak
+
+@pytest.fixture(scope='module')
+def fixtures(tmp_path_factory):
+    return synthetic.write_fixtures(str(tmp_path_factory.mktemp('fixtures')),
+                                    {kind: 25 for kind in synthetic.RATE_KINDS}, profiles=PROFILES)
+
+def commercial_rates(urdb_file):
+    db = urdb.DatabaseRates(urdb_file, cache_dir=False, industry='commercial')
+    db.filter_stale_rates('commercial')
+    db.classify_rate_structures('commercial')
+    db.com_rate_preprocessing()
+    db.additional_com_rate_filters()
+    db.filter_on_phrases('commercial', filters_path='filters')
+    db.combine_rates('commercial')
+    db.filter_null_rates('commercial')
+    return db
+
+def test_batch_matches_v2_on_repeated_peaks(fixtures, tmp_path):
+    urdb_file, profile_files = fixtures
+    db = commercial_rates(urdb_file)
+
+    batch = db.calculate_annual_cost_dcfc_batch(dcfc_load_profiles=profile_files, outpath=str(tmp_path))
+    db.calculate_annual_cost_dcfc_v2(dcfc_load_profiles=profile_files, outpath=str(tmp_path))
+
+    for p in profile_files:
+        cost_col = f'{p}_lvl_cost_per_kwh'
+        v2 = pd.read_csv(os.path.join(tmp_path, f'dcfc_rates_{p}.csv')).set_index('label')[cost_col]
+        costs = batch.dropna(subset=[cost_col]).set_index('label')[cost_col]
+
+        # Tiered energy (kWh/kW) & demand rates are billed at one peak per month
+        assert sorted(costs.index) == sorted(v2.index)
+        np.testing.assert_allclose(costs.values, v2.reindex(costs.index).values, rtol=1e-9)
+
+def v2_outputs(urdb_file, profile_files, outpath, **kwargs):
+    os.makedirs(outpath)
+    commercial_rates(urdb_file).calculate_annual_cost_dcfc_v2(dcfc_load_profiles=profile_files, outpath=outpath, **kwargs)
+    outputs = {}
+    for p in profile_files:
+        with open(os.path.join(outpath, f'dcfc_rates_{p}.csv'), 'rb') as f:
+            outputs[p] = f.read()
+    return outputs
+
+def test_parallel_v2_matches_serial(fixtures, tmp_path):
+    urdb_file, profile_files = fixtures
+    serial = v2_outputs(urdb_file, profile_files, str(tmp_path / 'serial'))
+
+    assert v2_outputs(urdb_file, profile_files, str(tmp_path / 'parallel'), n_jobs=2, shards_per_job=3) == serial
+
+def test_memory_budget_v2_matches_serial(fixtures, tmp_path, monkeypatch):
+    urdb_file, profile_files = fixtures
+    serial = v2_outputs(urdb_file, profile_files, str(tmp_path / 'serial'))
+
+    calls = []
+    dcfc_costs_v2 = urdb.dcfc_costs_v2
+    monkeypatch.setattr(urdb, 'dcfc_costs_v2', lambda *args: calls.append(len(args[0])) or dcfc_costs_v2(*args))
+
+    assert v2_outputs(urdb_file, profile_files, str(tmp_path / 'budget'), memory_budget=2**22) == serial
+    assert len(calls) > 2*len(profile_files) #rates costed in several batches per profile
+
+def test_checkpoint_resume_skips_completed_batches(fixtures, tmp_path, monkeypatch):
+    urdb_file, profile_files = fixtures
+    outpath = str(tmp_path)
+
+    def run():
+        calls = []
+        dcfc_costs_v1 = urdb.dcfc_costs_v1
+        monkeypatch.setattr(urdb, 'dcfc_costs_v1', lambda *args: calls.append(len(args[0])) or dcfc_costs_v1(*args))
+        commercial_rates(urdb_file).calculate_annual_cost_dcfc(dcfc_load_profiles=profile_files, outpath=outpath, batch_size=10)
+        outputs = {}
+        for p in profile_files:
+            with open(os.path.join(outpath, f'dcfc_rates_{p}.csv'), 'rb') as f:
+                outputs[p] = f.read()
+        return calls, outputs
+
+    calls, outputs = run()
+    assert len(calls) > len(profile_files)
+
+    # Completed run: every batch is loaded from its checkpoint
+    resumed_calls, resumed_outputs = run()
+    assert resumed_calls == []
+    assert resumed_outputs == outputs
+
+    # Lost batch file: only that batch is costed again
+    os.remove(os.path.join(outpath, 'dcfc_rates_p1_batches', 'batch_00001.pkl'))
+    resumed_calls, resumed_outputs = run()
+    assert resumed_calls == [calls[1]]
+    assert resumed_outputs == outputs
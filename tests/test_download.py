@@ -0,0 +1,98 @@
+"""
+Resumed downloads (readwrite.download_file) against a local HTTP server.
+"""
+import os
+import threading
+import http.server
+import pytest
+
+import lcoc.readwrite as readwrite
+
+CONTENT = bytes(range(256)) * 64 #16 KiB
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves CONTENT w/ support for 'bytes=start-' Range requests; each
+    response body is cut after drop_after bytes (if not None).
+    """
+
+    drop_after = None
+    requests = []
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        type(self).requests.append(range_header)
+
+        start = int(range_header[len('bytes='):-1]) if range_header else 0
+        if start >= len(CONTENT):
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */{}'.format(len(CONTENT)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = CONTENT[start:]
+        self.send_response(206 if range_header else 200)
+        if range_header:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(CONTENT) - 1, len(CONTENT)))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body if self.drop_after is None else body[:self.drop_after])
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    RangeHandler.drop_after, RangeHandler.requests = None, []
+    httpd = http.server.HTTPServer(('127.0.0.1', 0), RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}/usurdb.csv.gz'.format(httpd.server_port)
+    httpd.shutdown()
+    httpd.server_close()
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def write_part(path, data):
+    with open(path + '.part', 'wb') as f:
+        f.write(data)
+
+def test_resumes_partial_download(server, tmp_path):
+    path = str(tmp_path / 'usurdb.csv.gz')
+    write_part(path, CONTENT[:5000])
+
+    readwrite.download_file(server, path)
+
+    assert RangeHandler.requests == ['bytes=5000-']
+    assert read(path) == CONTENT
+    assert not os.path.exists(path + '.part')
+
+def test_retries_reset_after_progress(server, tmp_path):
+    path = str(tmp_path / 'usurdb.csv.gz')
+    RangeHandler.drop_after = 3000 #5 dropped connections, each w/ progress
+
+    readwrite.download_file(server, path, chunk_size=1000, max_retries=1)
+
+    assert len(RangeHandler.requests) == 6
+    assert read(path) == CONTENT
+
+def test_complete_part_file_on_416(server, tmp_path):
+    path = str(tmp_path / 'usurdb.csv.gz')
+    write_part(path, CONTENT)
+
+    readwrite.download_file(server, path)
+
+    assert RangeHandler.requests == ['bytes={}-'.format(len(CONTENT))]
+    assert read(path) == CONTENT
+
+def test_oversized_part_file_on_416_starts_over(server, tmp_path):
+    path = str(tmp_path / 'usurdb.csv.gz')
+    write_part(path, CONTENT + b'stale bytes')
+
+    readwrite.download_file(server, path)
+
+    assert RangeHandler.requests == ['bytes={}-'.format(len(CONTENT) + 11), None]
+    assert read(path) == CONTENT
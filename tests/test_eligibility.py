@@ -0,0 +1,59 @@
+"""
+EligibilityIndex queries against a linear scan of the rates' service limits.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import lcoc.eligibility as eligibility
+import lcoc.profiles as profiles
+import lcoc.synthetic as synthetic
+
+def scan(rates, min_peak_kw, max_peak_kw, min_energy_kwh, max_energy_kwh):
+    return np.flatnonzero(((rates['peakkwcapacitymin'] <= min_peak_kw) & (rates['peakkwcapacitymax'] >= max_peak_kw) &
+                           (rates['peakkwhusagemin'] <= min_energy_kwh) & (rates['peakkwhusagemax'] >= max_energy_kwh)).values)
+
+@pytest.fixture
+def rates():
+    """
+    Rates w/ a few standard limits (0/inf when NULL after preprocessing),
+    random limits, and NULL limits.
+    """
+
+    rng = np.random.default_rng(0)
+    n = 2000
+    limits = {'peakkwcapacitymin': rng.choice([0, 0, 0, 20, 50, 200], n),
+              'peakkwcapacitymax': rng.choice([np.inf, np.inf, 50, 200, 500], n),
+              'peakkwhusagemin': rng.choice([0, 0, 1000, 5000], n),
+              'peakkwhusagemax': rng.choice([np.inf, np.inf, 20000, 100000], n)}
+    rates = pd.DataFrame(limits)
+    random = rng.random(n) < 0.2
+    rates.loc[random, 'peakkwcapacitymin'] = rng.uniform(0, 300, random.sum()).round()
+    rates.loc[random, 'peakkwcapacitymax'] = rates.loc[random, 'peakkwcapacitymin'] + rng.uniform(0, 500, random.sum()).round()
+    rates.loc[rng.random(n) < 0.05, 'peakkwhusagemax'] = np.nan
+    rates.insert(0, 'label', ['rate{}'.format(i) for i in range(n)])
+
+    return rates
+
+def test_query_matches_linear_scan(rates):
+    index = eligibility.EligibilityIndex(rates)
+    rng = np.random.default_rng(1)
+
+    # Random queries & queries at the limits themselves (inclusive bounds)
+    queries = [sorted(rng.uniform(0, 600, 2)) + sorted(rng.uniform(0, 150000, 2)) for _ in range(200)]
+    queries += [[lo, hi, 1000, 20000] for lo, hi in rates[['peakkwcapacitymin', 'peakkwcapacitymax']].values[:50]]
+    queries += [[0, np.inf, 0, np.inf], [50, 50, 5000, 5000]]
+
+    for query in queries:
+        np.testing.assert_array_equal(index.query(*query), scan(rates, *query), err_msg=str(query))
+
+def test_eligible_matches_linear_scan(rates):
+    index = eligibility.EligibilityIndex(rates)
+
+    for params in [{'plugs': 1, 'plug_kw': 50, 'sessions_per_plug_day': 2}, {'plugs': 4, 'plug_kw': 150, 'sessions_per_plug_day': 4}]:
+        profile = profiles.LoadProfile(synthetic.generate_dcfc_profile(**params))
+        expected = scan(rates, profile.monthly_peak_kw.min(), profile.monthly_peak_kw.max(),
+                        profile.monthly_energy_kwh.min(), profile.monthly_energy_kwh.max())
+
+        assert len(expected) > 0
+        np.testing.assert_array_equal(index.eligible(profile), expected)
@@ -0,0 +1,50 @@
+"""
+Residential & commercial rates as selections of DatabaseRates.rate_data.
+"""
+import numpy as np
+import pytest
+
+import lcoc.urdb as urdb
+import lcoc.synthetic as synthetic
+
+@pytest.fixture
+def urdb_file(tmp_path):
+    urdb_file, _ = synthetic.write_fixtures(str(tmp_path), {kind: 20 for kind in synthetic.RATE_KINDS}, profiles={})
+    return urdb_file
+
+def preprocess(db, industry):
+    db.filter_stale_rates(industry)
+    db.classify_rate_structures(industry)
+    if industry == 'residential':
+        db.filter_demand_rates(industry)
+    else:
+        db.com_rate_preprocessing()
+        db.additional_com_rate_filters()
+    db.filter_on_phrases(industry, filters_path='filters')
+    db.combine_rates(industry)
+    db.filter_null_rates(industry)
+
+@pytest.mark.parametrize('industry', ['residential', 'commercial'])
+def test_released_rates_are_not_copied(urdb_file, industry):
+    db = urdb.DatabaseRates(urdb_file, cache_dir=False, industry=industry)
+    preprocess(db, industry)
+    db.release_raw_columns(industries=[industry])
+
+    rates = db.res_rate_data if industry == 'residential' else db.com_rate_data
+    col = 'energyrate/period0/tier0'
+    assert rates.shape == db.rate_data.shape
+    assert np.shares_memory(rates[col].values, db.rate_data[col].values)
+
+def test_rate_data_reduced_to_remaining_selections(urdb_file):
+    db = urdb.DatabaseRates(urdb_file, cache_dir=False)
+    for industry in ['residential', 'commercial']:
+        db.filter_stale_rates(industry)
+
+    n_res, n_com = len(db._active_rows['residential']), len(db._active_rows['commercial'])
+    res_rates = db.res_rate_data
+    assert len(db.rate_data) == n_com #residential rows no longer held
+
+    # Commercial rates are all that is left of rate_data: taken w/o a copy
+    com_rates = db.com_rate_data
+    assert com_rates is db.rate_data
+    assert len(res_rates) + len(com_rates) == n_res + n_com
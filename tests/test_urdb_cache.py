@@ -0,0 +1,96 @@
+"""
+URDB cache format, and cache behaviour of the update_residential.py & 
+update_dcfc.py flow: projected loads w/ DatabaseRates(..., industry=...).
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+import lcoc.urdb as urdb
+import lcoc.helpers as helpers
+import lcoc.readwrite as readwrite
+import lcoc.synthetic as synthetic
+
+@pytest.fixture
+def urdb_file(tmp_path):
+    urdb_file, _ = synthetic.write_fixtures(str(tmp_path), {kind: 20 for kind in synthetic.RATE_KINDS}, profiles={})
+    return urdb_file
+
+def load_and_classify(urdb_file, industry):
+    db = urdb.DatabaseRates(urdb_file, industry=industry)
+    db.classify_rate_structures(industry)
+    rates = db.res_rate_data if industry == 'residential' else db.com_rate_data
+    schedules = db.get_schedules(rates, 'energy')
+    return db, rates, schedules
+
+@pytest.mark.parametrize('industry', ['residential', 'commercial'])
+def test_projected_load_builds_cache(urdb_file, industry):
+    db, _, _ = load_and_classify(urdb_file, industry)
+    
+    assert db.cache_path is not None
+    assert os.path.exists(os.path.join(db.cache_path, 'manifest.json'))
+    assert os.path.exists(os.path.join(db.cache_path, 'schedules_energy.npz'))
+
+@pytest.mark.parametrize('industry', ['residential', 'commercial'])
+def test_second_run_hits_cache(urdb_file, industry, monkeypatch):
+    _, first_rates, first_schedules = load_and_classify(urdb_file, industry)
+    
+    # Second run: neither the .csv nor the schedule strings may be parsed
+    def fail(*args, **kwargs):
+        raise AssertionError('URDB .csv parsed although the cache exists')
+    
+    monkeypatch.setattr(readwrite.pd, 'read_csv', fail)
+    monkeypatch.setattr(helpers, 'parse_schedules', fail)
+    _, second_rates, second_schedules = load_and_classify(urdb_file, industry)
+
+    pd.testing.assert_frame_equal(first_rates, second_rates)
+    assert (first_schedules == second_schedules).all()
+
+@pytest.mark.parametrize('industry', ['residential', 'commercial'])
+def test_cached_projection_matches_streamed(urdb_file, industry):
+    kwargs = dict(usecols=urdb.pipeline_columns(industry), sectors=urdb.SECTORS[industry], active_only=True)
+    streamed = readwrite.read_urdb_csv(urdb_file, cache_dir=False, **kwargs)
+    built = readwrite.read_urdb_csv(urdb_file, **kwargs) #cache miss, builds the cache
+    cached = readwrite.read_urdb_csv(urdb_file, **kwargs)
+
+    pd.testing.assert_frame_equal(streamed, built)
+    pd.testing.assert_frame_equal(streamed, cached)
+
+def test_cache_round_trips_chunks_with_changing_dtypes(tmp_path):
+    first = pd.DataFrame({'eiaid': [1, 2], 'sector': [np.nan, np.nan], 'is_default': [True, False],
+                          'name': ['Rate A', 'Tarifa Ñ'], 'voltageminimum': [1.5, 2.5]})
+    second = pd.DataFrame({'eiaid': [3.5, np.nan], 'sector': ['Residential', 'Commercial'], 
+                           'is_default': np.array([True, np.nan], dtype=object), 'name': [np.nan, 'Rate C'], 
+                           'voltageminimum': ['n/a', '480']})
+    cache_path = str(tmp_path / 'cache')
+    writer = readwrite.UrdbCacheWriter(cache_path)
+    writer.append(first)
+    writer.append(second)
+    writer.close()
+
+    # Same dtypes & values as concatenating the chunks, w/o pickled objects
+    cached = readwrite.read_urdb_cache(cache_path)
+    pd.testing.assert_frame_equal(cached, pd.concat([first, second], ignore_index=True))
+    assert not any(name.endswith('.pkl') for name in os.listdir(cache_path))
+
+    residential = readwrite.read_urdb_cache(cache_path, usecols=['name'], sectors=['Residential'])
+    assert residential['name'].isnull().all() and len(residential) == 1
+
+def test_projected_load_builds_cache_in_chunks(urdb_file, monkeypatch):
+    read_csv, calls = pd.read_csv, []
+    def tracked_read_csv(*args, **kwargs):
+        calls.append(kwargs)
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(readwrite.pd, 'read_csv', tracked_read_csv)
+    kwargs = dict(usecols=urdb.pipeline_columns('commercial'), sectors=urdb.SECTORS['commercial'], active_only=True)
+    built = readwrite.read_urdb_csv(urdb_file, chunksize=7, **kwargs)
+    monkeypatch.undo()
+
+    # Only the header & chunks of rows are parsed
+    assert all((kw.get('nrows') == 0) or (kw.get('chunksize') == 7) for kw in calls)
+    
+    cache_path = readwrite.urdb_cache_path(urdb_file)
+    pd.testing.assert_frame_equal(built, readwrite.read_urdb_cache(cache_path, **kwargs))
+    assert len(readwrite.read_urdb_cache(cache_path)) == len(pd.read_csv(urdb_file, usecols=['label']))
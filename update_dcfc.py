@@ -15,7 +15,7 @@ hdlr.setFormatter(formatter)
 logger.addHandler(hdlr) 
 logger.setLevel(logging.DEBUG)
 
-db = urdb.DatabaseRates(config.URDB_PATH)
+db = urdb.DatabaseRates(config.URDB_PATH, industry='commercial')
 logger.info("URDB loaded")
 
 #filter expired rates
@@ -47,6 +47,10 @@ db.filter_null_rates(industry='commercial')
 logger.info("DCFC-{}: filtered null rates".format(p))
 logger.info("DCFC-{}: preprocessing complete".format(p))
 
+#release URDB columns not used by the cost calculation
+db.release_raw_columns(industries=['commercial'])
+logger.info("DCFC-{}: unused URDB columns released".format(p))
+
 outpath = 'outputs\\cost-of-electricity\\urdb-dcfc-rates\\'
 
 load_profiles = config.DCFC_PROFILES_DICT
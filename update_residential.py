@@ -15,7 +15,7 @@ logger.addHandler(hdlr)
 logger.setLevel(logging.DEBUG)
 
 #load URDB
-db = urdb.DatabaseRates(config.URDB_PATH)
+db = urdb.DatabaseRates(config.URDB_PATH, industry='residential')
 logger.info("Residential - URDB loaded")
 
 #filter expired rates
@@ -43,8 +43,12 @@ db.filter_null_rates(industry='residential')
 logger.info("Residential - null rates filtered")
 logger.info("Residential - preprocessing complete!")
 
+#release URDB columns not used by the cost calculation
+db.release_raw_columns(industries=['residential'])
+logger.info("Residential - unused URDB columns released")
+
 #calculate annual electricity cost (rates)
-db.calculate_annual_energy_cost_residential()
+db.calculate_annual_energy_cost_residential(charging_hours=config.RES_CHARGING_HOURS)
 logger.info("Residential - annual energy costs calculated")
 
 #calculate annual electricity cost (utility-level)